@@ -0,0 +1,187 @@
+import re
+import json
+import heapq
+import hashlib
+import numpy as np
+import detector_frases
+
+# Apego al guion por alineamiento (semilla y extensión sobre tokens). Los bloques del guion de una
+# campaña se compilan una vez en un índice invertido de n-gramas; cada transcripción se recorre una
+# vez: las posiciones cuyo n-grama está en el índice son semillas, cada semilla se extiende por su
+# diagonal mientras los tokens coincidan (tolerando una palabra cambiada por la transcripción) y, por
+# bloque, los tramos se encadenan respetando el orden del guion y el de la llamada.
+#
+# Cada diagonal se extiende una sola vez y los n-gramas muy repetidos en el guion no son semilla,
+# así el costo es lineal en el largo de la transcripción. Las posiciones son índices en el flujo de
+# tokens de detector_frases.tokenizar(texto), igual que las del detector de frases.
+
+SEMILLA = 3
+# Un n-grama que aparece más veces que esto en el guion no se usa como semilla
+MAX_REPETICIONES = 8
+# Marcadores que el agente no dice textualmente: [nombre del cliente], [Introducción]:
+MARCADOR = re.compile(r"\[[^\]]*\]")
+
+class AlineadorGuion:
+    def __init__(self, script_dict, bloques):
+        self.bloques = list(bloques)
+        self._vocab = {}
+        self._guion = []
+        for bloque in self.bloques:
+            contenido = script_dict.get(bloque)
+            texto = MARCADOR.sub(" ", contenido) if isinstance(contenido, str) else ""
+            self._guion.append([self._vocab.setdefault(t, len(self._vocab)) for t in detector_frases.tokenizar(texto)])
+        # Cambia si cambia lo que se alinea (palabras de cada bloque o parámetros): recalcular.py
+        # reutiliza la cobertura guardada de una llamada mientras la firma de su guion sea la misma
+        vocab = sorted(self._vocab, key=self._vocab.get)
+        self.firma = hashlib.sha1(json.dumps([SEMILLA, MAX_REPETICIONES, self.bloques,
+                                              [[vocab[t] for t in tokens] for tokens in self._guion]],
+                                             ensure_ascii=False).encode("utf-8")).hexdigest()
+        self._base = len(self._vocab) + 1
+        self._largo = max((len(t) for t in self._guion), default=0) + 1
+
+        # Índice por tamaño de semilla (los bloques más cortos que SEMILLA usan su largo):
+        # códigos de n-grama ordenados y, para cada uno, sus (bloque, posición) en el guion
+        por_tamaño = {}
+        for b, tokens in enumerate(self._guion):
+            n = min(SEMILLA, len(tokens))
+            if not n:
+                continue
+            codigos = self._codigos(np.array(tokens, dtype=np.int64), n)
+            por_tamaño.setdefault(n, []).extend((c, b, p) for p, c in enumerate(codigos.tolist()))
+        self._indice = {}
+        for n, entradas in por_tamaño.items():
+            postings = {}
+            for c, b, p in entradas:
+                postings.setdefault(c, []).append((b, p))
+            postings = {c: v for c, v in postings.items() if len(v) <= MAX_REPETICIONES}
+            claves = np.array(sorted(postings), dtype=np.int64)
+            lista = [postings[c] for c in claves.tolist()]
+            # Posición en el guion (bloque * largo máximo + posición) de los n-gramas que aparecen una vez
+            unica = np.array([v[0][0] * self._largo + v[0][1] if len(v) == 1 else -1 for v in lista], dtype=np.int64)
+            self._indice[n] = (claves, lista, unica)
+
+    # Código entero de cada n-grama de ids (ids locales, -1 = fuera del guion)
+    def _codigos(self, ids, n):
+        codigos = np.zeros(len(ids) - n + 1, dtype=np.int64)
+        for j in range(n):
+            codigos = codigos * self._base + ids[j:len(ids) - n + 1 + j]
+        return codigos
+
+    # Ids locales de una lista de tokens
+    def ids(self, tokens):
+        vocab = self._vocab
+        return np.fromiter((vocab.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+
+    # Traducción de un vocabulario externo (lista de palabras) a ids locales, para alinear
+    # secuencias ya tokenizadas como las del índice de recalcular.py
+    def traductor(self, vocab):
+        return np.fromiter((self._vocab.get(w, -1) for w in vocab), dtype=np.int64, count=len(vocab))
+
+    def _semillas(self, ids):
+        semillas = []
+        for n, (claves, postings, unica) in self._indice.items():
+            if len(ids) < n or not len(claves):
+                continue
+            codigos = self._codigos(ids, n)
+            validas = np.ones(len(codigos), dtype=bool)
+            for j in range(n):
+                validas &= ids[j:len(ids) - n + 1 + j] >= 0
+            pos = np.searchsorted(claves, codigos)
+            pos[pos == len(claves)] = 0
+            hit = validas & (claves[pos] == codigos)
+            # Una semilla que sigue a la anterior en la misma diagonal ya queda cubierta al extender aquella
+            lugar = np.where(hit, unica[pos], -1)
+            hit[1:] &= (lugar[:-1] < 0) | (lugar[1:] != lugar[:-1] + 1)
+            for i, k in zip(np.flatnonzero(hit).tolist(), pos[hit].tolist()):
+                semillas.extend((i, b, p) for b, p in postings[k])
+        semillas.sort()
+        return semillas
+
+    # Devuelve {"apego", "bloques": {bloque: {"cobertura", "inicio", "fin"}}, "en_orden", "fuera_de_orden"}.
+    # cobertura es el % de tokens del bloque alineados; inicio y fin (exclusivo) delimitan en la
+    # transcripción el tramo alineado (None si el bloque no aparece). Acepta texto, tokens o ids.
+    def alinear(self, texto):
+        if isinstance(texto, str):
+            texto = detector_frases.tokenizar(texto)
+        ids = texto if isinstance(texto, np.ndarray) else self.ids(texto)
+        transcripcion = ids.tolist()
+        largo = len(transcripcion)
+
+        # Extensión: por cada semilla que no cae en una diagonal ya recorrida
+        tramos = [[] for _ in self.bloques]
+        recorrido = [{} for _ in self.bloques]
+        for i, b, p in self._semillas(ids):
+            diagonal = i - p
+            if recorrido[b].get(diagonal, -1) > i:
+                continue
+            guion = self._guion[b]
+            a, q, aciertos = i, p, 0
+            while a < largo and q < len(guion):
+                if transcripcion[a] == guion[q]:
+                    aciertos += 1
+                elif not (a + 1 < largo and q + 1 < len(guion) and transcripcion[a + 1] == guion[q + 1]):
+                    break
+                a += 1
+                q += 1
+            recorrido[b][diagonal] = a
+            tramos[b].append((i, p, a, q, aciertos))
+
+        resultado = {}
+        for b, bloque in enumerate(self.bloques):
+            cadena = _encadenar(tramos[b], len(self._guion[b]))
+            aciertos = sum(t[4] for t in cadena)
+            resultado[bloque] = {
+                "cobertura": aciertos / len(self._guion[b]) * 100 if self._guion[b] else 0.0,
+                "inicio": cadena[0][0] if cadena else None,
+                "fin": cadena[-1][2] if cadena else None,
+            }
+
+        # Orden: un bloque está fuera de orden si empieza antes que uno anterior del guion
+        fuera_de_orden, ultimo = [], -1
+        for bloque in self.bloques:
+            inicio = resultado[bloque]["inicio"]
+            if inicio is None:
+                continue
+            if inicio < ultimo:
+                fuera_de_orden.append(bloque)
+            ultimo = max(ultimo, inicio)
+        return {
+            "apego": sum(r["cobertura"] for r in resultado.values()) / len(self.bloques) if self.bloques else 0.0,
+            "bloques": resultado,
+            "en_orden": not fuera_de_orden,
+            "fuera_de_orden": fuera_de_orden,
+        }
+
+# Cadena de tramos de un bloque con más tokens alineados, creciente en la transcripción y en el
+# guion y sin solaparse en ninguno de los dos. Los tramos llegan ordenados por inicio; un tramo
+# entra al árbol de Fenwick (máximo por fin en el guion) recién cuando la transcripción lo dejó atrás.
+def _encadenar(tramos, largo_guion):
+    if not tramos:
+        return []
+    arbol = [(0, -1)] * (largo_guion + 1)
+    previo = [-1] * len(tramos)
+    pendientes = []
+    mejor = (0, -1)
+    for j, (i, p, a, q, aciertos) in enumerate(tramos):
+        while pendientes and pendientes[0][0] <= i:
+            _, k, valor = heapq.heappop(pendientes)
+            x = tramos[k][3]
+            while x <= largo_guion:
+                if arbol[x] < (valor, k):
+                    arbol[x] = (valor, k)
+                x += x & -x
+        # Mejor cadena que termina en el guion antes de p
+        anterior, x = (0, -1), p
+        while x > 0:
+            anterior = max(anterior, arbol[x])
+            x -= x & -x
+        valor = anterior[0] + aciertos
+        previo[j] = anterior[1]
+        heapq.heappush(pendientes, (a, j, valor))
+        mejor = max(mejor, (valor, j))
+
+    cadena, j = [], mejor[1]
+    while j >= 0:
+        cadena.append(tramos[j])
+        j = previo[j]
+    return cadena[::-1]
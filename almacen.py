@@ -0,0 +1,825 @@
+import os
+import csv
+import time
+import socket
+import sqlite3
+import numpy as np
+import pandas as pd
+import resultados
+
+# Base SQLite con los resultados y metadatos de llamadas. resumen.csv y metadatos.xlsx
+# se mantienen como exportaciones; transcriptor.py y los dashboards trabajan contra esta base.
+DB_PATH = "callcenter.db"
+RESUMEN_CSV = "resumen.csv"
+METADATOS_XLSX = "metadatos.xlsx"
+HOJA_METADATOS = "Metadatos"
+TRANSCRIPCION_DIR = "transcripciones"
+
+BLOQUES = ["Saludo", "Presentación", "Oferta", "Beneficios", "Cierre"]
+
+COLUMNAS_RESUMEN = [
+    "Archivo", "Agente", "Campaña", "Fecha", "Palabras", "Duración (min)", "Palabras/min",
+    "Saludo Detectado", "Consentimiento Solicitado", "Consentimiento Afirmado",
+    "Precio Mencionado", "Cierre Detectado", "Objeción Detectada", "Resultado Estimado", "Preview",
+    "Apego al Guion (%)", "WPM", "Evaluación WPM", "Friccion (%)", "Evaluación Fricción", "Score Total"
+] + [f"% {b}" for b in BLOQUES]
+
+COLUMNAS_TEXTO = ["Archivo", "Agente", "Campaña", "Fecha", "Resultado Estimado", "Preview",
+                  "Evaluación WPM", "Evaluación Fricción"]
+COLUMNAS_BOOL = ["Saludo Detectado", "Consentimiento Solicitado", "Consentimiento Afirmado",
+                 "Precio Mencionado", "Cierre Detectado", "Objeción Detectada"]
+
+# Métricas por llamada procesada (una fila por procesamiento, se conserva el historial)
+COLUMNAS_METRICAS = [
+    "Archivo", "corrida", "procesado_en", "motor", "modelo", "vad", "cache", "decodificacion_ms",
+    "reproduccion_ms", "inferencia_ms", "kpis_ms", "escritura_ms", "segundos_audio", "segundos_voz", "rtf",
+]
+
+COLUMNAS_METADATOS = [
+    "ID", "Archivo", "Ruta Audio", "Agente", "Campaña", "Fecha Llamada", "Estado",
+    "Fecha Procesado", "Usuario Editor", "Notas", "KPI Score", "created_at", "updated_at", "Motivo Rechazo"
+]
+
+def ruta_transcripcion(archivo, directorio=TRANSCRIPCION_DIR):
+    return os.path.join(directorio, os.path.splitext(archivo)[0] + ".txt")
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+def _tipo(columna):
+    if columna in COLUMNAS_TEXTO:
+        return "TEXT"
+    if columna in COLUMNAS_BOOL or columna == "Palabras":
+        return "INTEGER"
+    return "REAL"
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS llamadas (
+    {", ".join(f"{_q(c)} {_tipo(c)}" + (" PRIMARY KEY" if c == "Archivo" else "") for c in COLUMNAS_RESUMEN)}
+);
+CREATE INDEX IF NOT EXISTS idx_llamadas_agente ON llamadas("Agente", "Fecha");
+CREATE INDEX IF NOT EXISTS idx_llamadas_campana ON llamadas("Campaña", "Fecha");
+CREATE INDEX IF NOT EXISTS idx_llamadas_fecha ON llamadas("Fecha");
+CREATE INDEX IF NOT EXISTS idx_llamadas_score ON llamadas("Score Total");
+CREATE INDEX IF NOT EXISTS idx_llamadas_agente_score ON llamadas("Agente", "Score Total");
+
+CREATE TABLE IF NOT EXISTS metadatos (
+    {", ".join(f"{_q(c)} {'REAL' if c == 'KPI Score' else 'TEXT'}" for c in COLUMNAS_METADATOS)}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_metadatos_archivo ON metadatos("Archivo") WHERE "Estado" != 'Rechazado';
+CREATE INDEX IF NOT EXISTS idx_metadatos_estado ON metadatos("Estado");
+CREATE INDEX IF NOT EXISTS idx_metadatos_campana ON metadatos("Campaña");
+-- Búsqueda por Archivo en cualquier estado (el índice único excluye los rechazados)
+CREATE INDEX IF NOT EXISTS idx_metadatos_archivo_todos ON metadatos("Archivo");
+
+-- Archivos de metadatos ya cargados, por hash de su contenido: volver a subir el mismo archivo no hace nada
+CREATE TABLE IF NOT EXISTS cargas (
+    hash TEXT PRIMARY KEY,
+    nombre TEXT,
+    filas INTEGER NOT NULL DEFAULT 0,
+    agregados INTEGER NOT NULL DEFAULT 0,
+    duplicados INTEGER NOT NULL DEFAULT 0,
+    rechazados INTEGER NOT NULL DEFAULT 0,
+    cargado_en TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS corridas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    inicio TEXT NOT NULL,
+    fin TEXT,
+    estado TEXT NOT NULL,
+    pendientes INTEGER NOT NULL DEFAULT 0,
+    procesadas INTEGER NOT NULL DEFAULT 0,
+    errores INTEGER NOT NULL DEFAULT 0,
+    "dueño" TEXT
+);
+
+CREATE TABLE IF NOT EXISTS metricas_llamadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    {", ".join(f"{_q(c)} {'TEXT' if c in ('Archivo', 'procesado_en', 'motor', 'modelo') else 'REAL'}" for c in COLUMNAS_METRICAS)}
+);
+CREATE INDEX IF NOT EXISTS idx_metricas_procesado ON metricas_llamadas("procesado_en");
+CREATE INDEX IF NOT EXISTS idx_metricas_archivo ON metricas_llamadas("Archivo");
+
+-- Fragmentos de reparto.py ya pasados a la base, por (lote, token de su arriendo)
+CREATE TABLE IF NOT EXISTS lotes_fusionados (
+    lote TEXT NOT NULL,
+    token TEXT NOT NULL,
+    corrida INTEGER NOT NULL,
+    PRIMARY KEY (lote, token)
+);
+
+CREATE TABLE IF NOT EXISTS trabajos (
+    "Archivo" TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    firma TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    disponible_en TEXT NOT NULL,
+    encolado_en TEXT NOT NULL,
+    actualizado_en TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos(estado, disponible_en);
+
+-- id explícito: el índice de texto apunta a él y un VACUUM no lo renumera (el rowid implícito sí)
+-- revision sube cada vez que cambia el texto (recalcular.py solo vuelve a tokenizar esas)
+CREATE TABLE IF NOT EXISTS transcripciones (
+    id INTEGER PRIMARY KEY,
+    "Archivo" TEXT NOT NULL UNIQUE,
+    texto TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+-- Índice de texto completo sobre transcripciones (sin copiar el texto). remove_diacritics 2:
+-- "cargo automatico" encuentra "cargo automático" y al revés
+CREATE VIRTUAL TABLE IF NOT EXISTS transcripciones_fts USING fts5(
+    texto, content='transcripciones', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS trg_transcripciones_ins AFTER INSERT ON transcripciones BEGIN
+    INSERT INTO transcripciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_transcripciones_del AFTER DELETE ON transcripciones BEGIN
+    INSERT INTO transcripciones_fts(transcripciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_transcripciones_upd AFTER UPDATE ON transcripciones BEGIN
+    INSERT INTO transcripciones_fts(transcripciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    INSERT INTO transcripciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+
+-- Perfiles por agente de Mi Desempeño, leídos por clave: serie diaria con medias móviles, posición
+-- en cada campaña y punteros a sus mejores y peores llamadas. Los triggers anotan qué agentes y
+-- campañas cambiaron; actualizar_perfiles los recalcula en la misma transacción que la escritura.
+CREATE TABLE IF NOT EXISTS perfiles_pendientes (
+    "Agente" TEXT NOT NULL,
+    "Campaña" TEXT NOT NULL,
+    PRIMARY KEY ("Agente", "Campaña")
+);
+CREATE TABLE IF NOT EXISTS perfil_agente_dia (
+    "Agente" TEXT NOT NULL,
+    "Fecha" TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    score REAL,
+    media_7d REAL,
+    media_30d REAL,
+    PRIMARY KEY ("Agente", "Fecha")
+);
+CREATE TABLE IF NOT EXISTS perfil_agente_campana (
+    "Campaña" TEXT NOT NULL,
+    "Agente" TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    score REAL,
+    percentil REAL,
+    PRIMARY KEY ("Campaña", "Agente")
+);
+CREATE INDEX IF NOT EXISTS idx_perfil_campana_agente ON perfil_agente_campana("Agente");
+CREATE TABLE IF NOT EXISTS perfil_agente_llamadas (
+    "Agente" TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    "Archivo" TEXT NOT NULL,
+    PRIMARY KEY ("Agente", tipo, posicion)
+);
+"""
+
+# Aparte del esquema para poder suspenderlos en las reescrituras masivas, como los de los rollups
+# ON CONFLICT DO NOTHING y no INSERT OR IGNORE: dentro de un trigger, la política de conflicto
+# de la sentencia externa (el upsert de llamadas) reemplaza a la del OR
+TRIGGERS_PERFILES = [
+    """CREATE TRIGGER IF NOT EXISTS trg_perfiles_ins AFTER INSERT ON llamadas WHEN NEW."Agente" IS NOT NULL BEGIN
+    INSERT INTO perfiles_pendientes SELECT NEW."Agente", COALESCE(NEW."Campaña", '') WHERE 1 ON CONFLICT DO NOTHING;
+END;""",
+    """CREATE TRIGGER IF NOT EXISTS trg_perfiles_upd AFTER UPDATE ON llamadas BEGIN
+    INSERT INTO perfiles_pendientes SELECT OLD."Agente", COALESCE(OLD."Campaña", '') WHERE OLD."Agente" IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    INSERT INTO perfiles_pendientes SELECT NEW."Agente", COALESCE(NEW."Campaña", '') WHERE NEW."Agente" IS NOT NULL
+        ON CONFLICT DO NOTHING;
+END;""",
+    """CREATE TRIGGER IF NOT EXISTS trg_perfiles_del AFTER DELETE ON llamadas WHEN OLD."Agente" IS NOT NULL BEGIN
+    INSERT INTO perfiles_pendientes SELECT OLD."Agente", COALESCE(OLD."Campaña", '') WHERE 1 ON CONFLICT DO NOTHING;
+END;""",
+]
+ESQUEMA += "\n".join(TRIGGERS_PERFILES) + "\n"
+
+# Rollups de KPIs materializados. Guardan sumas y conteos (no promedios) para poder
+# sumar y restar llamadas de forma incremental; los triggers sobre llamadas los mantienen
+# al día con cada inserción, actualización o borrado. kpi_agente_dia incluye la campaña
+# para que el ranking filtrado por campaña y fechas también salga del rollup.
+ROLLUPS = {
+    "kpi_agente_dia": ["Agente", "Campaña", "Fecha"],
+    "kpi_campana_dia": ["Campaña", "Fecha"],
+    "kpi_agente_campana": ["Agente", "Campaña"],
+}
+
+EVALUACIONES = {
+    "Evaluación WPM": ["Adecuada", "Lenta", "Rápida"],
+    "Evaluación Fricción": ["Alta", "Baja", "Media"],
+}
+
+MEDIDAS = [("n", None), ("suma_score", "Score Total"), ("suma_apego", "Apego al Guion (%)"),
+           ("suma_wpm", "WPM"), ("suma_friccion", "Friccion (%)")]
+MEDIDAS += [(f"suma_{b}", f"% {b}") for b in BLOQUES]
+MEDIDAS += [(f"n_{col}_{v}", (col, v)) for col, valores in EVALUACIONES.items() for v in valores]
+
+def _expresion(origen, fila, signo):
+    if origen is None:
+        return f"{signo}1"
+    if isinstance(origen, tuple):
+        col, valor = origen
+        return f"{signo}COALESCE({fila}.{_q(col)} = '{valor}', 0)"
+    return f"{signo}COALESCE({fila}.{_q(origen)}, 0)"
+
+def _sql_rollup(tabla, claves, fila, signo):
+    columnas = [_q(c) for c in claves] + [_q(m) for m, _ in MEDIDAS]
+    valores = [f"{fila}.{_q(c)}" for c in claves] + [_expresion(o, fila, signo) for _, o in MEDIDAS]
+    condicion = " AND ".join(f"{fila}.{_q(c)} IS NOT NULL" for c in claves + ["Score Total"])
+    actualizar = ", ".join(f"{_q(m)} = {_q(m)} + excluded.{_q(m)}" for m, _ in MEDIDAS)
+    return (f"INSERT INTO {tabla} ({', '.join(columnas)}) SELECT {', '.join(valores)} WHERE {condicion} "
+            f"ON CONFLICT({', '.join(_q(c) for c in claves)}) DO UPDATE SET {actualizar};")
+
+def _tablas_rollups():
+    sentencias = []
+    for tabla, claves in ROLLUPS.items():
+        columnas = [f"{_q(c)} TEXT NOT NULL" for c in claves]
+        columnas += [f"{_q(m)} {'INTEGER' if m.startswith('n') else 'REAL'} NOT NULL DEFAULT 0" for m, _ in MEDIDAS]
+        sentencias.append(f"CREATE TABLE IF NOT EXISTS {tabla} ({', '.join(columnas)}, "
+                          f"PRIMARY KEY ({', '.join(_q(c) for c in claves)}));")
+    return sentencias
+
+def _triggers_rollups():
+    sentencias = []
+    for tabla, claves in ROLLUPS.items():
+        limpiar = f"DELETE FROM {tabla} WHERE n <= 0;"
+        sentencias.append(f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_ins AFTER INSERT ON llamadas BEGIN "
+                          f"{_sql_rollup(tabla, claves, 'NEW', '')} END;")
+        sentencias.append(f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_upd AFTER UPDATE ON llamadas BEGIN "
+                          f"{_sql_rollup(tabla, claves, 'OLD', '-')} {_sql_rollup(tabla, claves, 'NEW', '')} "
+                          f"{limpiar} END;")
+        sentencias.append(f"CREATE TRIGGER IF NOT EXISTS trg_{tabla}_del AFTER DELETE ON llamadas BEGIN "
+                          f"{_sql_rollup(tabla, claves, 'OLD', '-')} {limpiar} END;")
+    return sentencias
+
+ESQUEMA += "\n".join(_tablas_rollups() + _triggers_rollups())
+VERSION_ESQUEMA = 3
+
+# Medias móviles de la serie diaria (días calendario, ponderadas por llamadas) y llamadas destacadas
+VENTANAS_PERFIL = [7, 30]
+LLAMADAS_DESTACADAS = 3
+
+def conectar(path=DB_PATH):
+    nueva = not os.path.exists(path)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    version = 0 if nueva else con.execute("PRAGMA user_version").fetchone()[0]
+    if version >= VERSION_ESQUEMA:
+        return con
+    # Base nueva o de una versión anterior: se crea lo que falte y se migra una sola vez
+    con.executescript(ESQUEMA)
+    if nueva:
+        importar_legado(con)
+    elif version < 1:
+        # Base anterior a los rollups: se calculan una vez desde llamadas
+        reconstruir_rollups(con)
+    if version < 2:
+        # Base anterior al índice de texto: se cargan las transcripciones ya guardadas
+        importar_transcripciones(con)
+    if version < 3:
+        # Base anterior a los perfiles por agente: se calculan una vez para todos
+        with con:
+            con.execute("INSERT OR IGNORE INTO perfiles_pendientes SELECT \"Agente\", \"Campaña\" FROM kpi_agente_campana")
+            _actualizar_perfiles(con)
+    con.execute(f"PRAGMA user_version = {VERSION_ESQUEMA}")
+    return con
+
+def _reconstruir_rollups(con):
+    for tabla, claves in ROLLUPS.items():
+        con.execute(f"DELETE FROM {tabla}")
+        agregados = [f"SUM({_expresion(o, 'llamadas', '')})" for _, o in MEDIDAS]
+        condicion = " AND ".join(f"{_q(c)} IS NOT NULL" for c in claves + ["Score Total"])
+        con.execute(f"INSERT INTO {tabla} ({', '.join(_q(c) for c in claves)}, {', '.join(_q(m) for m, _ in MEDIDAS)}) "
+                    f"SELECT {', '.join(_q(c) for c in claves)}, {', '.join(agregados)} FROM llamadas "
+                    f"WHERE {condicion} GROUP BY {', '.join(_q(c) for c in claves)}")
+
+def reconstruir_rollups(con):
+    with con:
+        _reconstruir_rollups(con)
+
+# Primera conexión: carga resumen.csv y metadatos.xlsx existentes en la base
+def importar_legado(con, resumen_path=RESUMEN_CSV, metadatos_path=METADATOS_XLSX):
+    if os.path.exists(resumen_path):
+        df = pd.read_csv(resumen_path).reindex(columns=COLUMNAS_RESUMEN)
+        upsert_llamadas(con, df.itertuples(index=False))
+    if os.path.exists(metadatos_path):
+        insertar_metadatos(con, pd.read_excel(metadatos_path, sheet_name=HOJA_METADATOS))
+
+# Carga en la base los .txt de transcripciones/ de las llamadas que aún no tienen su texto
+def importar_transcripciones(con, directorio=TRANSCRIPCION_DIR):
+    faltantes = [a for a, in con.execute("SELECT \"Archivo\" FROM llamadas WHERE \"Archivo\" NOT IN "
+                                        "(SELECT \"Archivo\" FROM transcripciones)")]
+    textos = []
+    for archivo in faltantes:
+        ruta = ruta_transcripcion(archivo, directorio)
+        if os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                textos.append((archivo, f.read()))
+    guardar_transcripciones(con, textos)
+    return len(textos)
+
+def _guardar_transcripciones(con, textos):
+    con.executemany("INSERT INTO transcripciones (\"Archivo\", texto) VALUES (?, ?) "
+                    "ON CONFLICT(\"Archivo\") DO UPDATE SET texto = excluded.texto, revision = revision + 1 "
+                    "WHERE texto != excluded.texto",
+                    textos)
+
+def guardar_transcripciones(con, textos):
+    with con:
+        _guardar_transcripciones(con, textos)
+
+def _valor(v):
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if hasattr(v, "item"):
+        return v.item()
+    return v
+
+# ON CONFLICT DO UPDATE (y no INSERT OR REPLACE) para que el trigger de actualización
+# reste la versión anterior de la llamada en los rollups
+def _upsert_llamadas(con, filas):
+    columnas = ", ".join(_q(c) for c in COLUMNAS_RESUMEN)
+    marcas = ", ".join("?" for _ in COLUMNAS_RESUMEN)
+    actualizar = ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in COLUMNAS_RESUMEN[1:])
+    con.executemany(f"INSERT INTO llamadas ({columnas}) VALUES ({marcas}) "
+                    f"ON CONFLICT(\"Archivo\") DO UPDATE SET {actualizar}",
+                    ([_valor(v) for v in fila] for fila in filas))
+
+def upsert_llamadas(con, filas):
+    with con:
+        _upsert_llamadas(con, filas)
+        _actualizar_perfiles(con)
+
+# Para reescrituras grandes (recalcular todo el historial): en vez de ajustar los rollups
+# fila a fila por trigger, se suspenden los triggers y se reconstruyen en una sola pasada.
+def upsert_llamadas_masivo(con, filas):
+    con.commit()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for tabla in list(ROLLUPS) + ["perfiles"]:
+            for operacion in ("ins", "upd", "del"):
+                con.execute(f"DROP TRIGGER IF EXISTS trg_{tabla}_{operacion}")
+        _upsert_llamadas(con, filas)
+        _reconstruir_rollups(con)
+        for sentencia in _triggers_rollups() + TRIGGERS_PERFILES:
+            con.execute(sentencia)
+        # Los perfiles de todos los agentes, en una pasada
+        con.execute("INSERT OR IGNORE INTO perfiles_pendientes SELECT DISTINCT \"Agente\", COALESCE(\"Campaña\", '') "
+                    "FROM llamadas WHERE \"Agente\" IS NOT NULL")
+        _actualizar_perfiles(con)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+
+# Recalcula los perfiles de los agentes anotados en perfiles_pendientes. El costo depende de los días
+# y campañas de esos agentes (y de los agentes de sus campañas), no del total de llamadas.
+def _actualizar_perfiles(con):
+    agentes = [a for a, in con.execute("SELECT DISTINCT \"Agente\" FROM perfiles_pendientes")]
+    if not agentes:
+        return 0
+    pendientes = "(SELECT \"Agente\" FROM perfiles_pendientes)"
+
+    dias = pd.read_sql_query(f"SELECT \"Agente\", \"Fecha\", SUM(n) AS n, SUM(suma_score) AS suma FROM kpi_agente_dia "
+                             f"WHERE \"Agente\" IN {pendientes} GROUP BY \"Agente\", \"Fecha\" "
+                             f"ORDER BY \"Agente\", \"Fecha\"", con)
+    dias = dias[dias["n"] > 0].reset_index(drop=True)
+    dias["score"] = dias["suma"] / dias["n"]
+    fechas = pd.to_datetime(dias["Fecha"])
+    for ventana in VENTANAS_PERFIL:
+        sumas = (dias[["n", "suma"]].set_index(fechas).groupby(dias["Agente"].to_numpy(), sort=False)
+                 .rolling(f"{ventana}D").sum())
+        dias[f"media_{ventana}d"] = (sumas["suma"] / sumas["n"]).to_numpy()
+    con.execute(f"DELETE FROM perfil_agente_dia WHERE \"Agente\" IN {pendientes}")
+    columnas = ["Agente", "Fecha", "n", "score"] + [f"media_{v}d" for v in VENTANAS_PERFIL]
+    con.executemany(f"INSERT INTO perfil_agente_dia ({', '.join(_q(c) for c in columnas)}) "
+                    f"VALUES ({', '.join('?' for _ in columnas)})",
+                    ([_valor(v) for v in fila] for fila in dias[columnas].itertuples(index=False)))
+
+    # Mejores y peores llamadas: LIMIT sobre el índice (Agente, Score Total)
+    con.execute(f"DELETE FROM perfil_agente_llamadas WHERE \"Agente\" IN {pendientes}")
+    for agente in agentes:
+        for tipo, orden in (("mejor", "DESC"), ("peor", "ASC")):
+            archivos = con.execute(f"SELECT \"Archivo\" FROM llamadas WHERE \"Agente\" = ? AND \"Score Total\" IS NOT NULL "
+                                   f"AND \"Fecha\" IS NOT NULL ORDER BY \"Score Total\" {orden} LIMIT ?",
+                                   (agente, LLAMADAS_DESTACADAS)).fetchall()
+            con.executemany("INSERT INTO perfil_agente_llamadas VALUES (?, ?, ?, ?)",
+                            [(agente, tipo, i, archivo) for i, (archivo,) in enumerate(archivos)])
+
+    # Percentil del promedio de cada agente dentro de su campaña (se recalcula la campaña entera)
+    campañas = "(SELECT \"Campaña\" FROM perfiles_pendientes)"
+    agentes_campaña = pd.read_sql_query(f"SELECT \"Campaña\", \"Agente\", n, suma_score FROM kpi_agente_campana "
+                                        f"WHERE \"Campaña\" IN {campañas} AND n > 0", con)
+    agentes_campaña["score"] = agentes_campaña["suma_score"] / agentes_campaña["n"]
+    agentes_campaña["percentil"] = agentes_campaña.groupby("Campaña")["score"].rank(pct=True, method="max") * 100
+    con.execute(f"DELETE FROM perfil_agente_campana WHERE \"Campaña\" IN {campañas}")
+    columnas = ["Campaña", "Agente", "n", "score", "percentil"]
+    con.executemany(f"INSERT INTO perfil_agente_campana ({', '.join(_q(c) for c in columnas)}) VALUES (?, ?, ?, ?, ?)",
+                    ([_valor(v) for v in fila] for fila in agentes_campaña[columnas].itertuples(index=False)))
+
+    con.execute("DELETE FROM perfiles_pendientes")
+    return len(agentes)
+
+def actualizar_perfiles(con):
+    with con:
+        return _actualizar_perfiles(con)
+
+# Perfil de un agente: {"serie", "campañas", "destacadas"}, todo por clave de Agente
+def leer_perfil(con, agente):
+    serie = pd.read_sql_query("SELECT \"Fecha\", n AS \"Llamadas\", score AS \"Score Total\", "
+                              + ", ".join(f"media_{v}d AS \"Media {v} días\"" for v in VENTANAS_PERFIL)
+                              + " FROM perfil_agente_dia WHERE \"Agente\" = ? ORDER BY \"Fecha\"", con, params=[agente])
+    serie["Fecha"] = pd.to_datetime(serie["Fecha"])
+    campañas = pd.read_sql_query("SELECT \"Campaña\", n AS \"Llamadas\", score AS \"Score Total\", "
+                                 "percentil AS \"Percentil\" FROM perfil_agente_campana WHERE \"Agente\" = ? "
+                                 "ORDER BY \"Campaña\"", con, params=[agente])
+    destacadas = pd.read_sql_query("SELECT p.tipo, l.\"Archivo\", l.\"Fecha\", l.\"Score Total\", l.\"Evaluación WPM\", "
+                                   "l.\"Evaluación Fricción\", l.\"Preview\" FROM perfil_agente_llamadas p "
+                                   "JOIN llamadas l ON l.\"Archivo\" = p.\"Archivo\" WHERE p.\"Agente\" = ? "
+                                   "ORDER BY p.tipo, p.posicion", con, params=[agente])
+    return {"serie": serie, "campañas": campañas, "destacadas": destacadas}
+
+# alias: prefijo de tabla de las columnas (p. ej. "l.") cuando la consulta tiene joins
+def _filtros(agente=None, campaña=None, desde=None, hasta=None, score_min=None, score_max=None, alias=""):
+    condiciones, params = [], []
+    if agente is not None:
+        condiciones.append(f'{alias}"Agente" = ?')
+        params.append(agente)
+    if campaña is not None:
+        condiciones.append(f'{alias}"Campaña" = ?')
+        params.append(campaña)
+    if desde is not None:
+        condiciones.append(f'{alias}"Fecha" >= ?')
+        params.append(pd.to_datetime(desde).strftime("%Y-%m-%d"))
+    if hasta is not None:
+        condiciones.append(f'{alias}"Fecha" <= ?')
+        params.append(pd.to_datetime(hasta).strftime("%Y-%m-%d"))
+    if score_min is not None:
+        condiciones.append(f'{alias}"Score Total" >= ?')
+        params.append(score_min)
+    if score_max is not None:
+        condiciones.append(f'{alias}"Score Total" <= ?')
+        params.append(score_max)
+    where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    return where, params
+
+# Lee solo las filas (y columnas) que piden los filtros, usando los índices.
+# orden: [(columna, descendente), ...]; con limite/desplazamiento se lee una página (Archivo
+# desempata, así las páginas no se solapan).
+def leer_llamadas(con, columnas=None, orden=None, limite=None, desplazamiento=0, **filtros):
+    where, params = _filtros(**filtros)
+    seleccion = ", ".join(_q(c) for c in columnas) if columnas else "*"
+    sql = f"SELECT {seleccion} FROM llamadas{where}"
+    if orden:
+        sql += " ORDER BY " + ", ".join(f"{_q(c)} {'DESC' if desc else 'ASC'}" for c, desc in orden) + ', "Archivo"'
+    if limite is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params = params + [limite, desplazamiento]
+    df = pd.read_sql_query(sql, con, params=params)
+    for c in COLUMNAS_BOOL:
+        if c in df.columns:
+            df[c] = df[c].astype("boolean")
+    if "Fecha" in df.columns:
+        df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
+    return df
+
+def contar_llamadas(con, **filtros):
+    where, params = _filtros(**filtros)
+    return con.execute(f"SELECT COUNT(*) FROM llamadas{where}", params).fetchone()[0]
+
+def valores_distintos(con, columna, tabla="llamadas"):
+    filas = con.execute(f"SELECT DISTINCT {_q(columna)} FROM {tabla} WHERE {_q(columna)} IS NOT NULL "
+                        f"ORDER BY {_q(columna)}").fetchall()
+    return [f[0] for f in filas]
+
+def rango(con, columna, **filtros):
+    where, params = _filtros(**filtros)
+    return con.execute(f"SELECT MIN({_q(columna)}), MAX({_q(columna)}) FROM llamadas{where}", params).fetchone()
+
+def consultar(con, sql, params=()):
+    return pd.read_sql_query(sql, con, params=list(params))
+
+def exportar_resumen_csv(con, path=RESUMEN_CSV):
+    cursor = con.execute(f"SELECT {', '.join(_q(c) for c in COLUMNAS_RESUMEN)} FROM llamadas ORDER BY rowid")
+    bools = [COLUMNAS_RESUMEN.index(c) for c in COLUMNAS_BOOL]
+
+    def escribir(f):
+        writer = csv.writer(f)
+        writer.writerow(COLUMNAS_RESUMEN)
+        for fila in cursor:
+            fila = list(fila)
+            for i in bools:
+                if fila[i] is not None:
+                    fila[i] = bool(fila[i])
+            writer.writerow(fila)
+
+    resultados.escribir_atomico(path, escribir, newline="", encoding="utf-8")
+
+# Metadatos
+def leer_metadatos(con, campaña=None, estado=None, agente=None):
+    condiciones, params = [], []
+    if campaña is not None:
+        condiciones.append('"Campaña" = ?')
+        params.append(campaña)
+    if agente is not None:
+        condiciones.append('"Agente" = ?')
+        params.append(agente)
+    if estado is not None:
+        condiciones.append('"Estado" = ?')
+        params.append(estado)
+    where = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+    return pd.read_sql_query(f"SELECT * FROM metadatos{where} ORDER BY rowid", con, params=params)
+
+# Filas listas para executemany: texto salvo KPI Score, None en los vacíos (por columnas, sin recorrer celdas)
+def _filas_metadatos(df):
+    df = df.reindex(columns=COLUMNAS_METADATOS)
+    valores = np.empty(df.shape, dtype=object)
+    for i, c in enumerate(COLUMNAS_METADATOS):
+        columna = df[c] if c == "KPI Score" else df[c].astype(str)
+        valores[:, i] = columna.to_numpy(dtype=object)
+    valores[df.isna().to_numpy()] = None
+    return valores.tolist()
+
+# Inserta filas nuevas; un Archivo ya registrado (no rechazado) se ignora
+def insertar_metadatos(con, df):
+    columnas = ", ".join(_q(c) for c in COLUMNAS_METADATOS)
+    marcas = ", ".join("?" for _ in COLUMNAS_METADATOS)
+    with con:
+        antes = con.total_changes
+        con.executemany(f"INSERT OR IGNORE INTO metadatos ({columnas}) VALUES ({marcas})", _filas_metadatos(df))
+        return con.total_changes - antes
+
+# Filas rechazadas en una carga: se guardan una vez por Archivo, así repetir la carga no las duplica
+def insertar_rechazados(con, df):
+    columnas = ", ".join(_q(c) for c in COLUMNAS_METADATOS)
+    marcas = ", ".join("?" for _ in COLUMNAS_METADATOS)
+    posicion = COLUMNAS_METADATOS.index("Archivo")
+    with con:
+        antes = con.total_changes
+        con.executemany(f"INSERT INTO metadatos ({columnas}) SELECT {marcas} "
+                        f"WHERE NOT EXISTS (SELECT 1 FROM metadatos WHERE \"Archivo\" = ?)",
+                        (fila + [fila[posicion]] for fila in _filas_metadatos(df)))
+        return con.total_changes - antes
+
+def leer_carga(con, hash_archivo):
+    fila = con.execute("SELECT hash, nombre, filas, agregados, duplicados, rechazados, cargado_en FROM cargas "
+                       "WHERE hash = ?", (hash_archivo,)).fetchone()
+    if fila is None:
+        return None
+    return dict(zip(["hash", "nombre", "filas", "agregados", "duplicados", "rechazados", "cargado_en"], fila))
+
+def registrar_carga(con, hash_archivo, nombre, filas, agregados, duplicados, rechazados, ahora):
+    with con:
+        con.execute("INSERT OR REPLACE INTO cargas (hash, nombre, filas, agregados, duplicados, rechazados, cargado_en) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (hash_archivo, nombre, filas, agregados, duplicados, rechazados, ahora))
+
+def actualizar_metadato(con, archivo, **campos):
+    asignaciones = ", ".join(f"{_q(c)} = ?" for c in campos)
+    con.execute(f"UPDATE metadatos SET {asignaciones} WHERE \"Archivo\" = ? AND \"Estado\" != 'Rechazado'",
+                [_valor(v) for v in campos.values()] + [archivo])
+
+# Corridas de transcriptor.py: cada punto de control guarda en una sola transacción las filas
+# de resumen, el Estado de sus metadatos y el avance, así una corrida interrumpida no pierde
+# lo ya guardado y la siguiente retoma solo lo que quedó Pendiente.
+def iniciar_corrida(con, pendientes, ahora):
+    with con:
+        # Solo se dan por interrumpidas las corridas cuyo proceso ya no existe: el servicio, una
+        # corrida de transcriptor.py y una fusión de reparto.py pueden estar en curso a la vez
+        en_curso = con.execute("SELECT id, inicio, procesadas, \"dueño\" FROM corridas "
+                               "WHERE estado = 'En curso'").fetchall()
+        interrumpidas = [fila[:3] for fila in en_curso if not _dueño_vivo(fila[3])]
+        con.executemany("UPDATE corridas SET estado = 'Interrumpida' WHERE id = ?", [(f[0],) for f in interrumpidas])
+        corrida = con.execute("INSERT INTO corridas (inicio, estado, pendientes, \"dueño\") VALUES (?, 'En curso', ?, ?)",
+                              (ahora, pendientes, f"{socket.gethostname()}:{os.getpid()}")).lastrowid
+    return corrida, interrumpidas
+
+# Dueño "máquina:pid" de una corrida; la base es local, así que otra máquina cuenta como terminado
+def _dueño_vivo(dueño):
+    maquina, _, pid = (dueño or "").rpartition(":")
+    if maquina != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# Corridas abiertas por tandas (servicio.py): suma las llamadas de cada tanda a sus pendientes
+def sumar_pendientes(con, corrida, pendientes):
+    with con:
+        con.execute("UPDATE corridas SET pendientes = pendientes + ? WHERE id = ?", (pendientes, corrida))
+
+# textos: (Archivo, transcripción completa) para el índice de búsqueda.
+# metricas: un dict por llamada con COLUMNAS_METRICAS; el tiempo de esta escritura se reparte
+# entre las llamadas del punto de control y se suma a su escritura_ms.
+# fusion: (lote, token) de un fragmento de reparto.py; se anota en la misma transacción y, si ya
+# estaba anotado, no se escribe nada. Devuelve False solo en ese caso.
+def guardar_avance(con, corrida, filas, errores, ahora, metricas=(), textos=(), fusion=None):
+    score = COLUMNAS_RESUMEN.index("Score Total")
+    inicio = time.perf_counter()
+    with con:
+        if fusion is not None and not con.execute("INSERT INTO lotes_fusionados (lote, token, corrida) VALUES (?, ?, ?) "
+                                                  "ON CONFLICT DO NOTHING", (*fusion, corrida)).rowcount:
+            return False
+        _upsert_llamadas(con, filas)
+        _actualizar_perfiles(con)
+        _guardar_transcripciones(con, textos)
+        con.executemany("UPDATE metadatos SET \"Estado\" = 'Procesado', \"Fecha Procesado\" = ?, \"updated_at\" = ?, "
+                        "\"KPI Score\" = ? WHERE \"Archivo\" = ? AND \"Estado\" != 'Rechazado'",
+                        [(ahora, ahora, _valor(f[score]), f[0]) for f in filas])
+        if metricas:
+            parte = (time.perf_counter() - inicio) * 1000 / len(metricas)
+            metricas = [{**m, "corrida": corrida, "escritura_ms": round(m["escritura_ms"] + parte, 1)} for m in metricas]
+            con.executemany(f"INSERT INTO metricas_llamadas ({', '.join(_q(c) for c in COLUMNAS_METRICAS)}) "
+                            f"VALUES ({', '.join('?' for _ in COLUMNAS_METRICAS)})",
+                            [[_valor(m.get(c)) for c in COLUMNAS_METRICAS] for m in metricas])
+        con.execute("UPDATE corridas SET procesadas = procesadas + ?, errores = errores + ? WHERE id = ?",
+                    (len(filas), errores, corrida))
+    return True
+
+def cerrar_corrida(con, corrida, ahora):
+    with con:
+        con.execute("UPDATE corridas SET estado = 'Completada', fin = ? WHERE id = ?", (ahora, corrida))
+
+# Cola de trabajos de servicio.py: un trabajo por audio de audios/ con estado pendiente,
+# en_proceso, hecho o fallido. La firma (mtime:tamaño) detecta un audio reemplazado, que vuelve
+# a la cola; un audio cuya fila de metadatos vuelve a Pendiente también se reprocesa.
+ESTADOS_TRABAJO = ["pendiente", "en_proceso", "hecho", "fallido"]
+
+def encolar_trabajos(con, firmas, ahora):
+    with con:
+        antes = con.total_changes
+        # Un audio que aparece ya Procesado (p. ej. por una corrida de transcriptor.py) no se repite
+        con.executemany(
+            "INSERT INTO trabajos (\"Archivo\", estado, firma, disponible_en, encolado_en, actualizado_en) "
+            "VALUES (?, CASE WHEN EXISTS (SELECT 1 FROM metadatos WHERE \"Archivo\" = ? AND \"Estado\" = 'Procesado') "
+            "THEN 'hecho' ELSE 'pendiente' END, ?, ?, ?, ?) "
+            "ON CONFLICT(\"Archivo\") DO UPDATE SET estado = 'pendiente', firma = excluded.firma, intentos = 0, "
+            "error = NULL, disponible_en = excluded.disponible_en, actualizado_en = excluded.actualizado_en "
+            "WHERE trabajos.firma IS NOT excluded.firma AND trabajos.estado != 'en_proceso'",
+            [(archivo, archivo, firma, ahora, ahora, ahora) for archivo, firma in firmas.items()])
+        con.execute("UPDATE trabajos SET estado = 'pendiente', intentos = 0, error = NULL, disponible_en = ?, "
+                    "actualizado_en = ? WHERE estado = 'hecho' AND \"Archivo\" IN "
+                    "(SELECT \"Archivo\" FROM metadatos WHERE \"Estado\" = 'Pendiente')", (ahora, ahora))
+        return con.total_changes - antes
+
+# Reclama hasta limite trabajos listos (con metadatos y fuera de su espera de reintento) y
+# devuelve sus filas de metadatos. El intento se cuenta al tomarlo: un audio que tumba el
+# proceso también agota sus reintentos.
+def tomar_trabajos(con, limite, ahora):
+    with con:
+        archivos = [a for a, in con.execute(
+            "UPDATE trabajos SET estado = 'en_proceso', intentos = intentos + 1, actualizado_en = ? "
+            "WHERE \"Archivo\" IN (SELECT t.\"Archivo\" FROM trabajos t WHERE t.estado = 'pendiente' "
+            "AND t.disponible_en <= ? AND EXISTS (SELECT 1 FROM metadatos m WHERE m.\"Archivo\" = t.\"Archivo\" "
+            "AND m.\"Estado\" != 'Rechazado') ORDER BY t.encolado_en LIMIT ?) RETURNING \"Archivo\"",
+            (ahora, ahora, limite))]
+    if not archivos:
+        return []
+    marcas = ", ".join("?" for _ in archivos)
+    df = pd.read_sql_query("SELECT \"Archivo\", \"Agente\", \"Campaña\", \"Fecha Llamada\" FROM metadatos "
+                           f"WHERE \"Archivo\" IN ({marcas}) AND \"Estado\" != 'Rechazado'", con, params=archivos)
+    # None y no NaN en los campos vacíos: preparar_audio los rechaza como datos incompletos
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def terminar_trabajos(con, archivos, ahora):
+    with con:
+        con.executemany("UPDATE trabajos SET estado = 'hecho', error = NULL, actualizado_en = ? WHERE \"Archivo\" = ?",
+                        [(ahora, a) for a in archivos])
+
+# Un fallo vuelve a la cola con espera exponencial (espera_s, 2*espera_s, ...) hasta max_intentos
+def fallar_trabajo(con, archivo, motivo, ahora, max_intentos, espera_s):
+    with con:
+        con.execute("UPDATE trabajos SET estado = CASE WHEN intentos >= ? THEN 'fallido' ELSE 'pendiente' END, "
+                    "error = ?, actualizado_en = ?, "
+                    "disponible_en = datetime(?, '+' || (? * (1 << MAX(intentos - 1, 0))) || ' seconds') "
+                    "WHERE \"Archivo\" = ?", (max_intentos, motivo, ahora, ahora, int(espera_s), archivo))
+
+# Devuelve a la cola trabajos tomados y no terminados. descontar=True: se cortó el servicio,
+# no el audio, así que ese intento no cuenta.
+def liberar_trabajos(con, ahora, archivos=None, descontar=False):
+    condicion = "estado = 'en_proceso'"
+    params = [ahora]
+    if archivos is not None:
+        condicion += f" AND \"Archivo\" IN ({', '.join('?' for _ in archivos)})"
+        params += list(archivos)
+    with con:
+        return con.execute(f"UPDATE trabajos SET estado = 'pendiente', actualizado_en = ?"
+                           f"{', intentos = MAX(intentos - 1, 0)' if descontar else ''} WHERE {condicion}",
+                           params).rowcount
+
+def reintentar_fallidos(con, ahora):
+    with con:
+        return con.execute("UPDATE trabajos SET estado = 'pendiente', intentos = 0, disponible_en = ?, "
+                           "actualizado_en = ? WHERE estado = 'fallido'", (ahora, ahora)).rowcount
+
+def firmas_trabajos(con):
+    return dict(con.execute("SELECT \"Archivo\", firma FROM trabajos"))
+
+# Conteo por estado; "sin_metadatos": pendientes que esperan su fila de metadatos
+def resumen_trabajos(con):
+    conteos = dict.fromkeys(ESTADOS_TRABAJO, 0)
+    conteos.update(con.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado"))
+    conteos["sin_metadatos"] = con.execute(
+        "SELECT COUNT(*) FROM trabajos t WHERE estado = 'pendiente' AND NOT EXISTS "
+        "(SELECT 1 FROM metadatos m WHERE m.\"Archivo\" = t.\"Archivo\" AND m.\"Estado\" != 'Rechazado')"
+    ).fetchone()[0]
+    return conteos
+
+def leer_metricas(con, desde=None, hasta=None):
+    condiciones, params = [], []
+    if desde is not None:
+        condiciones.append("m.\"procesado_en\" >= ?")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("m.\"procesado_en\" < date(?, '+1 day')")
+        params.append(hasta)
+    donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    df = consultar(con, f"SELECT m.*, l.\"Agente\", l.\"Campaña\" FROM metricas_llamadas m "
+                        f"LEFT JOIN llamadas l ON l.\"Archivo\" = m.\"Archivo\" {donde} ORDER BY m.\"procesado_en\"", params)
+    df["procesado_en"] = pd.to_datetime(df["procesado_en"])
+    df["vad"] = df["vad"].astype(bool)
+    df["cache"] = df["cache"].astype(bool)
+    return df
+
+def leer_transcripcion(con, archivo):
+    fila = con.execute("SELECT texto FROM transcripciones WHERE \"Archivo\" = ?", (archivo,)).fetchone()
+    return fila[0] if fila else None
+
+# {Archivo: revision} de todas las transcripciones, sin leer los textos
+def revisiones_transcripciones(con):
+    return dict(con.execute("SELECT \"Archivo\", revision FROM transcripciones"))
+
+# {Archivo: texto} de las llamadas pedidas (de a 500 parámetros por consulta)
+def leer_transcripciones(con, archivos):
+    archivos, textos = list(archivos), {}
+    for desde in range(0, len(archivos), 500):
+        parte = archivos[desde:desde + 500]
+        textos.update(con.execute(f"SELECT \"Archivo\", texto FROM transcripciones WHERE \"Archivo\" IN "
+                                  f"({', '.join('?' for _ in parte)})", parte))
+    return textos
+
+# Consulta FTS5 desde el texto que escribe el usuario: "frase" exige las palabras seguidas,
+# "palabras" todas en cualquier orden; "avanzada" pasa la sintaxis de FTS5 tal cual (OR, NEAR, prefijo*)
+def consulta_fts(texto, modo="frase"):
+    if modo == "avanzada":
+        return texto
+    palabras = texto.replace('"', " ").split()
+    if modo == "frase":
+        return '"' + " ".join(palabras) + '"'
+    return " ".join(f'"{p}"' for p in palabras)
+
+# Llamadas cuya transcripción coincide con la consulta, con un fragmento resaltado (**así**).
+# Devuelve (página de resultados ordenada por relevancia, total de coincidencias).
+def buscar_transcripciones(con, consulta, agente=None, campaña=None, desde=None, hasta=None, limite=50):
+    where, params = _filtros(agente=agente, campaña=campaña, desde=desde, hasta=hasta, alias="l.")
+    # CROSS JOIN fija el orden: primero el índice de texto y después los filtros sobre sus
+    # coincidencias (si no, SQLite puede recorrer las llamadas del agente y repetir la búsqueda en cada una)
+    desde_sql = ("FROM transcripciones_fts CROSS JOIN transcripciones t ON t.id = transcripciones_fts.rowid "
+                 "CROSS JOIN llamadas l ON l.\"Archivo\" = t.\"Archivo\" WHERE transcripciones_fts MATCH ?"
+                 + where.replace(" WHERE ", " AND ", 1))
+    total = con.execute(f"SELECT COUNT(*) {desde_sql}", [consulta] + params).fetchone()[0]
+    df = pd.read_sql_query(
+        "SELECT l.\"Archivo\", l.\"Fecha\", l.\"Agente\", l.\"Campaña\", l.\"Score Total\" AS \"Score\", "
+        f"snippet(transcripciones_fts, 0, '**', '**', ' … ', 24) AS \"Fragmento\" {desde_sql} "
+        "ORDER BY rank LIMIT ?", con, params=[consulta] + params + [limite])
+    return df, total
+
+def exportar_metadatos_xlsx(con, path=METADATOS_XLSX, hoja=HOJA_METADATOS):
+    resultados.guardar_excel(path, leer_metadatos(con), hoja)
+
+# Rollups: sumas agrupadas por las columnas pedidas, filtradas por agente/campaña/fechas
+def leer_rollup(con, tabla, agrupar, agente=None, campaña=None, desde=None, hasta=None):
+    where, params = _filtros(agente=agente, campaña=campaña, desde=desde, hasta=hasta)
+    grupo = ", ".join(_q(c) for c in agrupar)
+    sumas = ", ".join(f"SUM({_q(m)}) AS {_q(m)}" for m, _ in MEDIDAS)
+    sql = f"SELECT {grupo + ', ' if grupo else ''}{sumas} FROM {tabla}{where}"
+    if agrupar:
+        sql += f" GROUP BY {grupo} ORDER BY {grupo}"
+    df = pd.read_sql_query(sql, con, params=params)
+    return df[df["n"].fillna(0) > 0].reset_index(drop=True)
+
+# Convierte sumas de un rollup en promedios y modas con los nombres de columna de resumen.csv
+def promedios_rollup(df, agrupar):
+    n = df["n"]
+    out = df[agrupar].copy()
+    out["Llamadas"] = n
+    out["Score Total"] = df["suma_score"] / n
+    out["Apego al Guion (%)"] = df["suma_apego"] / n
+    out["WPM"] = df["suma_wpm"] / n
+    out["Friccion (%)"] = df["suma_friccion"] / n
+    for col, valores in EVALUACIONES.items():
+        conteos = df[[f"n_{col}_{v}" for v in valores]].to_numpy()
+        # Empates: gana el primero en orden alfabético, igual que Series.mode()
+        out[col] = [valores[i] if fila[i] > 0 else "" for fila, i in zip(conteos, conteos.argmax(axis=1))]
+    for b in BLOQUES:
+        out[f"% {b}"] = df[f"suma_{b}"] / n
+    return out
@@ -0,0 +1,43 @@
+import time
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Decodificación de audio una sola vez por llamada: ffmpeg entrega PCM mono a 16 kHz, que es
+# lo que espera Whisper, y la duración sale del número de muestras (sin un ffmpeg.probe aparte).
+SAMPLE_RATE = 16000
+
+def decodificar(path_audio, sr=SAMPLE_RATE):
+    import ffmpeg
+    try:
+        salida, _ = (
+            ffmpeg.input(path_audio, threads=0)
+            .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=sr)
+            .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise RuntimeError(f"No se pudo decodificar {path_audio}: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(salida, np.int16).astype(np.float32) / 32768.0
+
+def duracion(muestras, sr=SAMPLE_RATE):
+    return len(muestras) / sr
+
+# Productor/consumidor: hilos en segundo plano preparan (decodifican) las próximas k filas
+# mientras el consumidor usa la actual. Como mucho hay k filas preparadas por delante, así la
+# memoria queda acotada por k audios decodificados. Entrega (fila, preparada, segundos) en orden.
+def precargar(filas, preparar, k=2):
+    def medir(fila):
+        inicio = time.perf_counter()
+        return preparar(fila), time.perf_counter() - inicio
+
+    filas = iter(filas)
+    with ThreadPoolExecutor(max_workers=max(1, k), thread_name_prefix="decodificar") as ejecutor:
+        en_curso = deque((fila, ejecutor.submit(medir, fila)) for fila in itertools.islice(filas, max(1, k)))
+        while en_curso:
+            fila, futuro = en_curso.popleft()
+            preparada, segundos = futuro.result()
+            siguiente = next(filas, None)
+            if siguiente is not None:
+                en_curso.append((siguiente, ejecutor.submit(medir, siguiente)))
+            yield fila, preparada, segundos
@@ -0,0 +1,80 @@
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kpis import SALUDOS, CONSENTIMIENTO, CIERRES, PRECIOS, OBJECIONES, AFIRMACIONES, detector
+
+# Micro-benchmark: detección de frases por llamada con las funciones anteriores de
+# transcriptor.py (una búsqueda por subcadena por lista) vs el autómata de una pasada.
+
+def contiene_frases(texto, frases):
+    return any(f in texto.lower() for f in frases)
+
+def detectar_anterior(texto):
+    lower_text = texto.lower()
+    friccion = 0
+    for frase in OBJECIONES:
+        if frase in texto.lower():
+            friccion += 1
+    return (
+        contiene_frases(texto, SALUDOS),
+        contiene_frases(texto, OBJECIONES),
+        contiene_frases(texto, CIERRES),
+        contiene_frases(texto, PRECIOS),
+        contiene_frases(lower_text, CONSENTIMIENTO),
+        any(p in lower_text for p in AFIRMACIONES),
+        friccion,
+    )
+
+def detectar_automata(texto):
+    hits = detector.buscar(texto)
+    return (
+        hits["saludo"]["conteo"] > 0,
+        hits["objecion"]["conteo"] > 0,
+        hits["cierre"]["conteo"] > 0,
+        hits["precio"]["conteo"] > 0,
+        hits["consentimiento"]["conteo"] > 0,
+        hits["afirmacion"]["conteo"] > 0,
+        len(set(hits["objecion"]["frases"])),
+    )
+
+def medir(funcion, textos, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto in textos:
+            funcion(texto)
+    return (time.perf_counter() - inicio) / (repeticiones * len(textos))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara la detección de frases anterior con el autómata.")
+    parser.add_argument("--dir", default="transcripciones", help="Carpeta con transcripciones .txt")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--multiplicar", type=int, default=1,
+                        help="Concatena cada transcripción N veces para simular llamadas largas")
+    args = parser.parse_args()
+
+    textos = []
+    for ruta in sorted(glob.glob(os.path.join(args.dir, "*.txt"))):
+        with open(ruta, encoding="utf-8") as f:
+            textos.append(" ".join([f.read()] * args.multiplicar))
+    if not textos:
+        print(f"No hay transcripciones en {args.dir}/")
+        return
+
+    # La versión anterior repite lower() y recorre el texto una vez por frase y por lista
+    t_anterior = medir(detectar_anterior, textos, args.repeticiones)
+    t_automata = medir(detectar_automata, textos, args.repeticiones)
+    diferencias = sum(detectar_anterior(t) != detectar_automata(t) for t in textos)
+
+    palabras = sum(len(t.split()) for t in textos) / len(textos)
+    print(f"Transcripciones: {len(textos)} (≈{palabras:.0f} palabras cada una)")
+    print(f"Anterior:  {t_anterior * 1e6:8.1f} µs/llamada")
+    print(f"Autómata:  {t_automata * 1e6:8.1f} µs/llamada")
+    print(f"Aceleración: {t_anterior / t_automata:.2f}x")
+    print(f"Llamadas con detección distinta (límites de palabra / acentos): {diferencias}")
+
+if __name__ == "__main__":
+    main()
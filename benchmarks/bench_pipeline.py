@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Benchmark de extremo a extremo con llamadas sintéticas. Genera N audios WAV (tono de llamada,
+# tramos de "voz" y silencios), sus metadatos y guiones de campaña en una carpeta temporal, y
+# corre el pipeline de transcriptor.py etapa por etapa midiendo cada llamada:
+#   metadatos -> decodificación -> inferencia -> KPIs -> escritura
+# Escribe en JSON el rendimiento (llamadas/hora), la latencia p50/p95 por llamada y por etapa y
+# el pico de memoria (RSS), para comparar corridas entre commits en una CPU común.
+#
+#   python benchmarks/bench_pipeline.py --llamadas 50 --duracion 60 180 --motor falso
+
+SR = 16000
+AGENTES = ["Ana Aguirre", "Claudia Diaz", "Pedro Soto", "Javier Rojas", "María López"]
+CAMPAÑAS = ["Portabilidad", "Seguros", "Cobranza"]
+GUION = {
+    "Saludo": "hola buenos días le habla su ejecutivo",
+    "Consentimiento": "la llamada será grabada me permite continuar",
+    "Presentacion": "le llamo para ofrecerle un nuevo plan",
+    "Oferta": "el precio del plan es la mejor cuota del mercado",
+    "Cierre": "queda registrado y le envío contrato por correo",
+}
+
+def generar_audio(ruta, segundos, rng):
+    t = np.arange(int(SR * 5)) / SR
+    partes = [0.3 * np.sin(2 * np.pi * 425 * t) * (np.floor(t) % 2 == 0)]  # tono de llamada
+    restante = segundos - 5
+    while restante > 0:
+        voz = min(restante, rng.uniform(2, 8))
+        n = int(SR * voz)
+        # Ruido modulado en sílabas: suficiente para el VAD y para el costo de decodificar
+        silabas = np.sin(2 * np.pi * rng.uniform(3, 5) * np.arange(n) / SR) > -0.5
+        partes.append(0.2 * rng.standard_normal(n) * silabas)
+        pausa = min(max(restante - voz, 0), rng.uniform(0.3, 3))
+        partes.append(0.002 * rng.standard_normal(int(SR * pausa)))
+        restante -= voz + pausa
+    muestras = np.clip(np.concatenate(partes), -1, 1)
+    with wave.open(ruta, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SR)
+        f.writeframes((muestras * 32767).astype(np.int16).tobytes())
+
+def generar_datos(directorio, llamadas, duracion, semilla):
+    rng = np.random.default_rng(semilla)
+    os.makedirs(os.path.join(directorio, "audios"))
+    filas = []
+    inicio = datetime(2025, 1, 1)
+    for i in range(llamadas):
+        archivo = f"sintetica_{i:05d}.wav"
+        generar_audio(os.path.join(directorio, "audios", archivo), rng.uniform(*duracion), rng)
+        filas.append({
+            "Archivo": archivo, "Agente": AGENTES[i % len(AGENTES)], "Campaña": CAMPAÑAS[i % len(CAMPAÑAS)],
+            "Fecha Llamada": (inicio + timedelta(days=i % 60)).strftime("%Y-%m-%d"), "Estado": "Pendiente",
+        })
+    pd.DataFrame([{"Campaña": c, **GUION} for c in CAMPAÑAS]).to_csv(
+        os.path.join(directorio, "script_campana_bloques.csv"), index=False)
+    return pd.DataFrame(filas)
+
+def _percentiles(valores):
+    valores = np.asarray(valores, dtype=float)
+    if not len(valores):
+        return {"total": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {"total": round(float(valores.sum()), 4), "p50": round(float(np.percentile(valores, 50)), 4),
+            "p95": round(float(np.percentile(valores, 95)), 4), "max": round(float(valores.max()), 4)}
+
+def rss_pico_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo del pipeline con llamadas sintéticas.")
+    parser.add_argument("--llamadas", type=int, default=20)
+    parser.add_argument("--duracion", type=float, nargs=2, default=[60, 180], metavar=("MIN", "MAX"),
+                        help="Duración de cada llamada en segundos (uniforme entre MIN y MAX)")
+    parser.add_argument("--motor", default="falso", help="Motor de transcripción (ver motores.py)")
+    parser.add_argument("--modelo", default="base")
+    parser.add_argument("--vad", action="store_true", help="Recorta silencio y tonos antes de la inferencia")
+    parser.add_argument("--lote", type=int, default=25, help="Llamadas por escritura (punto de control)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="bench_pipeline.json", help="Archivo JSON de resultados")
+    parser.add_argument("--conservar", action="store_true", help="No borra la carpeta temporal de trabajo")
+    args = parser.parse_args()
+    salida = os.path.abspath(args.salida)
+
+    trabajo = tempfile.mkdtemp(prefix="bench_pipeline_")
+    actual = os.getcwd()
+    try:
+        inicio = time.perf_counter()
+        metadatos = generar_datos(trabajo, args.llamadas, args.duracion, args.semilla)
+        t_generacion = time.perf_counter() - inicio
+
+        # Los módulos del pipeline resuelven sus rutas relativas al directorio de trabajo
+        os.chdir(trabajo)
+        import almacen
+        import kpis
+        import segmentos
+        import transcriptor
+
+        kpis.df_script = kpis.cargar_scripts()
+        transcriptor.usar_cache = False
+        transcriptor.usar_vad = args.vad
+        inicio = time.perf_counter()
+        transcriptor.cargar_motor(args.motor, args.modelo)
+        t_carga_modelo = time.perf_counter() - inicio
+
+        etapas = {"metadatos": [], "decodificacion": [], "reproduccion": [], "inferencia": [], "kpis": [], "escritura": []}
+        latencias, segundos_audio = [], 0.0
+        inicio_corrida = time.perf_counter()
+
+        inicio = time.perf_counter()
+        con = almacen.conectar()
+        almacen.insertar_metadatos(con, metadatos)
+        pendientes = almacen.leer_metadatos(con, estado="Pendiente")
+        filas = pendientes[["Archivo", "Agente", "Campaña", "Fecha Llamada"]].to_dict("records")
+        corrida, _ = almacen.iniciar_corrida(con, len(filas), transcriptor.ahora())
+        # La carga de metadatos es una sola consulta: se reparte entre las llamadas
+        etapas["metadatos"] = [(time.perf_counter() - inicio) / max(len(filas), 1)] * len(filas)
+
+        lote, textos = [], []
+        for fila in filas:
+            t0 = time.perf_counter()
+            preparada = transcriptor.preparar_audio(fila)
+            t1 = time.perf_counter()
+            transcripcion, tramos, _ = transcriptor.transcribir(preparada)
+            t2 = time.perf_counter()
+            lote.append(kpis.calcular_fila(fila["Archivo"], fila["Agente"], fila["Campaña"], fila["Fecha Llamada"],
+                                           transcripcion, preparada["duracion"], preparada["duracion_voz"]))
+            t3 = time.perf_counter()
+            transcriptor.guardar_txt(fila["Archivo"], transcripcion)
+            segmentos.guardar(fila["Archivo"], tramos)
+            textos.append((fila["Archivo"], transcripcion))
+            if len(lote) >= args.lote:
+                almacen.guardar_avance(con, corrida, lote, 0, transcriptor.ahora(), textos=textos)
+                lote, textos = [], []
+            t4 = time.perf_counter()
+
+            segundos_audio += preparada["duracion"]
+            t_reproduccion = preparada.get("t_reproduccion", 0.0)
+            for etapa, segundos in zip(["decodificacion", "reproduccion", "inferencia", "kpis", "escritura"],
+                                       [t1 - t0 - t_reproduccion, t_reproduccion, t2 - t1, t3 - t2, t4 - t3]):
+                etapas[etapa].append(segundos)
+            latencias.append(t4 - t0 + etapas["metadatos"][0])
+
+        inicio = time.perf_counter()
+        almacen.guardar_avance(con, corrida, lote, 0, transcriptor.ahora(), textos=textos)
+        almacen.cerrar_corrida(con, corrida, transcriptor.ahora())
+        almacen.exportar_resumen_csv(con)
+        almacen.exportar_metadatos_xlsx(con)
+        con.close()
+        t_exportacion = time.perf_counter() - inicio
+        total = time.perf_counter() - inicio_corrida
+
+        resultado = {
+            "commit": _commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "maquina": {"python": platform.python_version(), "sistema": platform.platform(),
+                        "cpus": os.cpu_count()},
+            "config": {"llamadas": args.llamadas, "duracion": args.duracion, "motor": args.motor,
+                       "modelo": args.modelo, "vad": args.vad, "lote": args.lote, "semilla": args.semilla},
+            "segundos_generacion": round(t_generacion, 3),
+            "segundos_carga_modelo": round(t_carga_modelo, 3),
+            "segundos_exportacion": round(t_exportacion, 3),
+            "segundos_total": round(total, 3),
+            "minutos_audio": round(segundos_audio / 60, 2),
+            "llamadas_por_hora": round(len(filas) / total * 3600, 1) if total else None,
+            "rtf": round(total / segundos_audio, 4) if segundos_audio else None,
+            "latencia_llamada": _percentiles(latencias),
+            "etapas": {etapa: _percentiles(valores) for etapa, valores in etapas.items()},
+            "rss_pico_mb": rss_pico_mb(),
+        }
+    finally:
+        os.chdir(actual)
+        if not args.conservar:
+            shutil.rmtree(trabajo, ignore_errors=True)
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    print(f"Llamadas: {args.llamadas} ({resultado['minutos_audio']} min de audio), motor {args.motor}")
+    print(f"Rendimiento: {resultado['llamadas_por_hora']} llamadas/hora (RTF {resultado['rtf']})")
+    print(f"Latencia por llamada: p50 {resultado['latencia_llamada']['p50']:.3f}s, "
+          f"p95 {resultado['latencia_llamada']['p95']:.3f}s")
+    for etapa, valores in resultado["etapas"].items():
+        print(f"  {etapa:<15} total {valores['total']:8.2f}s  p50 {valores['p50']:.4f}s  p95 {valores['p95']:.4f}s")
+    print(f"RSS pico: {resultado['rss_pico_mb']} MB  →  {salida}")
+
+if __name__ == "__main__":
+    main()
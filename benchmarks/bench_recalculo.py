@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Benchmark de recalcular.py a escala: genera N transcripciones sintéticas con los guiones de
+# script_campana_bloques.csv (bloques omitidos, palabras cambiadas, bloques fuera de orden y
+# relleno), las carga en una callcenter.db temporal y mide el recálculo completo en frío (índice
+# desde la base), en caliente (índice y cobertura reutilizados: el caso de cambiar un umbral o
+# un peso) y tras editar el guion de una campaña (solo se vuelven a alinear sus llamadas).
+#
+#   python benchmarks/bench_recalculo.py --llamadas 100000 --palabras 400
+
+RELLENO = ("sí no ya claro bueno entonces perfecto mire señor señora cuenta tarjeta banco mes pago "
+           "ahora después mañana correo número teléfono dirección gracias momento espere le digo "
+           "entiendo ok vale también pero porque cuando donde cómo qué cuánto").split()
+
+def generar_textos(guiones, llamadas, palabras, semilla):
+    import detector_frases
+    import kpis
+    rng = np.random.default_rng(semilla)
+    campañas = list(guiones)
+    bloques_tokens = {c: [detector_frases.tokenizar(kpis.alineador_guion.MARCADOR.sub(" ", t))
+                          for t in guiones[c]] for c in campañas}
+    objeciones = kpis.OBJECIONES
+    relleno = np.array(RELLENO)
+    filas = []
+    for i in range(llamadas):
+        campaña = campañas[i % len(campañas)]
+        partes = []
+        orden = list(range(len(bloques_tokens[campaña])))
+        if rng.random() < 0.1:
+            a, b = rng.choice(len(orden), 2, replace=False)
+            orden[a], orden[b] = orden[b], orden[a]
+        for b in orden:
+            if rng.random() < 0.2:
+                continue
+            tokens = list(bloques_tokens[campaña][b])
+            # La transcripción cambia alguna palabra del guion
+            for j in np.flatnonzero(rng.random(len(tokens)) < 0.1):
+                tokens[j] = relleno[rng.integers(len(relleno))]
+            partes.append(tokens)
+            partes.append(relleno[rng.integers(len(relleno), size=rng.integers(5, 40))].tolist())
+        usadas = sum(len(p) for p in partes)
+        cola = relleno[rng.integers(len(relleno), size=max(palabras - usadas, 0))].tolist()
+        for j in np.flatnonzero(rng.random(len(cola)) < 0.005):
+            cola[j] = objeciones[rng.integers(len(objeciones))]
+        partes.append(cola)
+        filas.append((f"sintetica_{i:06d}.wav", campaña, " ".join(w for p in partes for w in p)))
+    return filas
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de recalcular.py con transcripciones sintéticas.")
+    parser.add_argument("--llamadas", type=int, default=100000)
+    parser.add_argument("--palabras", type=int, default=400, help="Palabras por transcripción")
+    parser.add_argument("--guiones", default=os.path.join(RAIZ, "script_campana_bloques.csv"))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--conservar", action="store_true", help="No borra la carpeta temporal de trabajo")
+    args = parser.parse_args()
+
+    trabajo = tempfile.mkdtemp(prefix="bench_recalculo_")
+    actual = os.getcwd()
+    try:
+        shutil.copy(args.guiones, os.path.join(trabajo, "script_campana_bloques.csv"))
+        # Los módulos resuelven sus rutas relativas al directorio de trabajo
+        os.chdir(trabajo)
+        os.makedirs("transcripciones")
+        import almacen
+        import kpis
+        import recalcular
+
+        kpis.df_script = kpis.cargar_scripts()
+        guiones = {fila["Campaña"]: [fila.get(b) if isinstance(fila.get(b), str) else "" for b in kpis.bloques]
+                   for _, fila in kpis.df_script.iterrows()}
+
+        inicio = time.perf_counter()
+        textos = generar_textos(guiones, args.llamadas, args.palabras, args.semilla)
+        llamadas = pd.DataFrame({"Archivo": [a for a, _, _ in textos], "Campaña": [c for _, c, _ in textos]})
+        llamadas["Agente"] = [f"Agente {i % 40}" for i in range(len(llamadas))]
+        llamadas["Fecha"] = (pd.Timestamp("2025-01-01")
+                             + pd.to_timedelta(np.arange(len(llamadas)) % 180, unit="D")).strftime("%Y-%m-%d")
+        llamadas["Palabras/min"] = 120.0
+        llamadas["Cierre Detectado"] = 0
+        llamadas["Score Total"] = 0.0
+        con = almacen.conectar()
+        almacen.upsert_llamadas_masivo(con, llamadas.reindex(columns=almacen.COLUMNAS_RESUMEN).itertuples(index=False))
+        almacen.guardar_transcripciones(con, [(a, t) for a, _, t in textos])
+        t_generacion = time.perf_counter() - inicio
+        del textos
+
+        frio = recalcular.recalcular(con)
+        caliente = recalcular.recalcular(con)
+        editado = kpis.df_script.copy()
+        editado.loc[editado.index[0], kpis.bloques[0]] = str(editado.loc[editado.index[0], kpis.bloques[0]]) + " gracias"
+        kpis.df_script = editado
+        guion = recalcular.recalcular(con)
+        con.close()
+
+        print(f"Llamadas: {args.llamadas} de {args.palabras} palabras, {len(guiones)} campañas "
+              f"(generadas y cargadas en {t_generacion:.1f}s)")
+        for nombre, r in (("En frío", frio), ("En caliente", caliente), ("Guion editado", guion)):
+            alineo = r["segundos"] - r["segundos_indice"]
+            print(f"{nombre:14s} {r['segundos']:7.2f}s  (índice {r['segundos_indice']:.2f}s, "
+                  f"{r['tokenizadas']} tokenizadas, {r['alineadas']} alineadas; apego y escritura {alineo:.2f}s = "
+                  f"{alineo / max(r['llamadas'], 1) * 1e6:.0f} µs/llamada; {r['modificadas']} modificadas)")
+    finally:
+        os.chdir(actual)
+        if args.conservar:
+            print(f"Carpeta de trabajo: {trabajo}")
+        else:
+            shutil.rmtree(trabajo, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audio
+import motores
+from detector_frases import tokenizar
+
+# Compara motores de transcripción sobre los audios de muestra: factor de tiempo real (RTF =
+# segundos de inferencia / segundos de audio; menor es mejor) y acuerdo a nivel de palabra con
+# el primer motor de la lista (1 - WER, tomando ese motor como referencia).
+#
+#   python benchmarks/comparar_motores.py --motores whisper:base faster-whisper:base
+
+def distancia_palabras(referencia, hipotesis):
+    anterior = list(range(len(hipotesis) + 1))
+    for i, r in enumerate(referencia, 1):
+        actual = [i]
+        for j, h in enumerate(hipotesis, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (r != h)))
+        anterior = actual
+    return anterior[-1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara RTF y acuerdo de palabras entre motores de transcripción.")
+    parser.add_argument("--motores", nargs="+", default=["whisper:base", "faster-whisper:base"],
+                        help="Motores como motor:modelo; el primero es la referencia del acuerdo")
+    parser.add_argument("--dir", default="audios", help="Carpeta con los audios de muestra")
+    parser.add_argument("--limite", type=int, default=None, help="Usa solo los primeros N audios")
+    parser.add_argument("--idioma", default="Spanish")
+    args = parser.parse_args()
+
+    rutas = sorted(glob.glob(os.path.join(args.dir, "*")))[:args.limite]
+    audios = {}
+    for ruta in rutas:
+        try:
+            audios[ruta] = audio.decodificar(ruta)
+        except RuntimeError as e:
+            print(f"⚠️ {e}")
+    if not audios:
+        print(f"No hay audios en {args.dir}/")
+        return
+    segundos_audio = sum(audio.duracion(m) for m in audios.values())
+    print(f"Audios: {len(audios)} ({segundos_audio / 60:.1f} min)")
+
+    textos, filas = {}, []
+    for especificacion in args.motores:
+        nombre, _, modelo = especificacion.partition(":")
+        inicio = time.perf_counter()
+        motor = motores.crear(nombre, modelo or "base", args.idioma)
+        carga = time.perf_counter() - inicio
+
+        inferencia = 0.0
+        textos[especificacion] = {}
+        for ruta, muestras in audios.items():
+            inicio = time.perf_counter()
+            textos[especificacion][ruta] = motor.transcribir(muestras)["text"]
+            inferencia += time.perf_counter() - inicio
+        filas.append((especificacion, carga, inferencia))
+
+    referencia = args.motores[0]
+    print(f"{'Motor':<28}{'Carga (s)':>10}{'Inferencia (s)':>16}{'RTF':>8}{'Acuerdo':>10}")
+    for especificacion, carga, inferencia in filas:
+        errores = palabras = 0
+        for ruta in audios:
+            ref = tokenizar(textos[referencia][ruta])
+            errores += distancia_palabras(ref, tokenizar(textos[especificacion][ruta]))
+            palabras += len(ref)
+        acuerdo = max(0.0, 1 - errores / palabras) if palabras else float("nan")
+        print(f"{especificacion:<28}{carga:>10.1f}{inferencia:>16.1f}{inferencia / segundos_audio:>8.3f}{acuerdo:>10.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import hashlib
+
+# Caché de transcripciones direccionada por contenido: la clave es el hash del audio,
+# el modelo y el idioma, así que un mismo audio con otro nombre reutiliza la transcripción.
+CACHE_DIR = os.path.join("transcripciones", "cache")
+MAX_MB = 500
+MAX_DIAS = 180
+
+def hash_audio(path_audio, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(path_audio, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+def _ruta(hash_archivo, modelo, idioma, directorio=CACHE_DIR):
+    nombre = f"{hash_archivo}_{modelo}_{idioma}.json".replace(os.sep, "_")
+    return os.path.join(directorio, hash_archivo[:2], nombre)
+
+def leer_ruta(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def leer(hash_archivo, modelo, idioma, directorio=CACHE_DIR):
+    ruta = _ruta(hash_archivo, modelo, idioma, directorio)
+    entrada = leer_ruta(ruta)
+    if entrada is None:
+        return None
+    # Marca de uso para la política de expulsión (LRU). Si depurar la borró entre la lectura y la
+    # marca, el contenido ya leído sigue siendo válido: cuenta como acierto de una entrada expulsada
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        pass
+    return entrada
+
+def guardar(hash_archivo, modelo, idioma, texto, segmentos, duracion=None, duracion_voz=None,
+            directorio=CACHE_DIR):
+    ruta = _ruta(hash_archivo, modelo, idioma, directorio)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    entrada = {
+        "hash": hash_archivo,
+        "modelo": modelo,
+        "idioma": idioma,
+        "texto": texto,
+        "segmentos": [
+            {"inicio": round(s["start"], 2), "fin": round(s["end"], 2), "texto": s["text"].strip()}
+            for s in segmentos
+        ],
+        "duracion": duracion,
+        "duracion_voz": duracion_voz,
+        "creado": time.time(),
+    }
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entrada, f, ensure_ascii=False)
+    os.replace(tmp, ruta)
+    return entrada
+
+# Expulsa entradas más antiguas que max_dias y luego las menos usadas hasta quedar bajo max_mb
+def depurar(max_mb=MAX_MB, max_dias=MAX_DIAS, directorio=CACHE_DIR):
+    if not os.path.isdir(directorio):
+        return 0
+    entradas = []
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in archivos:
+            if nombre.endswith(".json"):
+                ruta = os.path.join(raiz, nombre)
+                st = os.stat(ruta)
+                entradas.append((st.st_mtime, st.st_size, ruta))
+
+    limite_edad = time.time() - max_dias * 86400
+    eliminadas = 0
+    vigentes = []
+    for mtime, tamaño, ruta in entradas:
+        if max_dias and mtime < limite_edad:
+            os.remove(ruta)
+            eliminadas += 1
+        else:
+            vigentes.append((mtime, tamaño, ruta))
+
+    total = sum(t for _, t, _ in vigentes)
+    limite_bytes = max_mb * 1024 * 1024
+    for mtime, tamaño, ruta in sorted(vigentes):
+        if not max_mb or total <= limite_bytes:
+            break
+        os.remove(ruta)
+        total -= tamaño
+        eliminadas += 1
+    return eliminadas
@@ -0,0 +1,203 @@
+import os
+from contextlib import closing
+import pandas as pd
+import streamlit as st
+import almacen
+
+# Capa de acceso a datos compartida por los dashboards. Cada lectura se cachea en memoria
+# con la versión de la base como parte de la clave: mientras callcenter.db no cambie,
+# cambiar de página o mover un filtro no vuelve a tocar el disco. Los agregados salen de
+# los rollups que mantiene la base, así que su costo depende de agentes y días, no de llamadas.
+
+def version_datos(path=almacen.DB_PATH):
+    firma = []
+    for ruta in (path, path + "-wal", almacen.RESUMEN_CSV):
+        try:
+            st_ = os.stat(ruta)
+            firma.append((st_.st_mtime_ns, st_.st_size))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+def hay_datos():
+    return os.path.exists(almacen.DB_PATH) or os.path.exists(almacen.RESUMEN_CSV)
+
+def _fecha(valor):
+    return None if valor is None else pd.to_datetime(valor).strftime("%Y-%m-%d")
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _llamadas(version, columnas, agente, campaña, desde, hasta):
+    with closing(almacen.conectar()) as con:
+        return almacen.leer_llamadas(con, columnas=list(columnas) if columnas else None,
+                                     agente=agente, campaña=campaña, desde=desde, hasta=hasta)
+
+def cargar_llamadas(columnas=None, agente=None, campaña=None, desde=None, hasta=None):
+    return _llamadas(version_datos(), tuple(columnas) if columnas else None,
+                     agente, campaña, _fecha(desde), _fecha(hasta))
+
+# Una página de llamadas ordenada y su total, resueltos en la base (página de Revisión)
+@st.cache_data(show_spinner=False, max_entries=64)
+def _pagina(version, columnas, orden, limite, desplazamiento, filtros):
+    with closing(almacen.conectar()) as con:
+        df = almacen.leer_llamadas(con, columnas=list(columnas), orden=list(orden), limite=limite,
+                                   desplazamiento=desplazamiento, **dict(filtros))
+        return df, almacen.contar_llamadas(con, **dict(filtros))
+
+def pagina_llamadas(columnas, orden, pagina, tamaño, agente=None, campaña=None, desde=None, hasta=None,
+                    score_min=None, score_max=None):
+    filtros = (("agente", agente), ("campaña", campaña), ("desde", _fecha(desde)), ("hasta", _fecha(hasta)),
+               ("score_min", score_min), ("score_max", score_max))
+    return _pagina(version_datos(), tuple(columnas), tuple(orden), tamaño, (pagina - 1) * tamaño, filtros)
+
+@st.cache_data(show_spinner=False)
+def _distintos(version, columna, tabla):
+    with closing(almacen.conectar()) as con:
+        return almacen.valores_distintos(con, columna, tabla=tabla)
+
+def valores_distintos(columna, tabla="llamadas"):
+    return _distintos(version_datos(), columna, tabla)
+
+@st.cache_data(show_spinner=False)
+def _rango(version, columna):
+    with closing(almacen.conectar()) as con:
+        return almacen.rango(con, columna)
+
+def rango(columna):
+    return _rango(version_datos(), columna)
+
+# Frames derivados memoizados, calculados desde los rollups
+@st.cache_data(show_spinner=False, max_entries=256)
+def _rollup(version, tabla, agrupar, agente, campaña, desde, hasta):
+    with closing(almacen.conectar()) as con:
+        df = almacen.leer_rollup(con, tabla, list(agrupar), agente=agente, campaña=campaña, desde=desde, hasta=hasta)
+    return almacen.promedios_rollup(df, list(agrupar))
+
+def kpis_globales():
+    version = version_datos()
+    total = _rollup(version, "kpi_campana_dia", (), None, None, None, None)
+    minimo, maximo = _rango(version, "Score Total")
+    if total.empty:
+        return None
+    return {"promedio": total["Score Total"].iloc[0], "minimo": minimo, "maximo": maximo}
+
+def ranking_agentes(campaña=None, desde=None, hasta=None):
+    if campaña is None and desde is None and hasta is None:
+        ranking = _rollup(version_datos(), "kpi_agente_campana", ("Agente",), None, None, None, None)
+    else:
+        ranking = _rollup(version_datos(), "kpi_agente_dia", ("Agente",), None, campaña, _fecha(desde), _fecha(hasta))
+    return ranking[["Agente", "Score Total", "Apego al Guion (%)", "WPM", "Friccion (%)", "Llamadas",
+                    "Evaluación WPM", "Evaluación Fricción"]].round(0)
+
+# Fila del agente con sus promedios (rollup por agente y campaña, leído por clave)
+def resumen_agente(agente):
+    resumen = _rollup(version_datos(), "kpi_agente_campana", ("Agente",), agente, None, None, None)
+    return resumen[["Agente", "Score Total", "Apego al Guion (%)", "WPM", "Friccion (%)", "Llamadas",
+                    "Evaluación WPM", "Evaluación Fricción"]].round(0)
+
+# Perfil precalculado de Mi Desempeño: serie diaria con medias móviles, percentil por campaña y
+# mejores/peores llamadas. El costo no depende del total de llamadas.
+@st.cache_data(show_spinner=False, max_entries=64)
+def _perfil(version, agente):
+    with closing(almacen.conectar()) as con:
+        return almacen.leer_perfil(con, agente)
+
+def perfil_agente(agente):
+    return _perfil(version_datos(), agente)
+
+def medias_bloques(campaña=None, desde=None, hasta=None):
+    total = _rollup(version_datos(), "kpi_campana_dia", (), None, campaña, _fecha(desde), _fecha(hasta))
+    bloques = [f"% {b}" for b in almacen.BLOQUES]
+    medias = total[bloques].iloc[0] if not total.empty else pd.Series(float("nan"), index=bloques)
+    df_bloques = medias.round(1).reset_index()
+    df_bloques.columns = ["Bloque", "Cumplimiento (%)"]
+    df_bloques["Bloque"] = df_bloques["Bloque"].str.replace("% ", "")
+    return df_bloques
+
+def evolucion_diaria(agente=None, campaña=None):
+    tabla = "kpi_agente_dia" if agente is not None else "kpi_campana_dia"
+    df = _rollup(version_datos(), tabla, ("Fecha",), agente, campaña, None, None)
+    df = df[["Fecha", "Score Total"]].copy()
+    df["Fecha"] = pd.to_datetime(df["Fecha"])
+    return df
+
+def promedio_por(columna):
+    tabla = "kpi_campana_dia" if columna == "Campaña" else "kpi_agente_campana"
+    return _rollup(version_datos(), tabla, (columna,), None, None, None, None)[[columna, "Score Total"]]
+
+# Métricas de rendimiento del pipeline (página de Rendimiento)
+@st.cache_data(show_spinner=False, max_entries=16)
+def _metricas(version, desde, hasta):
+    with closing(almacen.conectar()) as con:
+        return almacen.leer_metricas(con, desde=desde, hasta=hasta)
+
+def metricas(desde=None, hasta=None):
+    return _metricas(version_datos(), _fecha(desde), _fecha(hasta))
+
+@st.cache_data(show_spinner=False)
+def _pendientes(version):
+    with closing(almacen.conectar()) as con:
+        return con.execute("SELECT COUNT(*) FROM metadatos WHERE \"Estado\" = 'Pendiente'").fetchone()[0]
+
+def pendientes():
+    return _pendientes(version_datos())
+
+# Estado de la cola de servicio.py
+@st.cache_data(show_spinner=False)
+def _cola(version):
+    with closing(almacen.conectar()) as con:
+        return almacen.resumen_trabajos(con)
+
+def cola_trabajos():
+    return _cola(version_datos())
+
+# Búsqueda de texto completo en las transcripciones (índice FTS5 de la base)
+@st.cache_data(show_spinner=False, max_entries=64)
+def _busqueda(version, consulta, agente, campaña, desde, hasta, limite):
+    with closing(almacen.conectar()) as con:
+        return almacen.buscar_transcripciones(con, consulta, agente=agente, campaña=campaña,
+                                              desde=desde, hasta=hasta, limite=limite)
+
+def buscar_transcripciones(consulta, agente=None, campaña=None, desde=None, hasta=None, limite=50):
+    return _busqueda(version_datos(), consulta, agente, campaña, _fecha(desde), _fecha(hasta), limite)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _transcripcion(version, archivo):
+    with closing(almacen.conectar()) as con:
+        return almacen.leer_transcripcion(con, archivo)
+
+def transcripcion(archivo):
+    return _transcripcion(version_datos(), archivo)
+
+# Momentos de una llamada (frases detectadas y bloques del guion) con su segundo en el audio
+@st.cache_data(show_spinner=False, max_entries=256)
+def _momentos(version, archivo, campaña):
+    import kpis
+    import segmentos
+    segs = segmentos.leer(archivo)
+    if segs is None:
+        return None
+    return segmentos.momentos(segs, kpis.obtener_guion(campaña))
+
+def momentos(archivo, campaña):
+    return _momentos(version_datos(), archivo, campaña)
+
+# Hash del audio por (ruta, mtime, tamaño): se calcula una vez mientras el archivo no cambie
+@st.cache_data(show_spinner=False, max_entries=4096)
+def _hash_audio(path_audio, mtime_ns, tamaño):
+    import cache_transcripciones
+    return cache_transcripciones.hash_audio(path_audio)
+
+# (ruta, formato) del audio a reproducir: la copia liviana si existe, si no el original; None sin audio.
+# Las páginas le pasan la ruta a st.audio, que la sirve con rangos de bytes.
+def audio_reproduccion(archivo, audio_dir="audios"):
+    import mimetypes
+    import reproduccion
+    path_audio = os.path.join(audio_dir, archivo)
+    try:
+        estado = os.stat(path_audio)
+    except FileNotFoundError:
+        return None
+    ruta = reproduccion.ruta_reproduccion(_hash_audio(path_audio, estado.st_mtime_ns, estado.st_size))
+    if os.path.exists(ruta):
+        return ruta, reproduccion.FORMATO
+    return path_audio, mimetypes.guess_type(path_audio)[0] or "audio/wav"
@@ -0,0 +1,86 @@
+import re
+import unicodedata
+from collections import deque
+
+# Detector de frases en una sola pasada (Aho-Corasick sobre tokens). Todas las listas de
+# frases se compilan una vez en un autómata; cada transcripción se tokeniza una vez y se
+# recorre una vez, devolviendo por categoría las coincidencias con su posición.
+#
+# Las coincidencias respetan límites de palabra ("sí" no coincide dentro de "así") y los
+# acentos son significativos ("sí" no es "si"). El último token de cada frase acepta
+# también su plural simple (-s / -es), como hacía la búsqueda por subcadena ("precios").
+# Las posiciones son índices en el flujo de tokens de tokenizar(texto).
+
+TOKEN = re.compile(r"\w+")
+
+def tokenizar(texto):
+    return TOKEN.findall(unicodedata.normalize("NFC", texto.lower()))
+
+def _variantes(tokens):
+    ultimo = tokens[-1]
+    yield tokens
+    yield tokens[:-1] + (ultimo + "s",)
+    yield tokens[:-1] + (ultimo + "es",)
+
+class DetectorFrases:
+    def __init__(self, categorias):
+        self.categorias = list(categorias)
+        self._hijos = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]
+
+        for categoria, frases in categorias.items():
+            for frase in frases:
+                tokens = tuple(tokenizar(frase))
+                if not tokens:
+                    continue
+                for variante in _variantes(tokens):
+                    estado = 0
+                    for token in variante:
+                        siguiente = self._hijos[estado].get(token)
+                        if siguiente is None:
+                            siguiente = len(self._hijos)
+                            self._hijos[estado][token] = siguiente
+                            self._hijos.append({})
+                            self._fallo.append(0)
+                            self._salidas.append([])
+                        estado = siguiente
+                    salida = (categoria, frase, len(variante))
+                    if salida not in self._salidas[estado]:
+                        self._salidas[estado].append(salida)
+
+        # Enlaces de fallo por BFS; cada estado hereda las salidas de su enlace de fallo
+        cola = deque(self._hijos[0].values())
+        while cola:
+            estado = cola.popleft()
+            for token, hijo in self._hijos[estado].items():
+                fallo = self._fallo[estado]
+                while fallo and token not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[hijo] = self._hijos[fallo].get(token, 0)
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._fallo[hijo]]
+                cola.append(hijo)
+
+    # Devuelve {categoria: {"conteo", "posiciones", "frases"}}; acepta texto o tokens ya calculados
+    def buscar(self, texto):
+        resultado = {c: {"conteo": 0, "posiciones": [], "frases": []} for c in self.categorias}
+        tokens = tokenizar(texto) if isinstance(texto, str) else texto
+        hijos, fallo, salidas = self._hijos, self._fallo, self._salidas
+        raiz = hijos[0]
+        estado = 0
+        for i, token in enumerate(tokens):
+            if estado:
+                while estado and token not in hijos[estado]:
+                    estado = fallo[estado]
+                estado = hijos[estado].get(token, 0)
+            else:
+                # Camino rápido: la mayoría de los tokens no inicia ninguna frase
+                estado = raiz.get(token, 0)
+                if not estado:
+                    continue
+            for categoria, frase, largo in salidas[estado]:
+                hit = resultado[categoria]
+                hit["conteo"] += 1
+                hit["posiciones"].append(i - largo + 1)
+                hit["frases"].append(frase)
+        return resultado
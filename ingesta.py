@@ -0,0 +1,174 @@
+import os
+import csv
+import hashlib
+import argparse
+import itertools
+from datetime import datetime
+import pandas as pd
+import almacen
+
+# Carga masiva de metadatos desde CSV o XLSX (100k+ filas): el archivo se lee por bloques, cada
+# bloque se valida por columnas (sin recorrer fila por fila) y se inserta en la tabla metadatos
+# en su propia transacción. La carga es idempotente: el hash del contenido queda registrado en
+# la tabla cargas, y dentro de la base cada Archivo aparece una sola vez.
+#
+#   python ingesta.py metadatos_nuevos.csv
+TAMAÑO_BLOQUE = 20000
+CAMPOS_REQUERIDOS = ["Archivo", "Agente", "Campaña", "Fecha Llamada"]
+# Después de ISO 8601 (AAAA-MM-DD, con o sin hora), en este orden: día antes que mes
+FORMATOS_FECHA = ("%d-%m-%Y", "%d/%m/%Y", "%m/%d/%Y")
+# Filas rechazadas que se conservan para mostrar
+MAX_MUESTRA = 1000
+
+# Hash del contenido de una ruta o de un archivo abierto (p. ej. el que sube Streamlit)
+def hash_contenido(origen, bloque=1 << 20):
+    h = hashlib.sha256()
+    f = open(origen, "rb") if isinstance(origen, (str, os.PathLike)) else origen
+    try:
+        f.seek(0)
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    finally:
+        if f is not origen:
+            f.close()
+        else:
+            f.seek(0)
+    return h.hexdigest()
+
+def _bloques_csv(f, tamaño):
+    muestra = f.read(1 << 16)
+    f.seek(0)
+    try:
+        separador = csv.Sniffer().sniff(muestra.decode("utf-8-sig", errors="ignore"), delimiters=",;\t").delimiter
+    except csv.Error:
+        separador = ","
+    yield from pd.read_csv(f, sep=separador, dtype="string", keep_default_na=False, encoding="utf-8-sig",
+                           chunksize=tamaño)
+
+def _bloques_xlsx(f, tamaño):
+    from openpyxl import load_workbook
+    libro = load_workbook(f, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = [str(c).strip() if c is not None else "" for c in next(filas, [])]
+        while True:
+            bloque = list(itertools.islice(filas, tamaño))
+            if not bloque:
+                break
+            yield pd.DataFrame(bloque, columns=encabezado, dtype=object).astype("string")
+    finally:
+        libro.close()
+
+# DataFrames de hasta tamaño filas, todas las columnas como texto
+def leer_bloques(origen, nombre, tamaño=TAMAÑO_BLOQUE):
+    f = open(origen, "rb") if isinstance(origen, (str, os.PathLike)) else origen
+    try:
+        f.seek(0)
+        lector = _bloques_csv if nombre.lower().endswith(".csv") else _bloques_xlsx
+        for bloque in lector(f, tamaño):
+            bloque.columns = [str(c).strip() for c in bloque.columns]
+            yield bloque
+    finally:
+        if f is not origen:
+            f.close()
+
+# Fechas de una columna de texto; NaT donde ningún formato aplica. Cada formato se prueba de una
+# vez sobre las filas que siguen sin fecha; al final, números de serie de Excel.
+def parsear_fechas(texto):
+    fechas = pd.to_datetime(texto, format="ISO8601", errors="coerce")
+    for formato in FORMATOS_FECHA:
+        faltan = fechas.isna() & texto.notna()
+        if not faltan.any():
+            return fechas
+        fechas[faltan] = pd.to_datetime(texto[faltan], format=formato, errors="coerce")
+    faltan = fechas.isna() & texto.notna()
+    if faltan.any():
+        fechas[faltan] = pd.to_datetime(pd.to_numeric(texto[faltan], errors="coerce"), unit="D",
+                                        origin="1899-12-30", errors="coerce")
+    return fechas
+
+# Devuelve el bloque con "Motivo Rechazo" ("" si es válido) y "Fecha Llamada" normalizada en las válidas
+def validar(df):
+    faltantes = [c for c in CAMPOS_REQUERIDOS if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+    df = df.copy()
+    requeridos = df[CAMPOS_REQUERIDOS].astype("string").apply(lambda s: s.str.strip())
+    vacios = requeridos.fillna("").eq("")
+    motivo = pd.Series("", index=df.index, dtype=object)
+    # Se informa el primer campo vacío de cada fila
+    for campo in reversed(CAMPOS_REQUERIDOS):
+        motivo[vacios[campo]] = f"Campo obligatorio vacío: {campo}"
+    fechas = parsear_fechas(requeridos["Fecha Llamada"].where(~vacios["Fecha Llamada"]))
+    motivo[(motivo == "") & fechas.isna()] = "Formato de fecha inválido o no reconocido"
+    validas = motivo == ""
+    df.loc[validas, "Fecha Llamada"] = fechas[validas].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df["Motivo Rechazo"] = motivo
+    return df
+
+def ingestar(con, origen, nombre, ahora=None, tamaño=TAMAÑO_BLOQUE, avance=None):
+    huella = hash_contenido(origen)
+    previa = almacen.leer_carga(con, huella)
+    if previa is not None:
+        return {**previa, "repetida": True, "rechazos": pd.DataFrame()}
+
+    ahora = ahora or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    marca = int(datetime.now().timestamp())
+    filas = agregados = duplicados = rechazados = 0
+    rechazos = []
+    for bloque in leer_bloques(origen, nombre, tamaño):
+        bloque = validar(bloque)
+        validos = bloque[bloque["Motivo Rechazo"] == ""].copy()
+        invalidos = bloque[bloque["Motivo Rechazo"] != ""].copy()
+
+        validos["Estado"] = "Pendiente"
+        validos["ID"] = [f"row_{i}_{marca}" for i in range(filas - rechazados, filas - rechazados + len(validos))]
+        invalidos["Estado"] = "Rechazado"
+        invalidos["ID"] = [f"row_r_{i}_{marca}" for i in range(rechazados, rechazados + len(invalidos))]
+        for parte in (validos, invalidos):
+            parte["created_at"] = parte["updated_at"] = ahora
+
+        # Un Archivo ya registrado (de esta u otra carga) se cuenta como duplicado
+        nuevos = almacen.insertar_metadatos(con, validos)
+        almacen.insertar_rechazados(con, invalidos)
+        filas += len(bloque)
+        agregados += nuevos
+        duplicados += len(validos) - nuevos
+        rechazados += len(invalidos)
+        if sum(len(r) for r in rechazos) < MAX_MUESTRA and not invalidos.empty:
+            rechazos.append(invalidos.head(MAX_MUESTRA))
+        if avance is not None:
+            avance(filas)
+
+    # Solo una carga completa queda registrada: si se corta, repetirla completa lo que faltó
+    almacen.registrar_carga(con, huella, nombre, filas, agregados, duplicados, rechazados, ahora)
+    return {"hash": huella, "nombre": nombre, "filas": filas, "agregados": agregados, "duplicados": duplicados,
+            "rechazados": rechazados, "cargado_en": ahora, "repetida": False,
+            "rechazos": pd.concat(rechazos).head(MAX_MUESTRA) if rechazos else pd.DataFrame()}
+
+# Plantilla de carga con una fila por audio de la carpeta
+def plantilla(archivos_audio, ahora=None):
+    ahora = ahora or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    df = pd.DataFrame("", index=range(len(archivos_audio)), columns=almacen.COLUMNAS_METADATOS)
+    df["Archivo"] = archivos_audio
+    df["Estado"] = "Pendiente"
+    df["created_at"] = df["updated_at"] = ahora
+    return df
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga metadatos de llamadas desde un CSV o XLSX.")
+    parser.add_argument("archivo", help="Archivo .csv o .xlsx con las columnas de la plantilla")
+    parser.add_argument("--bloque", type=int, default=TAMAÑO_BLOQUE, help="Filas por bloque")
+    args = parser.parse_args(argv)
+    con = almacen.conectar()
+    resumen = ingestar(con, args.archivo, os.path.basename(args.archivo), tamaño=max(1, args.bloque),
+                       avance=lambda n: print(f"\r   {n:,} filas…", end="", flush=True))
+    con.close()
+    if resumen["repetida"]:
+        print(f"↩️ Este archivo ya se cargó el {resumen['cargado_en']}; no se agregó nada.")
+    else:
+        print(f"\r✅ {resumen['filas']:,} filas: {resumen['agregados']:,} agregadas, "
+              f"{resumen['duplicados']:,} ya registradas, {resumen['rechazados']:,} rechazadas.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pandas as pd
+import almacen
+import alineador_guion
+import detector_frases
+
+# Reglas de evaluación de llamadas: frases, umbrales, pesos y apego al guion.
+# Las usan transcriptor.py (llamada a llamada) y recalcular.py (en lotes vectorizados),
+# así que cualquier cambio aquí se refleja en ambos.
+
+script_path = "script_campana_bloques.csv"
+
+SALUDOS = ["hola", "buenos días", "buenas tardes", "le habla"]
+CONSENTIMIENTO = ["consentimiento", "autorización", "permite grabar"]
+CIERRES = ["envío contrato", "queda registrado", "confirmo su compra", "formalizar"]
+PRECIOS = ["precio", "costo", "valor", "cuota", "montos"]
+OBJECIONES = ["no me interesa", "lo voy a pensar", "muy caro", "no puedo ahora", "ya lo vi", "no estoy interesado"]
+AFIRMACIONES = ["sí", "claro", "por supuesto", "correcto"]
+
+# Todas las listas compiladas una vez en un solo autómata
+detector = detector_frases.DetectorFrases({
+    "saludo": SALUDOS,
+    "consentimiento": CONSENTIMIENTO,
+    "cierre": CIERRES,
+    "precio": PRECIOS,
+    "objecion": OBJECIONES,
+    "afirmacion": AFIRMACIONES,
+})
+
+# Umbrales y pesos del score
+LIMITES_WPM = (90, 140)
+LIMITES_FRICCION = (5, 15)
+PESO_APEGO, PESO_WPM, PESO_FRICCION = 0.6, 0.2, 0.2
+
+bloques = almacen.BLOQUES
+
+def cargar_scripts(path=script_path):
+    return pd.read_csv(path) if os.path.exists(path) else pd.DataFrame(columns=["Campaña"] + bloques)
+
+# Guiones por campaña: se leen la primera vez que se evalúa una llamada
+df_script = None
+
+def obtener_script_bloques(campaña):
+    global df_script
+    if df_script is None:
+        df_script = cargar_scripts()
+    fila = df_script[df_script["Campaña"] == campaña]
+    return fila.iloc[0].to_dict() if not fila.empty else {}
+
+# Guiones compilados para alinear (uno por campaña, mientras no se recarguen los guiones)
+_guiones, _guiones_de = {}, None
+
+def obtener_guion(campaña):
+    global _guiones_de
+    if df_script is None or _guiones_de is not df_script:
+        obtener_script_bloques(campaña)
+        _guiones.clear()
+        _guiones_de = df_script
+    if campaña not in _guiones:
+        script_dict = obtener_script_bloques(campaña)
+        _guiones[campaña] = alineador_guion.AlineadorGuion(script_dict, bloques) if script_dict else None
+    return _guiones[campaña]
+
+def evaluar_velocidad(wpm):
+    if wpm < LIMITES_WPM[0]:
+        return "Lenta", 0.5
+    elif wpm > LIMITES_WPM[1]:
+        return "Rápida", 0.5
+    else:
+        return "Adecuada", 1.0
+
+def evaluar_friccion(porcentaje):
+    if porcentaje <= LIMITES_FRICCION[0]:
+        return "Baja", 1.0
+    elif porcentaje <= LIMITES_FRICCION[1]:
+        return "Media", 0.75
+    else:
+        return "Alta", 0.5
+
+# Apego por bloque: % de las palabras del bloque alineadas en orden con la transcripción
+# (ver alineador_guion.py); guion es el de obtener_guion y transcripcion, texto o tokens
+def calcular_apego_bloques(guion, transcripcion):
+    if guion is None:
+        return 0.0, {}
+    alineado = guion.alinear(transcripcion)
+    detalle = {b: round(r["cobertura"], 1) for b, r in alineado["bloques"].items()}
+    return round(alineado["apego"], 1), detalle
+
+def calcular_score_total(apego, wpm, friccion_pct):
+    _, puntaje_wpm = evaluar_velocidad(wpm)
+    _, puntaje_friccion = evaluar_friccion(friccion_pct)
+    return round(apego * PESO_APEGO + puntaje_wpm * 100 * PESO_WPM + puntaje_friccion * 100 * PESO_FRICCION, 1)
+
+# Fricción: objeciones distintas detectadas sobre el total de frases
+def calcular_friccion(objeciones_distintas, total_frases):
+    return round((objeciones_distintas / (total_frases or 1)) * 100, 2)
+
+def contar_frases(transcripcion):
+    return len(transcripcion.split(".")) or 1
+
+# Fila de resumen.csv para una llamada ya transcrita. Con VAD, duracion_voz_seg (solo el habla)
+# es la base de Palabras/min; Duración (min) sigue siendo la del audio completo.
+def calcular_fila(archivo, agente, campaña, fecha, transcripcion, duracion_seg, duracion_voz_seg=None):
+    palabras = len(transcripcion.split())
+    duracion_min = round(duracion_seg / 60, 2)
+    minutos_voz = round((duracion_seg if duracion_voz_seg is None else duracion_voz_seg) / 60, 2)
+    ppm = round(palabras / minutos_voz, 2) if minutos_voz > 0 else 0
+    preview = " ".join(transcripcion.split()[:20]) + "..."
+
+    # Se tokeniza una vez; una sola pasada para todas las categorías y otra para el guion
+    tokens = detector_frases.tokenizar(transcripcion)
+    hits = detector.buscar(tokens)
+    saludo = hits["saludo"]["conteo"] > 0
+    objecion = hits["objecion"]["conteo"] > 0
+    cierre = hits["cierre"]["conteo"] > 0
+    precio = hits["precio"]["conteo"] > 0
+    consentimiento = {
+        "consentimiento": hits["consentimiento"]["conteo"] > 0,
+        "respuesta_positiva": hits["afirmacion"]["conteo"] > 0,
+    }
+
+    apego_total, detalle = calcular_apego_bloques(obtener_guion(campaña), tokens)
+
+    friccion_pct = calcular_friccion(len(set(hits["objecion"]["frases"])), contar_frases(transcripcion))
+
+    eval_wpm, _ = evaluar_velocidad(ppm)
+    eval_fric, _ = evaluar_friccion(friccion_pct)
+    score_total = calcular_score_total(apego_total, ppm, friccion_pct)
+
+    resultado = "Exitoso" if cierre and not objecion else "No Exitoso" if objecion and not cierre else "Indeterminado"
+
+    fila_resumen = [
+        archivo, agente, campaña, fecha, palabras, duracion_min, ppm,
+        saludo, consentimiento["consentimiento"], consentimiento["respuesta_positiva"],
+        precio, cierre, objecion, resultado, preview,
+        apego_total, ppm, eval_wpm, friccion_pct, eval_fric, score_total
+    ]
+    for b in bloques:
+        fila_resumen.append(detalle.get(b, 0.0))
+    return fila_resumen
+
+# Versiones vectorizadas (arrays de numpy) de las mismas reglas, para recalcular en lote
+def evaluar_velocidad_vec(wpm):
+    wpm = np.asarray(wpm, dtype=float)
+    etiquetas = np.select([wpm < LIMITES_WPM[0], wpm > LIMITES_WPM[1]], ["Lenta", "Rápida"], "Adecuada")
+    puntajes = np.where(etiquetas == "Adecuada", 1.0, 0.5)
+    return etiquetas, puntajes
+
+def evaluar_friccion_vec(porcentaje):
+    porcentaje = np.asarray(porcentaje, dtype=float)
+    condiciones = [porcentaje <= LIMITES_FRICCION[0], porcentaje <= LIMITES_FRICCION[1]]
+    etiquetas = np.select(condiciones, ["Baja", "Media"], "Alta")
+    puntajes = np.select(condiciones, [1.0, 0.75], 0.5)
+    return etiquetas, puntajes
+
+def calcular_score_total_vec(apego, wpm, friccion_pct):
+    _, puntaje_wpm = evaluar_velocidad_vec(wpm)
+    _, puntaje_friccion = evaluar_friccion_vec(friccion_pct)
+    score = np.asarray(apego, dtype=float) * PESO_APEGO + puntaje_wpm * 100 * PESO_WPM + puntaje_friccion * 100 * PESO_FRICCION
+    return np.round(score, 1)
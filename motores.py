@@ -0,0 +1,127 @@
+import zlib
+import numpy as np
+from audio import SAMPLE_RATE
+
+# Motores de transcripción intercambiables. Todos reciben audio ya decodificado (float32 mono a
+# 16 kHz) y exponen la misma interfaz:
+#   transcribir(muestras)     -> {"text": str, "segments": [{"start", "end", "text"}, ...]}
+#   transcribir_lote(trozos)  -> [texto por trozo]  (ventanas de hasta 30 s, en una pasada si se puede)
+#   identidad                 -> texto que identifica motor + modelo en las claves de la caché
+# Cada motor importa su librería al construirse, así solo hace falta instalar la que se usa.
+# clave(modelo) da la misma identidad sin construir el motor (sin importar torch ni cargar pesos).
+
+CODIGOS_IDIOMA = {"spanish": "es", "english": "en", "portuguese": "pt"}
+
+def codigo_idioma(idioma):
+    return CODIGOS_IDIOMA.get(idioma.lower(), idioma)
+
+def _limitar_hilos_torch(hilos):
+    if hilos:
+        import torch
+        torch.set_num_threads(hilos)
+        torch.set_num_interop_threads(1)
+
+# openai-whisper en PyTorch (precisión completa).
+class MotorWhisper:
+    nombre = "whisper"
+
+    def __init__(self, modelo="base", idioma="Spanish", hilos=None):
+        import whisper
+        _limitar_hilos_torch(hilos)
+        self.whisper = whisper
+        self.modelo = whisper.load_model(modelo)
+        self.idioma = idioma
+        self.identidad = self.clave(modelo)
+
+    # Sin prefijo: las entradas de caché anteriores ya usan el nombre del modelo como clave
+    @staticmethod
+    def clave(modelo):
+        return modelo
+
+    def transcribir(self, muestras):
+        resultado = self.modelo.transcribe(muestras, language=self.idioma)
+        segmentos = [{"start": s["start"], "end": s["end"], "text": s["text"].strip()} for s in resultado["segments"]]
+        return {"text": resultado["text"].strip(), "segments": segmentos}
+
+    def transcribir_lote(self, trozos):
+        import torch
+        whisper = self.whisper
+        mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(t), self.modelo.dims.n_mels) for t in trozos])
+        opciones = whisper.DecodingOptions(language=codigo_idioma(self.idioma), without_timestamps=True,
+                                           fp16=self.modelo.device.type == "cuda")
+        return [r.text.strip() for r in whisper.decode(self.modelo, mels.to(self.modelo.device), opciones)]
+
+# faster-whisper (CTranslate2) cuantizado a int8 en CPU.
+class MotorFasterWhisper:
+    nombre = "faster-whisper"
+
+    def __init__(self, modelo="base", idioma="Spanish", hilos=None):
+        from faster_whisper import WhisperModel
+        self.modelo = WhisperModel(modelo, device="cpu", compute_type="int8", cpu_threads=hilos or 0)
+        self.idioma = codigo_idioma(idioma)
+        self.identidad = self.clave(modelo)
+
+    @staticmethod
+    def clave(modelo):
+        return f"faster-whisper-{modelo}-int8"
+
+    def transcribir(self, muestras):
+        # beam_size=1: búsqueda voraz, igual que model.transcribe de openai-whisper por defecto
+        segmentos, _ = self.modelo.transcribe(muestras, language=self.idioma, beam_size=1)
+        segmentos = [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segmentos]
+        return {"text": " ".join(s["text"] for s in segmentos).strip(), "segments": segmentos}
+
+    def transcribir_lote(self, trozos):
+        textos = []
+        for trozo in trozos:
+            segmentos, _ = self.modelo.transcribe(trozo, language=self.idioma, beam_size=1, without_timestamps=True)
+            textos.append(" ".join(s.text.strip() for s in segmentos).strip())
+        return textos
+
+# Motor determinista para pruebas: el mismo audio produce siempre el mismo texto, sin modelo.
+class MotorFalso:
+    nombre = "falso"
+    VOCABULARIO = ["hola", "buenos", "días", "le", "habla", "precio", "contrato", "cuota", "claro", "sí",
+                   "consentimiento", "queda", "registrado", "no", "me", "interesa", "gracias", "señor", "plan", "valor"]
+    PALABRAS_POR_SEGUNDO = 2.5
+    TRAMO_S = 5
+
+    def __init__(self, modelo="falso", idioma="Spanish", hilos=None):
+        self.identidad = self.clave(modelo)
+
+    @staticmethod
+    def clave(modelo):
+        return "falso"
+
+    def _texto(self, muestras):
+        if not len(muestras) or np.sqrt(np.mean(np.square(muestras, dtype=np.float64))) < 1e-3:
+            return ""
+        semilla = zlib.crc32(np.ascontiguousarray(muestras, dtype=np.float32).tobytes())
+        n = int(round(len(muestras) / SAMPLE_RATE * self.PALABRAS_POR_SEGUNDO))
+        return " ".join(np.random.default_rng(semilla).choice(self.VOCABULARIO, n))
+
+    def transcribir(self, muestras):
+        tramo = self.TRAMO_S * SAMPLE_RATE
+        segmentos = []
+        for inicio in range(0, len(muestras), tramo):
+            texto = self._texto(muestras[inicio:inicio + tramo])
+            if texto:
+                fin = min(inicio + tramo, len(muestras))
+                segmentos.append({"start": inicio / SAMPLE_RATE, "end": fin / SAMPLE_RATE, "text": texto})
+        return {"text": " ".join(s["text"] for s in segmentos), "segments": segmentos}
+
+    def transcribir_lote(self, trozos):
+        return [self.transcribir(t)["text"] for t in trozos]
+
+MOTORES = {m.nombre: m for m in (MotorWhisper, MotorFasterWhisper, MotorFalso)}
+
+def _clase(nombre):
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor desconocido: {nombre} (disponibles: {', '.join(MOTORES)})")
+    return MOTORES[nombre]
+
+def crear(nombre="whisper", modelo="base", idioma="Spanish", hilos=None):
+    return _clase(nombre)(modelo, idioma, hilos)
+
+def identidad(nombre="whisper", modelo="base"):
+    return _clase(nombre).clave(modelo)
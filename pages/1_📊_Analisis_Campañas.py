@@ -2,31 +2,26 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import os
+import datos
 
 st.set_page_config(page_title="Análisis de Campañas", layout="wide")
 st.title("🔢 Análisis de Campañas")
 
-csv_path = "resumen.csv"
-if not os.path.exists(csv_path):
-    st.error("❌ No se encontró el archivo resumen.csv.")
+if not datos.hay_datos():
+    st.error("❌ No se encontró la base de resultados ni el archivo resumen.csv.")
     st.stop()
 
-df = pd.read_csv(csv_path)
-df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-df = df.dropna(subset=["Agente", "Campaña", "Fecha"])
+fecha_min, fecha_max = datos.rango("Fecha")
+if fecha_min is None:
+    st.info("Aún no hay llamadas procesadas.")
+    st.stop()
 
 st.sidebar.header("🎯 Filtros")
-campañas_disponibles = ["Todas"] + sorted(df["Campaña"].dropna().unique())
+campañas_disponibles = ["Todas"] + datos.valores_distintos("Campaña")
 campaña_sel = st.sidebar.selectbox("Selecciona una campaña", campañas_disponibles)
-fechas = st.sidebar.date_input("Rango de fechas", [df["Fecha"].min(), df["Fecha"].max()])
+fechas = st.sidebar.date_input("Rango de fechas", [pd.to_datetime(fecha_min), pd.to_datetime(fecha_max)])
 
-if campaña_sel == "Todas":
-    df_filtrado = df[(df["Fecha"] >= pd.to_datetime(fechas[0])) & (df["Fecha"] <= pd.to_datetime(fechas[1]))]
-else:
-    df_filtrado = df[(df["Campaña"] == campaña_sel) &
-                     (df["Fecha"] >= pd.to_datetime(fechas[0])) &
-                     (df["Fecha"] <= pd.to_datetime(fechas[1]))]
+filtros = dict(campaña=None if campaña_sel == "Todas" else campaña_sel, desde=fechas[0], hasta=fechas[1])
 
 st.subheader(f"👥 Desempeño de agentes{' - Campaña: ' + campaña_sel if campaña_sel != 'Todas' else ''}")
 
@@ -51,17 +46,7 @@ def icono_friccion(valor):
         return "🔴 " + valor
     return valor
 
-ranking = df_filtrado.groupby("Agente").agg({
-    "Score Total": "mean",
-    "Apego al Guion (%)": "mean",
-    "WPM": "mean",
-    "Friccion (%)": "mean",
-    "Archivo": "count",
-    "Evaluación WPM": lambda x: x.mode().iloc[0] if not x.mode().empty else "",
-    "Evaluación Fricción": lambda x: x.mode().iloc[0] if not x.mode().empty else "",
-}).reset_index().round(0)
-
-ranking = ranking.rename(columns={"Archivo": "Llamadas"})
+ranking = datos.ranking_agentes(**filtros)
 ranking["Evaluación WPM"] = ranking["Evaluación WPM"].apply(icono_wpm)
 ranking["Evaluación Fricción"] = ranking["Evaluación Fricción"].apply(icono_friccion)
 
@@ -74,11 +59,7 @@ tabla_ranking = tabla_ranking.style.format(precision=0).map(highlight_score, sub
 st.dataframe(tabla_ranking, use_container_width=True)
 
 st.subheader("📊 Cumplimiento por bloque de guión")
-bloques = [c for c in df.columns if c.startswith("% ")]
-
-df_bloques = df_filtrado[bloques].mean().round(1).reset_index()
-df_bloques.columns = ["Bloque", "Cumplimiento (%)"]
-df_bloques["Bloque"] = df_bloques["Bloque"].str.replace("% ", "")
+df_bloques = datos.medias_bloques(**filtros)
 
 fig_heat = px.bar(df_bloques, x="Bloque", y="Cumplimiento (%)",
                   title="Promedio de Cumplimiento por Bloque",
@@ -87,11 +68,14 @@ st.plotly_chart(fig_heat, use_container_width=True)
 
 st.subheader("🌟 Llamadas destacadas")
 
-df_filtrado["Evaluación WPM Icono"] = df_filtrado["Evaluación WPM"].apply(icono_wpm)
-df_filtrado["Evaluación Fricción Icono"] = df_filtrado["Evaluación Fricción"].apply(icono_friccion)
-
-top_mejores = df_filtrado.sort_values("Score Total", ascending=False).head(5)
-top_peores = df_filtrado.sort_values("Score Total").head(5)
+# Las 5 mejores y peores se ordenan y limitan en la base (índice por Score Total); score_min=0
+# deja fuera las llamadas sin score, que SQLite pondría primero en el orden ascendente
+columnas_destacadas = ["Agente", "Score Total", "Evaluación WPM", "Evaluación Fricción"]
+top_mejores, _ = datos.pagina_llamadas(columnas_destacadas, [("Score Total", True)], 1, 5, score_min=0, **filtros)
+top_peores, _ = datos.pagina_llamadas(columnas_destacadas, [("Score Total", False)], 1, 5, score_min=0, **filtros)
+for tabla in (top_mejores, top_peores):
+    tabla["Evaluación WPM Icono"] = tabla["Evaluación WPM"].apply(icono_wpm)
+    tabla["Evaluación Fricción Icono"] = tabla["Evaluación Fricción"].apply(icono_friccion)
 
 col1, col2 = st.columns(2)
 with col1:
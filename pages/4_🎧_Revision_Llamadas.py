@@ -1,89 +1,158 @@
 
 import streamlit as st
 import pandas as pd
+import math
 import os
+import datos
+import resultados
 
 st.set_page_config(page_title="Revisión de Llamadas", layout="wide")
 st.title("📄 Revisión de Llamadas")
 
 # Cargar datos
-csv_path = "resumen.csv"
 csv_clasificacion = "clasificacion_llamadas.csv"
+COLUMNAS_CLASIFICACION = ["Archivo", "Clasificación", "Comentario"]
+OPCIONES = ["No clasificada", "Buena", "Mala", "Requiere coaching"]
+COLUMNAS = ["Archivo", "Fecha", "Agente", "Campaña", "Score Total", "Resultado Estimado", "Preview"]
+# La página se ordena y recorta en la base: solo viajan al navegador las filas visibles
+ORDENES = {
+    "Fecha (recientes primero)": [("Fecha", True)],
+    "Fecha (antiguas primero)": [("Fecha", False)],
+    "Score (menor primero)": [("Score Total", False)],
+    "Score (mayor primero)": [("Score Total", True)],
+    "Agente": [("Agente", False), ("Fecha", True)],
+}
 
 try:
-    df = pd.read_csv(csv_path)
-    df["Fecha"] = pd.to_datetime(df["Fecha"], errors="coerce")
-    df = df.dropna(subset=["Archivo", "Agente", "Campaña", "Score Total"])
+    if not datos.hay_datos():
+        raise FileNotFoundError("resumen.csv")
+    score_min, score_max = datos.rango("Score Total")
+    fecha_min, fecha_max = datos.rango("Fecha")
+    if score_min is None:
+        st.info("Aún no hay llamadas procesadas.")
+        st.stop()
 
     # Inicializar archivo de clasificación si no existe
     if not os.path.exists(csv_clasificacion):
-        clasificacion_df = pd.DataFrame(columns=["Archivo", "Clasificación", "Comentario"])
+        clasificacion_df = pd.DataFrame(columns=COLUMNAS_CLASIFICACION)
         clasificacion_df.to_csv(csv_clasificacion, index=False)
 
-    clasificacion_df = pd.read_csv(csv_clasificacion)
+    clasificacion_df = pd.read_csv(csv_clasificacion, dtype=str, keep_default_na=False)
 
     st.sidebar.header("🔎 Filtros")
-    campañas = ["Todas"] + sorted(df["Campaña"].dropna().unique())
-    agentes = ["Todos"] + sorted(df["Agente"].dropna().unique())
+    campañas = ["Todas"] + datos.valores_distintos("Campaña")
+    agentes = ["Todos"] + datos.valores_distintos("Agente")
     campaña_sel = st.sidebar.selectbox("Campaña", campañas)
     agente_sel = st.sidebar.selectbox("Agente", agentes)
-    score_range = st.sidebar.slider("Score Total", int(df["Score Total"].min()), int(df["Score Total"].max()), (60, 100))
-    fechas = st.sidebar.date_input("Rango de fechas", [df["Fecha"].min(), df["Fecha"].max()])
-
-    df_filtrado = df[
-        (df["Fecha"] >= pd.to_datetime(fechas[0])) &
-        (df["Fecha"] <= pd.to_datetime(fechas[1])) &
-        (df["Score Total"] >= score_range[0]) &
-        (df["Score Total"] <= score_range[1])
-    ]
-
-    if campaña_sel != "Todas":
-        df_filtrado = df_filtrado[df_filtrado["Campaña"] == campaña_sel]
-    if agente_sel != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["Agente"] == agente_sel]
-
-    st.subheader("📋 Llamadas filtradas")
-    st.dataframe(df_filtrado[["Archivo", "Fecha", "Agente", "Campaña", "Score Total", "Resultado Estimado"]], use_container_width=True)
-
-    st.subheader("🎧 Revisión detallada")
-
-    for _, row in df_filtrado.iterrows():
-        with st.expander(f"{row['Agente']} | {row['Campaña']} | Score: {row['Score Total']} | {row['Archivo']}"):
-            col1, col2 = st.columns([1, 4])
-            with col1:
-                audio_path = os.path.join("audios", row["Archivo"])
-                if os.path.exists(audio_path):
-                    st.audio(audio_path)
-                else:
-                    st.warning("Audio no disponible.")
-
-            with col2:
-                st.markdown("**Transcripción:**")
-                st.markdown(row["Preview"])
-
-                st.markdown("**Clasificación manual:**")
-                clasificacion = st.radio(
-                    f"Clasificar llamada {row['Archivo']}",
-                    ["No clasificada", "Buena", "Mala", "Requiere coaching"],
-                    index=0,
-                    key=row["Archivo"]
-                )
-                comentario = st.text_input(f"Comentario para {row['Archivo']}", key=row["Archivo"] + "_c")
-
-                if clasificacion != "No clasificada":
-                    nuevo_registro = pd.DataFrame([{
-                        "Archivo": row["Archivo"],
-                        "Clasificación": clasificacion,
-                        "Comentario": comentario
-                    }])
-
-                    clasificacion_df = clasificacion_df[clasificacion_df["Archivo"] != row["Archivo"]]
-                    clasificacion_df = pd.concat([clasificacion_df, nuevo_registro], ignore_index=True)
-
-    st.subheader("📤 Guardar clasificaciones")
-    if st.button("💾 Guardar"):
-        clasificacion_df.to_csv(csv_clasificacion, index=False)
-        st.success("Clasificaciones guardadas correctamente.")
+    score_range = st.sidebar.slider("Score Total", int(score_min), int(score_max), (60, 100))
+    fechas = st.sidebar.date_input("Rango de fechas", [pd.to_datetime(fecha_min), pd.to_datetime(fecha_max)])
+    orden_sel = st.sidebar.selectbox("Ordenar por", list(ORDENES))
+    tamaño = st.sidebar.selectbox("Llamadas por página", [10, 25, 50, 100], index=1)
+
+    filtros = dict(
+        campaña=None if campaña_sel == "Todas" else campaña_sel,
+        agente=None if agente_sel == "Todos" else agente_sel,
+        desde=fechas[0],
+        hasta=fechas[-1],
+        score_min=score_range[0],
+        score_max=score_range[1],
+    )
+    # Un cambio de filtros u orden vuelve a la primera página
+    firma_filtros = (tuple(filtros.values()), orden_sel, tamaño)
+    if st.session_state.get("firma_filtros") != firma_filtros:
+        st.session_state["firma_filtros"] = firma_filtros
+        st.session_state["pagina"] = 1
+
+    pagina = st.session_state.get("pagina", 1)
+    df_pagina, total = datos.pagina_llamadas(COLUMNAS, ORDENES[orden_sel], pagina, tamaño, **filtros)
+    if total == 0:
+        st.info("No hay llamadas con esos filtros.")
+        st.stop()
+
+    paginas = math.ceil(total / tamaño)
+    if pagina > paginas:
+        # La base cambió y la página quedó fuera de rango
+        st.session_state["pagina"] = paginas
+        st.rerun()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input("Página", min_value=1, max_value=paginas, step=1, key="pagina")
+    with col2:
+        st.markdown(f"**{total:,} llamadas** · página {pagina} de {paginas}")
+
+    st.subheader("🎧 Escuchar una llamada")
+    # Solo la llamada elegida carga su audio y su transcripción completa
+    archivo_sel = st.selectbox(
+        "Llamada", df_pagina["Archivo"].tolist(),
+        format_func=lambda a: "{Agente} | {Campaña} | Score: {Score Total} | {Archivo}".format(
+            **df_pagina.set_index("Archivo").loc[a].to_dict(), Archivo=a))
+    fila = df_pagina.set_index("Archivo").loc[archivo_sel]
+    # Al cambiar de llamada el reproductor vuelve al inicio
+    if st.session_state.get("audio_archivo") != archivo_sel:
+        st.session_state["audio_archivo"] = archivo_sel
+        st.session_state["audio_inicio"] = 0
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        # Copia liviana (Opus) si el pipeline ya la generó
+        reproducible = datos.audio_reproduccion(archivo_sel)
+        if reproducible is not None:
+            st.audio(reproducible[0], format=reproducible[1], start_time=st.session_state["audio_inicio"])
+        else:
+            st.warning("Audio no disponible.")
+        # Saltos a los segmentos donde se detectó cada frase o bloque del guion
+        momentos = datos.momentos(archivo_sel, fila["Campaña"])
+        if momentos:
+            st.markdown("**Ir a:**")
+            for i, m in enumerate(momentos):
+                minuto = f"{int(m['inicio'] // 60)}:{int(m['inicio'] % 60):02d}"
+                if st.button(f"{minuto} · {m['tipo']}: {m['detalle']}", key=f"momento_{i}", help=m["texto"],
+                             use_container_width=True):
+                    st.session_state["audio_inicio"] = int(m["inicio"])
+                    st.rerun()
+        elif momentos is None:
+            st.caption("Sin tiempos por segmento para esta llamada.")
+    with col2:
+        st.markdown("**Transcripción:**")
+        texto = datos.transcripcion(archivo_sel)
+        if texto is not None:
+            st.text_area("Transcripción", texto, height=200, label_visibility="collapsed")
+        else:
+            st.markdown(fila["Preview"])
+
+    st.subheader("📋 Clasificación manual")
+    st.caption("Las clasificaciones de la página se guardan juntas al enviar el formulario.")
+    actual = df_pagina[COLUMNAS[:-1]].merge(clasificacion_df, on="Archivo", how="left")
+    actual["Clasificación"] = actual["Clasificación"].where(actual["Clasificación"].isin(OPCIONES), "No clasificada")
+    actual["Comentario"] = actual["Comentario"].fillna("")
+
+    # Dentro del formulario, editar una celda no vuelve a ejecutar la página
+    with st.form("clasificaciones"):
+        editado = st.data_editor(
+            actual,
+            column_config={
+                "Clasificación": st.column_config.SelectboxColumn(options=OPCIONES, required=True),
+                "Comentario": st.column_config.TextColumn(),
+                "Fecha": st.column_config.DateColumn(),
+            },
+            disabled=COLUMNAS[:-1],
+            hide_index=True,
+            use_container_width=True,
+            key=f"editor_{hash(firma_filtros)}_{pagina}",
+        )
+        guardar = st.form_submit_button("💾 Guardar clasificaciones")
+
+    if guardar:
+        cambiadas = editado[(editado["Clasificación"] != actual["Clasificación"])
+                            | (editado["Comentario"] != actual["Comentario"])]
+        clasificadas = cambiadas[cambiadas["Clasificación"] != "No clasificada"]
+        desclasificadas = cambiadas.loc[cambiadas["Clasificación"] == "No clasificada", "Archivo"]
+        if cambiadas.empty:
+            st.info("No hay cambios que guardar.")
+        else:
+            resultados.upsert_csv(csv_clasificacion, COLUMNAS_CLASIFICACION,
+                                  clasificadas[COLUMNAS_CLASIFICACION].values.tolist(), quitar=desclasificadas)
+            clasificacion_df = pd.read_csv(csv_clasificacion, dtype=str, keep_default_na=False)
+            st.success(f"{len(cambiadas)} clasificaciones guardadas correctamente.")
 
     st.download_button(
         label="⬇️ Exportar clasificaciones",
@@ -93,4 +162,4 @@ try:
     )
 
 except FileNotFoundError:
-    st.error("❌ No se encontró el archivo resumen.csv. Ejecuta el transcriptor primero.")
+    st.error("❌ No se encontró la base de resultados ni el archivo resumen.csv. Ejecuta el transcriptor primero.")
@@ -17,7 +17,11 @@ El **Apego al Guión** se calcula como el promedio de cumplimiento por bloques d
 | Beneficios   | “Usted obtiene…”                | 20%  |
 | Cierre       | “¿Confirmamos la compra?”       | 20%  |
 
-Cada bloque se compara con la transcripción para determinar si fue mencionado correctamente.
+Cada bloque se compara con la transcripción: su cumplimiento es el **% de las palabras del bloque
+que aparecen en la llamada en el mismo orden del guion**. No basta con que las palabras estén en
+cualquier parte de la llamada; si el agente cambia palabras, omite partes o desordena el bloque, el
+porcentaje baja en proporción. Los marcadores entre corchetes del script (por ejemplo
+`[nombre del cliente]`) no cuentan como palabras del bloque.
 """)
 
 st.header("🧮 Cálculo del Score Total del Agente")
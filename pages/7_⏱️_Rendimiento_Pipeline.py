@@ -0,0 +1,105 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import datos
+
+st.set_page_config(page_title="Rendimiento del Pipeline", layout="wide")
+st.title("⏱️ Rendimiento del Pipeline de Transcripción")
+
+if not datos.hay_datos():
+    st.error("❌ No se encontró la base de resultados. Ejecuta el transcriptor primero.")
+    st.stop()
+
+metricas = datos.metricas()
+if metricas.empty:
+    st.info("Aún no hay métricas: se registran desde la próxima corrida de transcriptor.py.")
+    st.stop()
+
+ETAPAS = {"decodificacion_ms": "Decodificación (ms)", "reproduccion_ms": "Copia de reproducción (ms)",
+          "inferencia_ms": "Inferencia (ms)", "kpis_ms": "KPIs (ms)", "escritura_ms": "Escritura (ms)"}
+
+st.sidebar.header("🎯 Filtros")
+fechas = st.sidebar.date_input("Rango de fechas", [metricas["procesado_en"].min().date(),
+                                                   metricas["procesado_en"].max().date()])
+incluir_cache = st.sidebar.checkbox("Incluir aciertos de caché", value=False,
+                                    help="Las llamadas servidas desde la caché no pasan por el modelo")
+
+df = datos.metricas(desde=fechas[0], hasta=fechas[-1])
+if not incluir_cache:
+    df = df[~df["cache"]]
+if df.empty:
+    st.info("No hay llamadas procesadas con esos filtros.")
+    st.stop()
+
+df = df.copy()
+df["Motor"] = df["motor"] + ":" + df["modelo"] + df["vad"].map({True: " +vad", False: ""})
+df["total_ms"] = df[list(ETAPAS)].sum(axis=1)
+df["Campaña"] = df["Campaña"].fillna("(sin campaña)")
+
+# Indicadores generales
+segundos_proceso = df["total_ms"].sum() / 1000
+rtf_mediano = df["rtf"].median()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Llamadas procesadas", f"{len(df):,}")
+col2.metric("Horas de audio", f"{df['segundos_audio'].sum() / 3600:.1f}")
+col3.metric("RTF mediano", f"{rtf_mediano:.3f}" if pd.notna(rtf_mediano) else "—",
+            help="Segundos de inferencia por segundo de audio (menor es mejor)")
+col4.metric("Llamadas/hora (un proceso)", f"{len(df) / segundos_proceso * 3600:,.0f}" if segundos_proceso else "—")
+
+# Planificación: tiempo estimado para el backlog pendiente al ritmo observado
+pendientes = datos.pendientes()
+if pendientes:
+    por_llamada = df["total_ms"].median() / 1000
+    st.info(f"📦 Backlog pendiente: **{pendientes:,} llamadas** ≈ "
+            f"**{pendientes * por_llamada / 3600:.1f} h** de proceso con un worker "
+            f"(mediana de {por_llamada:.1f} s por llamada).")
+
+cola = datos.cola_trabajos()
+if any(cola[e] for e in ("pendiente", "en_proceso", "fallido")):
+    st.caption(f"🛰️ Cola del servicio: {cola['pendiente']} pendientes ({cola['sin_metadatos']} sin metadatos), "
+               f"{cola['en_proceso']} en proceso, {cola['fallido']} fallidos.")
+
+st.subheader("📈 Rendimiento en el tiempo")
+granularidad = st.radio("Agrupar por", ["Hora", "Día"], horizontal=True)
+periodo = df["procesado_en"].dt.floor("h" if granularidad == "Hora" else "D")
+serie = df.groupby(periodo).agg(Llamadas=("Archivo", "size"),
+                                **{"Minutos de audio": ("segundos_audio", lambda s: s.sum() / 60)},
+                                **{"RTF mediano": ("rtf", "median")}).reset_index()
+serie = serie.rename(columns={"procesado_en": "Periodo"})
+col1, col2 = st.columns(2)
+with col1:
+    st.plotly_chart(px.bar(serie, x="Periodo", y="Llamadas", title="Llamadas procesadas"), use_container_width=True)
+with col2:
+    st.plotly_chart(px.line(serie, x="Periodo", y="RTF mediano", markers=True, title="RTF mediano"),
+                    use_container_width=True)
+
+st.subheader("🧩 Dónde se va el tiempo")
+etapas = df[list(ETAPAS)].sum().rename(index=lambda c: ETAPAS[c].replace(" (ms)", "")) / 1000
+etapas = etapas.reset_index()
+etapas.columns = ["Etapa", "Segundos"]
+st.plotly_chart(px.bar(etapas, x="Etapa", y="Segundos", color="Etapa", title="Tiempo total por etapa"),
+                use_container_width=True)
+
+st.subheader("⚖️ RTF por campaña y por motor")
+col1, col2 = st.columns(2)
+with col1:
+    st.plotly_chart(px.box(df, x="Campaña", y="rtf", points="outliers", title="RTF por campaña",
+                           labels={"rtf": "RTF"}), use_container_width=True)
+with col2:
+    st.plotly_chart(px.box(df, x="Motor", y="rtf", points="outliers", title="RTF por motor y modelo",
+                           labels={"rtf": "RTF"}), use_container_width=True)
+
+st.subheader("🐢 Llamadas más lentas")
+st.caption("Un RTF alto con poca voz suele indicar audio problemático (ruido, música, silencios largos).")
+lentas = df.sort_values("total_ms", ascending=False).head(20)
+lentas = lentas.assign(**{
+    "Total (s)": lentas["total_ms"] / 1000,
+    "Audio (s)": lentas["segundos_audio"],
+    "Voz (%)": lentas["segundos_voz"] / lentas["segundos_audio"].where(lentas["segundos_audio"] > 0) * 100,
+    "Procesado": lentas["procesado_en"].dt.strftime("%Y-%m-%d %H:%M"),
+})
+st.dataframe(
+    lentas[["Archivo", "Agente", "Campaña", "Motor", "Procesado", "Total (s)", "Audio (s)", "Voz (%)", "rtf"]
+           + list(ETAPAS)].rename(columns={"rtf": "RTF", **ETAPAS}).style.format(precision=2),
+    use_container_width=True,
+)
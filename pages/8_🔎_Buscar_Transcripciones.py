@@ -0,0 +1,68 @@
+import sqlite3
+import time
+import streamlit as st
+import pandas as pd
+import almacen
+import datos
+
+st.set_page_config(page_title="Buscar en Transcripciones", layout="wide")
+st.title("🔎 Buscar en Transcripciones")
+
+if not datos.hay_datos():
+    st.error("❌ No se encontró la base de resultados. Ejecuta el transcriptor primero.")
+    st.stop()
+
+MODOS = {
+    "Frase exacta": "frase",
+    "Todas las palabras": "palabras",
+    "Avanzada (OR, NEAR, prefijo*)": "avanzada",
+}
+
+st.sidebar.header("🎯 Filtros")
+campaña_sel = st.sidebar.selectbox("Campaña", ["Todas"] + datos.valores_distintos("Campaña"))
+agente_sel = st.sidebar.selectbox("Agente", ["Todos"] + datos.valores_distintos("Agente"))
+fecha_min, fecha_max = datos.rango("Fecha")
+fechas = st.sidebar.date_input("Rango de fechas", [pd.to_datetime(fecha_min), pd.to_datetime(fecha_max)]) \
+    if fecha_min else [None]
+limite = st.sidebar.selectbox("Resultados a mostrar", [25, 50, 100, 250], index=1)
+
+col1, col2 = st.columns([3, 1])
+with col1:
+    texto = st.text_input("Buscar", placeholder='p. ej. no me interesa, cargo automático')
+with col2:
+    modo = st.selectbox("Modo", list(MODOS))
+st.caption("Sin distinguir mayúsculas ni acentos: «cargo automatico» encuentra «cargo automático».")
+
+if not texto.strip():
+    st.stop()
+
+consulta = almacen.consulta_fts(texto, MODOS[modo])
+inicio = time.perf_counter()
+try:
+    resultados, total = datos.buscar_transcripciones(
+        consulta,
+        agente=None if agente_sel == "Todos" else agente_sel,
+        campaña=None if campaña_sel == "Todas" else campaña_sel,
+        desde=fechas[0],
+        hasta=fechas[-1],
+        limite=limite,
+    )
+except sqlite3.OperationalError as e:
+    st.error(f"Consulta no válida: {e}")
+    st.stop()
+milisegundos = (time.perf_counter() - inicio) * 1000
+
+st.markdown(f"**{total:,} llamadas** contienen «{texto}» ({milisegundos:.0f} ms)"
+            + (f"; se muestran las {len(resultados)} más relevantes." if total > len(resultados) else "."))
+if resultados.empty:
+    st.stop()
+
+resumen = resultados.groupby("Agente").size().rename("Llamadas").sort_values(ascending=False).reset_index()
+with st.expander("📊 Coincidencias por agente (entre los resultados mostrados)"):
+    st.dataframe(resumen, use_container_width=True, hide_index=True)
+
+for fila in resultados.itertuples(index=False):
+    fecha = pd.to_datetime(fila.Fecha).strftime("%Y-%m-%d") if pd.notna(fila.Fecha) else "—"
+    score = f"{fila.Score:.0f}" if pd.notna(fila.Score) else "—"
+    st.markdown(f"**{fila.Agente}** · {fila.Campaña} · {fecha} · Score {score} · `{fila.Archivo}`")
+    st.markdown(f"> {fila.Fragmento}")
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import almacen
+import detector_frases
+import kpis
+import resultados
+
+# Recalcula apego, fricción y Score Total de todo el historial desde las transcripciones
+# guardadas en callcenter.db, sin volver a pasar por Whisper. Se usa tras editar script_campana_bloques.csv
+# o los umbrales y pesos de kpis.py.
+#
+# Las transcripciones se resumen en un índice persistente (la secuencia de tokens de cada
+# llamada como ids de un vocabulario común, más el total de frases y las objeciones distintas).
+# Solo se tokenizan las transcripciones nuevas o modificadas; el apego de cada llamada sale de
+# alinear su secuencia con el guion compilado de su campaña, sin volver a leer el texto. La
+# cobertura por bloque queda en el índice junto con la firma del guion con que se calculó: solo
+# se vuelven a alinear las llamadas nuevas o cuyo guion cambió, así cambiar un umbral o un peso
+# recalcula todo el historial con operaciones vectorizadas.
+
+INDICE_PATH = os.path.join(almacen.TRANSCRIPCION_DIR, "indice_recalculo.npz")
+# Cambia cuando cambia lo que guarda el índice; un índice de otro formato se rehace completo
+FORMATO_INDICE = 4
+# Transcripciones que se leen de la base por consulta al indexar
+LECTURA = 1000
+# A partir de cuántas llamadas modificadas en un lote conviene reconstruir los rollups completos
+MASIVO = 5000
+
+def _firma_indice():
+    return hashlib.sha1(json.dumps([FORMATO_INDICE, kpis.OBJECIONES], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _indice_vacio():
+    return {
+        "archivos": [], "revisiones": np.zeros(0, dtype=np.int64), "indptr": np.zeros(1, dtype=np.int64),
+        "indices": np.zeros(0, dtype=np.int32), "vocab": [], "frases": np.zeros(0, dtype=np.int32),
+        "objeciones": np.zeros(0, dtype=np.int32), "firma": "",
+        "apego": np.zeros((0, len(kpis.bloques)), dtype=np.float32), "guiones": np.zeros(0, dtype=object),
+    }
+
+def cargar_indice(path=INDICE_PATH):
+    if not os.path.exists(path):
+        return _indice_vacio()
+    with np.load(path) as npz:
+        if "guiones" not in npz.files:
+            # Índice de un formato anterior: se rehace completo
+            return _indice_vacio()
+        return {
+            "archivos": npz["archivos"].tolist(), "revisiones": npz["revisiones"], "indptr": npz["indptr"],
+            "indices": npz["indices"], "vocab": npz["vocab"].tolist(), "frases": npz["frases"],
+            "objeciones": npz["objeciones"], "firma": str(npz["firma"]),
+            "apego": npz["apego"], "guiones": npz["firmas_guion"][npz["guiones"]].astype(object),
+        }
+
+def guardar_indice(indice, path=INDICE_PATH):
+    # Firma del guion de cada llamada como código en la lista de firmas distintas
+    firmas, codigos = np.unique(indice["guiones"].astype(str), return_inverse=True)
+
+    def escribir(f):
+        np.savez(f, apego=indice["apego"], firmas_guion=firmas, guiones=codigos.astype(np.int32), archivos=np.array(indice["archivos"], dtype=str), revisiones=indice["revisiones"],
+                 indptr=indice["indptr"], indices=indice["indices"],
+                 vocab=np.array(indice["vocab"], dtype=str), frases=indice["frases"],
+                 objeciones=indice["objeciones"], firma=np.array(indice["firma"]))
+
+    resultados.escribir_atomico(path, escribir, modo="wb")
+
+# Sincroniza el índice con las llamadas pedidas; devuelve (indice, transcripciones tokenizadas).
+# Solo se leen de la base los textos nuevos o con otra revisión, de a LECTURA por consulta.
+def actualizar_indice(indice, con, archivos):
+    firma = _firma_indice()
+    rehacer = indice["firma"] != firma
+    posicion = {a: i for i, a in enumerate(indice["archivos"])}
+    vocab = {} if rehacer else {w: i for i, w in enumerate(indice["vocab"])}
+    indptr, indices = indice["indptr"], indice["indices"]
+    revisiones = almacen.revisiones_transcripciones(con)
+    archivos = [a for a in archivos if a in revisiones]
+
+    filas, frases, objeciones, apego, guiones = [], [], [], [], []
+    tokenizadas = 0
+    for desde in range(0, len(archivos), LECTURA):
+        parte = archivos[desde:desde + LECTURA]
+        vigentes = {a: posicion[a] for a in parte if not rehacer and a in posicion
+                    and indice["revisiones"][posicion[a]] == revisiones[a]}
+        textos = almacen.leer_transcripciones(con, [a for a in parte if a not in vigentes])
+        for archivo in parte:
+            i = vigentes.get(archivo)
+            if i is not None:
+                filas.append(indices[indptr[i]:indptr[i + 1]])
+                frases.append(indice["frases"][i])
+                objeciones.append(indice["objeciones"][i])
+                apego.append(indice["apego"][i])
+                guiones.append(indice["guiones"][i])
+                continue
+            texto = textos[archivo]
+            tokens = detector_frases.tokenizar(texto)
+            filas.append(np.array([vocab.setdefault(w, len(vocab)) for w in tokens], dtype=np.int32))
+            frases.append(kpis.contar_frases(texto))
+            objeciones.append(len(set(kpis.detector.buscar(tokens)["objecion"]["frases"])))
+            # Sin firma de guion: se alinea en el próximo apego_bloques
+            apego.append(np.zeros(len(kpis.bloques), dtype=np.float32))
+            guiones.append("")
+            tokenizadas += 1
+
+    largos = np.fromiter((len(f) for f in filas), dtype=np.int64, count=len(filas))
+    nuevo = {
+        "archivos": archivos,
+        "revisiones": np.array([revisiones[a] for a in archivos], dtype=np.int64),
+        "indptr": np.concatenate([[0], np.cumsum(largos)]).astype(np.int64),
+        "indices": np.concatenate(filas).astype(np.int32) if filas else np.zeros(0, dtype=np.int32),
+        "vocab": sorted(vocab, key=vocab.get),
+        "frases": np.array(frases, dtype=np.int32),
+        "objeciones": np.array(objeciones, dtype=np.int32),
+        "firma": firma,
+        "apego": np.array(apego, dtype=np.float32).reshape(len(archivos), len(kpis.bloques)),
+        "guiones": np.array(guiones, dtype=object),
+    }
+    return nuevo, tokenizadas
+
+# Porcentaje de cada bloque por llamada (filas del índice) según la campaña de cada una. Solo se
+# alinean las llamadas cuya cobertura guardada es de otro guion; el resultado queda en el índice.
+# traductores guarda, por campaña, el paso del vocabulario del índice a los ids de su guion.
+# Devuelve (detalle, llamadas alineadas).
+def apego_bloques(indice, filas, campañas, traductores):
+    detalle = np.zeros((len(filas), len(kpis.bloques)))
+    indptr, indices = indice["indptr"], indice["indices"]
+    alineadas = 0
+    for campaña in pd.unique(campañas):
+        guion = kpis.obtener_guion(campaña)
+        if guion is None:
+            continue
+        de_campaña = filas[campañas == campaña]
+        for i in de_campaña[indice["guiones"][de_campaña] != guion.firma]:
+            if campaña not in traductores:
+                traductores[campaña] = guion.traductor(indice["vocab"])
+            alineado = guion.alinear(traductores[campaña][indices[indptr[i]:indptr[i + 1]]])
+            indice["apego"][i] = [alineado["bloques"][b]["cobertura"] for b in kpis.bloques]
+            indice["guiones"][i] = guion.firma
+            alineadas += 1
+        detalle[campañas == campaña] = indice["apego"][de_campaña]
+    return detalle, alineadas
+
+def recalcular(con, lote=50000, indice_path=INDICE_PATH):
+    inicio = time.perf_counter()
+    llamadas = almacen.consultar(con, "SELECT * FROM llamadas")
+    indice, tokenizadas = actualizar_indice(cargar_indice(indice_path), con, llamadas["Archivo"])
+    t_indice = time.perf_counter() - inicio
+
+    fila_indice = {a: i for i, a in enumerate(indice["archivos"])}
+    llamadas["_fila"] = llamadas["Archivo"].map(fila_indice)
+    sin_transcripcion = int(llamadas["_fila"].isna().sum())
+    llamadas = llamadas.dropna(subset=["_fila"])
+    llamadas["_fila"] = llamadas["_fila"].astype(int)
+
+    traductores = {}
+    columnas_bloques = [f"% {b}" for b in kpis.bloques]
+    columnas_comparar = ["Apego al Guion (%)", "Friccion (%)", "Evaluación WPM", "Evaluación Fricción",
+                         "Score Total", "Objeción Detectada", "Resultado Estimado"] + columnas_bloques
+    modificadas = alineadas = 0
+
+    for desde in range(0, len(llamadas), lote):
+        df = llamadas.iloc[desde:desde + lote].copy()
+        filas = df["_fila"].to_numpy()
+
+        detalle, n = apego_bloques(indice, filas, df["Campaña"].to_numpy(), traductores)
+        alineadas += n
+        apego = np.round(detalle.sum(axis=1) / len(kpis.bloques), 1)
+        objeciones = indice["objeciones"][filas]
+        friccion = np.round(objeciones / np.maximum(indice["frases"][filas], 1) * 100, 2)
+        wpm = df["Palabras/min"].fillna(0).to_numpy(dtype=float)
+
+        nuevo = df.copy()
+        nuevo[columnas_bloques] = np.round(detalle, 1)
+        nuevo["Apego al Guion (%)"] = apego
+        nuevo["Friccion (%)"] = friccion
+        nuevo["Evaluación WPM"] = kpis.evaluar_velocidad_vec(wpm)[0]
+        nuevo["Evaluación Fricción"] = kpis.evaluar_friccion_vec(friccion)[0]
+        nuevo["Score Total"] = kpis.calcular_score_total_vec(apego, wpm, friccion)
+        objecion = objeciones > 0
+        cierre = nuevo["Cierre Detectado"].fillna(0).astype(bool).to_numpy()
+        nuevo["Objeción Detectada"] = objecion.astype(int)
+        nuevo["Resultado Estimado"] = np.select([cierre & ~objecion, objecion & ~cierre],
+                                                ["Exitoso", "No Exitoso"], "Indeterminado")
+
+        # Solo se escriben las llamadas cuyo resultado cambió; si son muchas, los rollups se
+        # reconstruyen en una pasada en vez de ajustarse fila a fila por trigger
+        antes = df[columnas_comparar].astype(object).where(df[columnas_comparar].notna(), None)
+        despues = nuevo[columnas_comparar].astype(object)
+        cambiadas = (antes.values != despues.values).any(axis=1)
+        nuevo = nuevo[cambiadas]
+        if nuevo.empty:
+            continue
+        filas_nuevas = nuevo[almacen.COLUMNAS_RESUMEN].itertuples(index=False)
+        if len(nuevo) >= MASIVO:
+            almacen.upsert_llamadas_masivo(con, filas_nuevas)
+        else:
+            almacen.upsert_llamadas(con, filas_nuevas)
+        with con:
+            con.executemany('UPDATE metadatos SET "KPI Score" = ? WHERE "Archivo" = ? AND "Estado" != \'Rechazado\'',
+                            zip(nuevo["Score Total"].tolist(), nuevo["Archivo"].tolist()))
+        modificadas += len(nuevo)
+    # Se guarda al final: incluye la cobertura de las llamadas alineadas en esta corrida
+    guardar_indice(indice, indice_path)
+
+    return {
+        "llamadas": len(llamadas),
+        "modificadas": modificadas,
+        "sin_transcripcion": sin_transcripcion,
+        "tokenizadas": tokenizadas,
+        "alineadas": alineadas,
+        "segundos_indice": t_indice,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula los KPIs del historial desde las transcripciones guardadas.")
+    parser.add_argument("--lote", type=int, default=50000, help="Llamadas por lote vectorizado")
+    parser.add_argument("--sin-exportar", action="store_true", help="No regenera resumen.csv ni metadatos.xlsx")
+    args = parser.parse_args(argv)
+
+    con = almacen.conectar()
+    r = recalcular(con, lote=args.lote)
+    print(f"🔁 Recalculadas {r['llamadas']} llamadas en {r['segundos']:.2f}s "
+          f"({r['tokenizadas']} transcripciones indexadas en {r['segundos_indice']:.2f}s, "
+          f"{r['alineadas']} alineadas con su guion); "
+          f"{r['modificadas']} con KPIs distintos.")
+    if r["sin_transcripcion"]:
+        print(f"⚠️ {r['sin_transcripcion']} llamadas sin transcripción guardada en la base.")
+    if not args.sin_exportar:
+        almacen.exportar_resumen_csv(con)
+        almacen.exportar_metadatos_xlsx(con)
+    con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import socket
+import signal
+import argparse
+import threading
+from contextlib import contextmanager
+import almacen
+import cache_transcripciones
+import motores
+import resultados
+import transcriptor
+
+# Procesamiento repartido entre varias máquinas que comparten la carpeta del proyecto por red,
+# sin intermediarios: la coordinación es una tabla de arriendos (arriendos.json) que solo se lee
+# y se modifica con un bloqueo de archivo (fcntl.lockf, que NFS también respeta entre máquinas).
+#
+#   python reparto.py repartir            # en la máquina de callcenter.db: Pendientes -> lotes
+#   python reparto.py nodo --workers 4    # en cada máquina, las veces que haga falta
+#   python reparto.py fusionar            # en la máquina de callcenter.db: fragmentos -> base
+#
+# Cada nodo arrienda un lote por vez con vencimiento, lo renueva con un latido mientras trabaja
+# y guarda los resultados en su propio fragmento (nodos/<nodo>/<lote>.json). Si un nodo se cae o
+# se cuelga, su arriendo vence y otro nodo retoma el lote; lo que el primero alcanzó a transcribir
+# sale de la caché compartida. Un fragmento solo cuenta si su arriendo sigue vigente al terminar,
+# así un nodo que despierta tarde no duplica un lote ya retomado.
+#
+# Solo fusionar escribe en callcenter.db (SQLite en modo WAL no admite escritores en máquinas
+# distintas). Transcripciones, segmentos, copias de reproducción y caché van directo a las carpetas
+# compartidas: se nombran por llamada o por hash y se escriben de forma atómica.
+REPARTO_DIR = os.path.join(almacen.TRANSCRIPCION_DIR, "reparto")
+TABLA = "arriendos.json"
+TAMAÑO_LOTE = 50
+# Validez de un arriendo; el latido lo renueva cada tercio. Debe superar con holgura la diferencia
+# de reloj entre las máquinas.
+ARRIENDO_S = 300
+# Arriendos de un mismo lote antes de darlo por fallido (un lote que tumba al nodo cada vez no
+# debe pasar de nodo en nodo para siempre); repartir --reintentar-fallidos lo devuelve
+MAX_INTENTOS = 3
+
+detener = threading.Event()
+
+def _señal(numero, _frame):
+    print(f"🛑 Señal {signal.Signals(numero).name}: se devuelve el lote en curso y se detiene el nodo.")
+    detener.set()
+
+def _leer_json(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+def _escribir_json(ruta, datos):
+    # Los resultados de kpis traen escalares de numpy
+    resultados.escribir_atomico(ruta, lambda f: json.dump(datos, f, ensure_ascii=False,
+                                                          default=lambda v: v.item() if hasattr(v, "item") else str(v)),
+                                encoding="utf-8")
+
+def _ruta_lote(directorio, lote):
+    return os.path.join(directorio, "lotes", f"{lote}.json")
+
+def _ruta_fragmento(directorio, nodo, lote):
+    return os.path.join(directorio, "nodos", nodo, f"{lote}.json")
+
+def nombre_nodo():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+# Tabla de arriendos: {"siguiente": n, "lotes": {lote: {"estado", "llamadas", "nodo", "token",
+# "vence", "intentos"}}}. Estados: libre, arrendado, terminado, fallido; un lote fusionado sale de la tabla.
+def leer_tabla(directorio=REPARTO_DIR):
+    try:
+        return _leer_json(os.path.join(directorio, TABLA))
+    except FileNotFoundError:
+        return {"siguiente": 1, "lotes": {}}
+
+# Tabla leída con el bloqueo tomado; quien la modifica la guarda con _guardar_tabla antes de salir
+@contextmanager
+def bloqueo(directorio=REPARTO_DIR):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, "arriendos.lock"), "a") as f:
+        fcntl.lockf(f, fcntl.LOCK_EX)
+        try:
+            yield leer_tabla(directorio)
+        finally:
+            fcntl.lockf(f, fcntl.LOCK_UN)
+
+def _guardar_tabla(directorio, tabla):
+    _escribir_json(os.path.join(directorio, TABLA), tabla)
+
+# Reparte en lotes las filas que aún no están en un lote sin fusionar; devuelve (lotes, llamadas)
+def repartir(filas, directorio=REPARTO_DIR, tamaño=TAMAÑO_LOTE):
+    with bloqueo(directorio) as tabla:
+        repartidas = set()
+        for lote in tabla["lotes"]:
+            repartidas.update(f["Archivo"] for f in _leer_json(_ruta_lote(directorio, lote)))
+        nuevas = [f for f in filas if f["Archivo"] not in repartidas]
+        os.makedirs(os.path.join(directorio, "lotes"), exist_ok=True)
+        creados = 0
+        for desde in range(0, len(nuevas), tamaño):
+            lote = f"{tabla['siguiente']:06d}"
+            tabla["siguiente"] += 1
+            _escribir_json(_ruta_lote(directorio, lote), nuevas[desde:desde + tamaño])
+            tabla["lotes"][lote] = {"estado": "libre", "llamadas": len(nuevas[desde:desde + tamaño]), "nodo": None,
+                                    "token": None, "vence": None, "intentos": 0}
+            creados += 1
+        _guardar_tabla(directorio, tabla)
+    return creados, len(nuevas)
+
+# Arrienda el primer lote libre o con el arriendo vencido: {"lote", "token", "filas", "retomado_de"}.
+# Un lote que ya agotó sus intentos pasa a fallido en vez de arrendarse otra vez.
+def tomar_lote(nodo, arriendo_s=ARRIENDO_S, directorio=REPARTO_DIR, max_intentos=MAX_INTENTOS):
+    with bloqueo(directorio) as tabla:
+        ahora = time.time()
+        fallidos = 0
+        for lote, entrada in sorted(tabla["lotes"].items()):
+            vencido = entrada["estado"] == "arrendado" and entrada["vence"] < ahora
+            if entrada["estado"] != "libre" and not vencido:
+                continue
+            if entrada["intentos"] >= max_intentos:
+                print(f"❌ Lote {lote}: {entrada['intentos']} arriendos sin terminar; queda fallido.")
+                entrada.update(estado="fallido", token=None, vence=None)
+                fallidos += 1
+                continue
+            retomado_de = entrada["nodo"] if vencido else None
+            entrada.update(estado="arrendado", nodo=nodo, token=uuid.uuid4().hex, vence=ahora + arriendo_s,
+                           intentos=entrada["intentos"] + 1)
+            _guardar_tabla(directorio, tabla)
+            return {"lote": lote, "token": entrada["token"], "filas": _leer_json(_ruta_lote(directorio, lote)),
+                    "retomado_de": retomado_de}
+        if fallidos:
+            _guardar_tabla(directorio, tabla)
+    return None
+
+# Devuelve a libres los lotes fallidos, con sus intentos en cero; devuelve cuántos
+def reintentar_fallidos(directorio=REPARTO_DIR):
+    with bloqueo(directorio) as tabla:
+        fallidos = [e for e in tabla["lotes"].values() if e["estado"] == "fallido"]
+        for entrada in fallidos:
+            entrada.update(estado="libre", nodo=None, intentos=0)
+        if fallidos:
+            _guardar_tabla(directorio, tabla)
+    return len(fallidos)
+
+# Extiende los arriendos {lote: token} del nodo; devuelve los tokens de los que ya no le pertenecen
+# (por token y no por lote: si el mismo nodo vuelve a arrendar ese lote, el arriendo nuevo es válido)
+def renovar(arriendos, arriendo_s=ARRIENDO_S, directorio=REPARTO_DIR):
+    perdidos = set()
+    with bloqueo(directorio) as tabla:
+        vence = time.time() + arriendo_s
+        for lote, token in arriendos.items():
+            entrada = tabla["lotes"].get(lote)
+            if entrada is None or entrada["estado"] != "arrendado" or entrada["token"] != token:
+                perdidos.add(token)
+            else:
+                entrada["vence"] = vence
+        _guardar_tabla(directorio, tabla)
+    return perdidos
+
+# Guarda el fragmento del lote y lo da por terminado si el arriendo sigue siendo de este nodo;
+# si otro nodo lo retomó, el fragmento se descarta y devuelve False
+def terminar_lote(arriendo, nodo, resultado, directorio=REPARTO_DIR):
+    ruta = _ruta_fragmento(directorio, nodo, arriendo["lote"])
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    _escribir_json(ruta, {"lote": arriendo["lote"], "nodo": nodo, **resultado})
+    with bloqueo(directorio) as tabla:
+        entrada = tabla["lotes"].get(arriendo["lote"])
+        if entrada is not None and entrada["estado"] == "arrendado" and entrada["token"] == arriendo["token"]:
+            entrada.update(estado="terminado", vence=None, fragmento=os.path.relpath(ruta, directorio))
+            _guardar_tabla(directorio, tabla)
+            return True
+    os.remove(ruta)
+    return False
+
+# Devuelve el lote a la tabla sin esperar a que venza (nodo detenido o con error); descontar=True
+# no gasta el intento (nodo detenido con una señal)
+def liberar_lote(arriendo, directorio=REPARTO_DIR, descontar=False):
+    with bloqueo(directorio) as tabla:
+        entrada = tabla["lotes"].get(arriendo["lote"])
+        if entrada is not None and entrada["estado"] == "arrendado" and entrada["token"] == arriendo["token"]:
+            entrada.update(estado="libre", nodo=None, token=None, vence=None,
+                           intentos=entrada["intentos"] - 1 if descontar else entrada["intentos"])
+            _guardar_tabla(directorio, tabla)
+
+# Conteo de lotes por estado; "vencidos" son los arrendados que otro nodo ya puede retomar
+def resumen(directorio=REPARTO_DIR):
+    ahora = time.time()
+    conteo = {"libre": 0, "arrendado": 0, "vencido": 0, "terminado": 0, "fallido": 0, "llamadas": 0}
+    nodos = {}
+    for entrada in leer_tabla(directorio)["lotes"].values():
+        estado = "vencido" if entrada["estado"] == "arrendado" and entrada["vence"] < ahora else entrada["estado"]
+        conteo[estado] += 1
+        conteo["llamadas"] += entrada["llamadas"]
+        if estado == "arrendado":
+            nodos[entrada["nodo"]] = nodos.get(entrada["nodo"], 0) + 1
+    return conteo, nodos
+
+def _latir(arriendos, perdidos, fin, arriendo_s, directorio):
+    while not fin.wait(arriendo_s / 3):
+        if not arriendos:
+            continue
+        try:
+            perdidos.update(renovar(dict(arriendos), arriendo_s, directorio))
+        except OSError as e:
+            # Un corte breve de la red no mata el nodo: el próximo latido vuelve a intentarlo
+            print(f"⚠️ Latido fallido: {e}")
+
+# Procesa las filas de un lote; None si se perdió el arriendo o se pidió detener el nodo
+def procesar_lote(arriendo, workers, hilos, precarga, perdidos, pool=None):
+    filas, errores, metricas, textos = [], [], [], []
+    for estado, archivo, dato, info in transcriptor.iterar_resultados(arriendo["filas"], workers, hilos, precarga, pool):
+        if arriendo["token"] in perdidos or detener.is_set():
+            return None
+        if estado == "error":
+            errores.append([archivo, dato])
+        else:
+            filas.append(dato)
+            metricas.append(transcriptor.fila_metricas(archivo, info))
+            textos.append([archivo, info["texto"]])
+    return {"filas": filas, "errores": errores, "metricas": metricas, "textos": textos}
+
+def nodo(nombre, workers=1, hilos=None, precarga=transcriptor.precarga, arriendo_s=ARRIENDO_S,
+         directorio=REPARTO_DIR, esperar=True):
+    arriendos, perdidos, fin = {}, set(), threading.Event()
+    latido = threading.Thread(target=_latir, args=(arriendos, perdidos, fin, arriendo_s, directorio), daemon=True)
+    latido.start()
+    conteo = {"lotes": 0, "llamadas": 0, "errores": 0, "perdidos": 0}
+    # Con varios workers el pool vive lo que el nodo: cada worker carga el modelo una sola vez
+    pool = transcriptor.crear_pool(workers, hilos) if workers > 1 else None
+    try:
+        while not detener.is_set():
+            arriendo = tomar_lote(nombre, arriendo_s, directorio)
+            if arriendo is None:
+                # Mientras otro nodo tenga lotes arrendados se espera: si se cuelga, se retoman
+                pendientes, _ = resumen(directorio)
+                if not esperar or not (pendientes["libre"] + pendientes["arrendado"] + pendientes["vencido"]):
+                    break
+                detener.wait(min(arriendo_s / 3, 30))
+                continue
+            if arriendo["retomado_de"]:
+                print(f"↩️ Lote {arriendo['lote']}: el arriendo de {arriendo['retomado_de']} venció; se retoma.")
+            arriendos[arriendo["lote"]] = arriendo["token"]
+            try:
+                resultado = procesar_lote(arriendo, workers, hilos, precarga, perdidos, pool)
+            except BaseException:
+                liberar_lote(arriendo, directorio)
+                raise
+            finally:
+                del arriendos[arriendo["lote"]]
+                perdidos.discard(arriendo["token"])
+            if resultado is None and detener.is_set():
+                liberar_lote(arriendo, directorio, descontar=True)
+            elif resultado is None or not terminar_lote(arriendo, nombre, resultado, directorio):
+                print(f"⚠️ Lote {arriendo['lote']}: otro nodo lo retomó; se descarta lo procesado.")
+                conteo["perdidos"] += 1
+                if resultado is None and pool is not None:
+                    # Lo que quedaba del lote perdido seguiría ocupando a los workers antes del próximo
+                    pool.terminate()
+                    pool = transcriptor.crear_pool(workers, hilos)
+            else:
+                conteo["lotes"] += 1
+                conteo["llamadas"] += len(resultado["filas"])
+                conteo["errores"] += len(resultado["errores"])
+                print(f"📦 Lote {arriendo['lote']}: {len(resultado['filas'])} llamadas, "
+                      f"{len(resultado['errores'])} con error.")
+    finally:
+        fin.set()
+        if pool is not None:
+            pool.terminate()
+    return conteo
+
+# Pasa a la base los fragmentos de los lotes terminados, cada uno en su punto de control;
+# devuelve (lotes, llamadas, errores)
+def fusionar(con, directorio=REPARTO_DIR):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, "fusion.lock"), "a") as candado:
+        try:
+            fcntl.lockf(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise RuntimeError("Ya hay otra fusión en curso.")
+        terminados = sorted((lote, e) for lote, e in leer_tabla(directorio)["lotes"].items()
+                            if e["estado"] == "terminado")
+        if not terminados:
+            return 0, 0, 0
+        corrida, _ = almacen.iniciar_corrida(con, sum(e["llamadas"] for _, e in terminados), transcriptor.ahora())
+        llamadas = errores = 0
+        for lote, entrada in terminados:
+            fragmento = _leer_json(os.path.join(directorio, entrada["fragmento"]))
+            # El fragmento queda anotado en la base en la misma transacción: si una fusión anterior
+            # se cortó antes de quitarlo de la tabla, ahora solo se limpia
+            nuevo = transcriptor.guardar_checkpoint(con, corrida, fragmento["filas"], fragmento["errores"],
+                                                    fragmento["metricas"], [tuple(t) for t in fragmento["textos"]],
+                                                    fusion=(lote, entrada["token"]))
+            # Solo este proceso quita lotes terminados de la tabla
+            with bloqueo(directorio) as tabla:
+                del tabla["lotes"][lote]
+                _guardar_tabla(directorio, tabla)
+            os.remove(os.path.join(directorio, entrada["fragmento"]))
+            os.remove(_ruta_lote(directorio, lote))
+            if nuevo:
+                llamadas += len(fragmento["filas"])
+                errores += len(fragmento["errores"])
+        almacen.cerrar_corrida(con, corrida, transcriptor.ahora())
+    return len(terminados), llamadas, errores
+
+def imprimir_resumen(directorio=REPARTO_DIR):
+    conteo, nodos = resumen(directorio)
+    print(f"🗃️ Reparto: {conteo['libre']} lotes libres, {conteo['arrendado']} arrendados, "
+          f"{conteo['vencido']} vencidos, {conteo['terminado']} terminados sin fusionar "
+          f"({conteo['llamadas']} llamadas)."
+          + (f"\n   ❌ {conteo['fallido']} lotes fallidos tras {MAX_INTENTOS} intentos "
+             "(repartir --reintentar-fallidos los devuelve)." if conteo["fallido"] else "")
+          + ("".join(f"\n   {n}: {k} lotes" for n, k in sorted(nodos.items())) if nodos else ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesa las llamadas Pendientes repartidas entre varias máquinas.")
+    parser.add_argument("--reparto", default=REPARTO_DIR, help="Carpeta compartida de lotes, arriendos y fragmentos")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    repartir_ = comandos.add_parser("repartir", help="Divide las llamadas Pendientes en lotes (máquina de la base)")
+    repartir_.add_argument("--lote", type=int, default=TAMAÑO_LOTE, help="Llamadas por lote")
+    repartir_.add_argument("--agente", help="Solo las llamadas de este agente")
+    repartir_.add_argument("--campaña", "--campana", dest="campaña", help="Solo las llamadas de esta campaña")
+    repartir_.add_argument("--desde", type=transcriptor.fecha_argumento, help="Fecha Llamada desde (AAAA-MM-DD)")
+    repartir_.add_argument("--hasta", type=transcriptor.fecha_argumento, help="Fecha Llamada hasta (AAAA-MM-DD, incluida)")
+    repartir_.add_argument("--archivo", help="Patrón de nombre de archivo (p. ej. 'BCIO*_202503*')")
+    repartir_.add_argument("--limite", type=int, default=None, help="Reparte como mucho N llamadas")
+    repartir_.add_argument("--reintentar-fallidos", action="store_true", help="Devuelve a libres los lotes fallidos")
+
+    nodo_ = comandos.add_parser("nodo", help="Arrienda lotes y los procesa hasta que no quede ninguno")
+    nodo_.add_argument("--nodo", default=None, help="Nombre del nodo (por defecto: máquina-pid)")
+    nodo_.add_argument("--arriendo", type=float, default=ARRIENDO_S,
+                       help="Segundos sin latido tras los que otro nodo puede retomar un lote")
+    nodo_.add_argument("--sin-esperar", action="store_true",
+                       help="Termina cuando no hay lotes libres, sin esperar a los arrendados por otros nodos")
+    nodo_.add_argument("--motor", choices=sorted(motores.MOTORES), default=transcriptor.motor_nombre)
+    nodo_.add_argument("--modelo", default=transcriptor.modelo_nombre)
+    nodo_.add_argument("--workers", type=int, default=1, help="Procesos de transcripción en paralelo")
+    nodo_.add_argument("--hilos", type=int, default=None, help="Hilos de torch por worker (por defecto: núcleos / workers)")
+    nodo_.add_argument("--sin-cache", action="store_true", help="Ignora la caché de transcripciones")
+    nodo_.add_argument("--sin-reproduccion", action="store_true", help="No genera las copias livianas para los dashboards")
+    nodo_.add_argument("--vad", action="store_true", help="Descarta silencio, espera y tonos antes de transcribir")
+    nodo_.add_argument("--lote-ventanas", type=int, default=transcriptor.lote_ventanas,
+                       help="Ventanas de 30 s por pasada del modelo; 0 = transcripción secuencial")
+    nodo_.add_argument("--precarga", type=int, default=transcriptor.precarga,
+                       help="Audios que se decodifican por adelantado en segundo plano (solo con 1 worker)")
+
+    fusionar_ = comandos.add_parser("fusionar", help="Pasa a la base los lotes terminados (máquina de la base)")
+    fusionar_.add_argument("--sin-exportar", action="store_true", help="No regenera resumen.csv ni metadatos.xlsx")
+    comandos.add_parser("estado", help="Lotes libres, arrendados, vencidos y terminados")
+    args = parser.parse_args(argv)
+
+    if args.comando == "repartir":
+        con = almacen.conectar()
+        filas = transcriptor.leer_pendientes(con, args)
+        con.close()
+        if args.reintentar_fallidos:
+            print(f"🔁 {reintentar_fallidos(args.reparto)} lotes fallidos vuelven a estar libres.")
+        lotes, llamadas = repartir(filas, args.reparto, max(1, args.lote))
+        print(f"📦 {llamadas} llamadas en {lotes} lotes nuevos; {len(filas) - llamadas} ya estaban repartidas.")
+        imprimir_resumen(args.reparto)
+    elif args.comando == "nodo":
+        transcriptor.motor_nombre, transcriptor.modelo_nombre = args.motor, args.modelo
+        transcriptor.usar_cache = not args.sin_cache
+        transcriptor.usar_vad = args.vad
+        transcriptor.generar_reproduccion = not args.sin_reproduccion
+        transcriptor.lote_ventanas = max(0, args.lote_ventanas)
+        workers = max(1, args.workers)
+        hilos = args.hilos or (max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None)
+        signal.signal(signal.SIGINT, _señal)
+        signal.signal(signal.SIGTERM, _señal)
+        nombre = args.nodo or nombre_nodo()
+        print(f"🛰️ Nodo {nombre}: arriendos de {args.arriendo:g}s en {args.reparto}/.")
+        # La caché compartida la depura quien fusiona, no cada nodo
+        conteo = nodo(nombre, workers, hilos, args.precarga, args.arriendo, args.reparto, not args.sin_esperar)
+        print(f"✅ Nodo {nombre}: {conteo['lotes']} lotes, {conteo['llamadas']} llamadas, {conteo['errores']} con error"
+              + (f", {conteo['perdidos']} lotes retomados por otros nodos." if conteo["perdidos"] else "."))
+    elif args.comando == "fusionar":
+        con = almacen.conectar()
+        lotes, llamadas, errores = fusionar(con, args.reparto)
+        print(f"📝 Fusionados {lotes} lotes: {llamadas} llamadas, {errores} con error.")
+        if lotes and not args.sin_exportar:
+            almacen.exportar_resumen_csv(con, transcriptor.resumen_path)
+            almacen.exportar_metadatos_xlsx(con, transcriptor.metadatos_path, transcriptor.sheet_name)
+        con.close()
+        if lotes and transcriptor.usar_cache:
+            cache_transcripciones.depurar()
+        imprimir_resumen(args.reparto)
+    else:
+        imprimir_resumen(args.reparto)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import glob
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import almacen
+import cache_transcripciones
+
+# Copias livianas de cada audio para escuchar en los dashboards: mono, Opus a 16 kbps en Ogg
+# (~120 KB por minuto frente a ~1 MB de un mp3 a 128 kbps). Se direccionan por contenido, igual
+# que la caché de transcripciones: transcripciones/reproduccion/ab/abcdef….ogg, así un audio
+# renombrado reutiliza su copia. Streamlit sirve los medios con rangos de bytes (respuesta 206),
+# de modo que saltar a un minuto de la llamada no vuelve a descargarla entera.
+REPRODUCCION_DIR = os.path.join(almacen.TRANSCRIPCION_DIR, "reproduccion")
+FORMATO = "audio/ogg"
+BITRATE = "16k"
+# Opus trabaja a 8, 12, 16, 24 o 48 kHz; 16 kHz alcanza para voz telefónica
+SAMPLE_RATE = 16000
+
+def ruta_reproduccion(hash_archivo, directorio=REPRODUCCION_DIR):
+    return os.path.join(directorio, hash_archivo[:2], f"{hash_archivo}.ogg")
+
+# Genera la copia si no existe y devuelve su ruta; RuntimeError si ffmpeg no puede convertir el audio
+def generar(path_audio, hash_archivo=None, directorio=REPRODUCCION_DIR):
+    import ffmpeg
+    hash_archivo = hash_archivo or cache_transcripciones.hash_audio(path_audio)
+    ruta = ruta_reproduccion(hash_archivo, directorio)
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    # Nombre temporal por proceso e hilo: los hilos de precarga pueden convertir a la vez
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        (
+            ffmpeg.input(path_audio)
+            .output(tmp, format="ogg", acodec="libopus", audio_bitrate=BITRATE, ac=1, ar=SAMPLE_RATE,
+                    application="voip", vn=None)
+            .run(cmd=["ffmpeg", "-nostdin", "-y"], capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise RuntimeError(f"No se pudo convertir {path_audio}: {e.stderr.decode(errors='ignore')}") from e
+    os.replace(tmp, ruta)
+    return ruta
+
+# Copias de las llamadas procesadas antes de generarlas en el pipeline. Con depurar se borran las
+# copias cuyo audio ya no está en la carpeta.
+def completar(con, audio_dir="audios", directorio=REPRODUCCION_DIR, hilos=4, depurar=False):
+    paths = [os.path.join(audio_dir, archivo) for archivo, in con.execute("SELECT \"Archivo\" FROM llamadas")]
+    paths = [p for p in paths if os.path.exists(p)]
+
+    def convertir(path_audio):
+        hash_archivo = cache_transcripciones.hash_audio(path_audio)
+        existia = os.path.exists(ruta_reproduccion(hash_archivo, directorio))
+        try:
+            generar(path_audio, hash_archivo, directorio)
+        except RuntimeError as e:
+            print(f"⚠️ {e}")
+            return hash_archivo, "error"
+        return hash_archivo, "existente" if existia else "generada"
+
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as ejecutor:
+        resultados = list(ejecutor.map(convertir, paths))
+    conteo = {"generada": 0, "existente": 0, "error": 0, "borrada": 0}
+    for _, estado in resultados:
+        conteo[estado] += 1
+
+    if depurar:
+        vigentes = {hash_archivo for hash_archivo, _ in resultados}
+        # Los audios de la carpeta que aún no están en la base también conservan su copia
+        convertidos = set(paths)
+        with os.scandir(audio_dir) as entradas:
+            vigentes |= {cache_transcripciones.hash_audio(e.path) for e in entradas
+                         if e.is_file() and e.path not in convertidos}
+        for ruta in glob.glob(os.path.join(directorio, "*", "*.ogg")):
+            if os.path.splitext(os.path.basename(ruta))[0] not in vigentes:
+                os.remove(ruta)
+                conteo["borrada"] += 1
+    return conteo
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera las copias livianas de reproducción que faltan.")
+    parser.add_argument("--audios", default="audios", help="Carpeta de audios")
+    parser.add_argument("--hilos", type=int, default=4, help="Conversiones de ffmpeg en paralelo")
+    parser.add_argument("--depurar", action="store_true", help="Borra las copias de audios que ya no existen")
+    args = parser.parse_args(argv)
+    con = almacen.conectar()
+    conteo = completar(con, args.audios, hilos=args.hilos, depurar=args.depurar)
+    con.close()
+    print(f"🎧 Copias de reproducción: {conteo['generada']} generadas, {conteo['existente']} ya existían, "
+          f"{conteo['error']} con error" + (f", {conteo['borrada']} borradas." if args.depurar else "."))
+
+if __name__ == "__main__":
+    main()
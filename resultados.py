@@ -0,0 +1,62 @@
+import os
+import csv
+import tempfile
+
+# umask del proceso, leído una vez al importar (os.umask solo se puede consultar cambiándolo)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Escribe en un temporal del mismo directorio y lo renombra: quien lea el archivo
+# ve la versión anterior completa o la nueva completa, nunca una a medias. El reemplazo conserva
+# los permisos del archivo anterior (o los de un archivo nuevo según el umask), no el 0600 de mkstemp.
+def escribir_atomico(path, escribir, modo="w", **kwargs):
+    directorio = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.splitext(path)[1], dir=directorio)
+    try:
+        try:
+            permisos = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            permisos = 0o666 & ~_UMASK
+        os.fchmod(fd, permisos)
+        with os.fdopen(fd, modo, **kwargs) as f:
+            escribir(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# Inserta o reemplaza filas por la clave de la primera columna (Archivo) y conserva el historial.
+# Las filas existentes se copian como texto sin parsearlas; quitar (sin reemplazo) elimina claves.
+def upsert_csv(path, columnas, filas, quitar=()):
+    nuevas = {str(f[0]): f for f in filas}
+    descartar = set(nuevas) | {str(a) for a in quitar}
+
+    existentes = []
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            lector = csv.reader(f)
+            encabezado = next(lector, None)
+            if encabezado and encabezado != columnas:
+                raise ValueError(f"{path}: columnas distintas a las esperadas, no se puede actualizar")
+            existentes = [fila for fila in lector if fila and fila[0] not in descartar]
+
+    def escribir(f):
+        writer = csv.writer(f)
+        writer.writerow(columnas)
+        writer.writerows(existentes)
+        writer.writerows(nuevas.values())
+
+    escribir_atomico(path, escribir, newline="", encoding="utf-8")
+    return len(existentes) + len(nuevas)
+
+def guardar_excel(path, df, hoja):
+    import pandas as pd
+
+    def escribir(f):
+        with pd.ExcelWriter(f, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False, sheet_name=hoja)
+
+    escribir_atomico(path, escribir, modo="wb")
@@ -0,0 +1,148 @@
+import os
+import glob
+import mmap
+import zlib
+import struct
+import argparse
+import numpy as np
+import almacen
+import cache_transcripciones
+import detector_frases
+import kpis
+import resultados
+
+# Tiempos por segmento de cada llamada, para saber dónde ocurrió algo sin volver a transcribir.
+# Un archivo .seg por llamada en transcripciones/segmentos/:
+#   "SEG1" + n (uint32)
+#   inicio[n], fin[n]      float32, segundos sobre el audio original
+#   desplazamiento[n + 1]  uint32, límites de cada segmento en el texto sin comprimir (bytes)
+#   texto de los n segmentos seguidos, UTF-8 comprimido con zlib
+# Los arreglos se leen con np.frombuffer sobre un mmap, sin copiar ni descomprimir nada; el
+# texto se descomprime una vez, solo si se pide.
+SEGMENTOS_DIR = os.path.join(almacen.TRANSCRIPCION_DIR, "segmentos")
+MAGIA = b"SEG1"
+CABECERA = struct.Struct("<4sI")
+
+# Momentos que se marcan en la revisión: categorías del detector de frases de kpis.py
+ETIQUETAS = {"saludo": "Saludo", "consentimiento": "Consentimiento", "precio": "Precio",
+             "objecion": "Objeción", "cierre": "Cierre"}
+# Un bloque del guion se marca si al menos este % de sus palabras quedó alineado en la llamada
+MIN_COBERTURA_BLOQUE = 30
+
+def ruta_segmentos(archivo, directorio=SEGMENTOS_DIR):
+    return os.path.join(directorio, os.path.splitext(archivo)[0] + ".seg")
+
+# segmentos: [{"start", "end", "text"}] como los devuelven los motores
+def guardar(archivo, segmentos, directorio=SEGMENTOS_DIR):
+    textos = [s["text"].strip().encode("utf-8") for s in segmentos]
+    desplazamiento = np.zeros(len(textos) + 1, dtype="<u4")
+    np.cumsum([len(t) for t in textos], out=desplazamiento[1:])
+    datos = b"".join([
+        CABECERA.pack(MAGIA, len(textos)),
+        np.array([s["start"] for s in segmentos], dtype="<f4").tobytes(),
+        np.array([s["end"] for s in segmentos], dtype="<f4").tobytes(),
+        desplazamiento.tobytes(),
+        zlib.compress(b"".join(textos), 6),
+    ])
+    os.makedirs(directorio, exist_ok=True)
+    resultados.escribir_atomico(ruta_segmentos(archivo, directorio), lambda f: f.write(datos), modo="wb")
+
+class Segmentos:
+    def __init__(self, ruta):
+        with open(ruta, "rb") as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, n = CABECERA.unpack_from(self._mapa)
+        if magia != MAGIA:
+            raise ValueError(f"{ruta}: no es un archivo de segmentos")
+        pos = CABECERA.size
+        self.inicio = np.frombuffer(self._mapa, dtype="<f4", count=n, offset=pos)
+        self.fin = np.frombuffer(self._mapa, dtype="<f4", count=n, offset=pos + 4 * n)
+        self._desplazamiento = np.frombuffer(self._mapa, dtype="<u4", count=n + 1, offset=pos + 8 * n)
+        self._inicio_texto = pos + 12 * n + 4
+        self._texto = None
+
+    def __len__(self):
+        return len(self.inicio)
+
+    def _bytes(self):
+        if self._texto is None:
+            self._texto = zlib.decompress(self._mapa[self._inicio_texto:])
+        return self._texto
+
+    def texto(self, i):
+        return self._bytes()[self._desplazamiento[i]:self._desplazamiento[i + 1]].decode("utf-8")
+
+    def textos(self):
+        return [self.texto(i) for i in range(len(self))]
+
+    # Índice del segmento que suena en el segundo t (o el último que empezó antes)
+    def en(self, t):
+        return max(int(np.searchsorted(self.inicio, t, side="right")) - 1, 0)
+
+def leer(archivo, directorio=SEGMENTOS_DIR):
+    ruta = ruta_segmentos(archivo, directorio)
+    return Segmentos(ruta) if os.path.exists(ruta) else None
+
+# Dónde ocurrió cada frase detectada y cada bloque del guion: [{"tipo", "detalle", "inicio", "texto"}]
+# ordenados por tiempo. Las frases y el guion se buscan sobre los tokens de todos los segmentos
+# seguidos (una frase o un bloque puede cruzar segmentos) y se ubican en el segmento donde empiezan.
+# guion es el de kpis.obtener_guion.
+def momentos(segs, guion=None):
+    textos = segs.textos()
+    tokens, segmento_de = [], []
+    for i, texto in enumerate(textos):
+        propios = detector_frases.tokenizar(texto)
+        tokens += propios
+        segmento_de += [i] * len(propios)
+
+    hallazgos = []
+    for categoria, hit in kpis.detector.buscar(tokens).items():
+        if categoria not in ETIQUETAS:
+            continue
+        for posicion, frase in zip(hit["posiciones"], hit["frases"]):
+            i = segmento_de[posicion]
+            hallazgos.append({"tipo": ETIQUETAS[categoria], "detalle": frase, "inicio": float(segs.inicio[i]),
+                              "texto": textos[i]})
+
+    # Bloques del guion: el inicio del tramo alineado (mismo alineamiento que el apego)
+    if guion is not None and tokens:
+        alineado = guion.alinear(tokens)
+        for bloque, r in alineado["bloques"].items():
+            if r["inicio"] is None or r["cobertura"] < MIN_COBERTURA_BLOQUE:
+                continue
+            i = segmento_de[r["inicio"]]
+            detalle = bloque + (" (fuera de orden)" if bloque in alineado["fuera_de_orden"] else "")
+            hallazgos.append({"tipo": "Guion", "detalle": detalle, "inicio": float(segs.inicio[i]), "texto": textos[i]})
+    return sorted(hallazgos, key=lambda h: h["inicio"])
+
+# Llamadas procesadas antes de guardar segmentos: se recuperan de la caché de transcripciones
+# (la entrada más reciente de su audio, de cualquier motor) sin volver a transcribir
+def completar(con, audio_dir="audios", directorio=SEGMENTOS_DIR, cache_dir=cache_transcripciones.CACHE_DIR):
+    recuperadas = sin_cache = 0
+    for archivo, in con.execute("SELECT \"Archivo\" FROM llamadas"):
+        path_audio = os.path.join(audio_dir, archivo)
+        if os.path.exists(ruta_segmentos(archivo, directorio)) or not os.path.exists(path_audio):
+            continue
+        hash_audio = cache_transcripciones.hash_audio(path_audio)
+        entradas = sorted(glob.glob(os.path.join(cache_dir, hash_audio[:2], f"{hash_audio}_*.json")),
+                          key=os.path.getmtime)
+        entrada = cache_transcripciones.leer_ruta(entradas[-1]) if entradas else None
+        if entrada is None:
+            sin_cache += 1
+            continue
+        guardar(archivo, [{"start": s["inicio"], "end": s["fin"], "text": s["texto"]} for s in entrada["segmentos"]],
+                directorio)
+        recuperadas += 1
+    return recuperadas, sin_cache
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recupera de la caché los segmentos de las llamadas que no los tienen.")
+    parser.add_argument("--audios", default="audios", help="Carpeta de audios")
+    args = parser.parse_args(argv)
+    con = almacen.conectar()
+    recuperadas, sin_cache = completar(con, args.audios)
+    con.close()
+    print(f"⏱️ Segmentos recuperados de la caché: {recuperadas}; sin entrada en caché: {sin_cache}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import time
+import signal
+import argparse
+import threading
+import almacen
+import cache_transcripciones
+import motores
+import transcriptor
+
+# Servicio residente de transcripción: carga el motor una sola vez, vigila audios/ y procesa
+# cada audio nuevo en cuanto su copia termina, así las llamadas llegan a los dashboards en
+# minutos y sin pagar la carga del modelo en cada lote. La cola de trabajos vive en la tabla
+# trabajos de callcenter.db (pendiente / en_proceso / hecho / fallido, con intentos), de modo
+# que sobrevive a reinicios: al arrancar, lo que quedó en_proceso vuelve a la cola.
+#
+#   python servicio.py --motor faster-whisper --vad
+#
+# Un audio sin fila de metadatos espera en la cola hasta que se carguen sus datos (página de
+# administración de metadatos); no conviene correr transcriptor.py a la vez que el servicio.
+
+# Sondeo de audios/ cada N segundos (con watchdog instalado, además despierta con cada cambio)
+intervalo_s = 30
+# Un audio se encola cuando lleva este tiempo sin modificarse (copia terminada)
+estable_s = 10
+# Trabajos que se reclaman por vuelta
+lote_trabajos = 25
+# Reintentos: espera exponencial desde espera_reintento_s hasta max_intentos intentos
+max_intentos = 3
+espera_reintento_s = 60
+# Exportaciones planas (resumen.csv, metadatos.xlsx) y limpieza de la caché, como mucho cada tanto
+exportar_cada_s = 600
+depurar_cache_cada_s = 3600
+
+detener = threading.Event()
+despertar = threading.Event()
+
+def _señal(numero, _frame):
+    print(f"🛑 Señal {signal.Signals(numero).name}: se guarda lo procesado y se detiene el servicio.")
+    detener.set()
+    despertar.set()
+
+# Audios de la carpeta con su firma; se omiten los que aún se están copiando
+def firmas_audios(directorio, estable=estable_s):
+    ahora = time.time()
+    firmas = {}
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            if entrada.name.startswith(".") or not entrada.is_file():
+                continue
+            st_ = entrada.stat()
+            if ahora - st_.st_mtime >= estable:
+                firmas[entrada.name] = f"{st_.st_mtime_ns}:{st_.st_size}"
+    return firmas
+
+# Aviso inmediato de cambios en la carpeta si watchdog está instalado (opcional)
+def _vigilar(directorio):
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class Aviso(FileSystemEventHandler):
+        def on_any_event(self, evento):
+            if not evento.is_directory:
+                despertar.set()
+
+    observador = Observer()
+    observador.schedule(Aviso(), directorio, recursive=False)
+    observador.daemon = True
+    observador.start()
+    return observador
+
+# Guarda lo acumulado y cierra los trabajos: los que dieron error se reintentan o fallan
+def _guardar(con, corrida, lote, errores, metricas, textos):
+    transcriptor.guardar_checkpoint(con, corrida, lote, errores, metricas, textos)
+    ahora = transcriptor.ahora()
+    almacen.terminar_trabajos(con, [f[0] for f in lote], ahora)
+    for archivo, motivo in errores:
+        almacen.fallar_trabajo(con, archivo, motivo, ahora, max_intentos, espera_reintento_s)
+
+# Procesa un grupo de trabajos ya reclamados dentro de la corrida de la sesión; devuelve (procesadas, errores)
+def procesar_trabajos(con, corrida, filas, precarga):
+    for fila in filas:
+        fila["Fecha Llamada"] = transcriptor.parse_fecha(fila["Fecha Llamada"])
+    almacen.sumar_pendientes(con, corrida, len(filas))
+    pendientes = {f["Archivo"] for f in filas}
+    lote, errores, metricas, textos = [], [], [], []
+    procesadas = fallidas = 0
+    ultimo_checkpoint = time.monotonic()
+    try:
+        for estado, archivo, dato, info in transcriptor.iterar_resultados(filas, 1, None, precarga):
+            pendientes.discard(archivo)
+            if estado == "error":
+                errores.append([archivo, dato])
+            else:
+                lote.append(dato)
+                metricas.append(transcriptor.fila_metricas(archivo, info))
+                textos.append((archivo, info["texto"]))
+            # Punto de control por tiempo: las llamadas largas aparecen sin esperar al grupo entero
+            if time.monotonic() - ultimo_checkpoint >= transcriptor.checkpoint_segundos:
+                _guardar(con, corrida, lote, errores, metricas, textos)
+                procesadas, fallidas = procesadas + len(lote), fallidas + len(errores)
+                lote, errores, metricas, textos = [], [], [], []
+                ultimo_checkpoint = time.monotonic()
+            if detener.is_set():
+                break
+    except Exception as e:
+        # Un error inesperado (modelo, disco) cuenta como intento de las llamadas que quedaban
+        print(f"⚠️ Error procesando trabajos: {e}")
+        errores += [[archivo, f"Error del servicio: {e}"] for archivo in sorted(pendientes)]
+        pendientes = set()
+    finally:
+        _guardar(con, corrida, lote, errores, metricas, textos)
+        procesadas, fallidas = procesadas + len(lote), fallidas + len(errores)
+        if pendientes:
+            # Cortado por una señal: vuelven a la cola sin gastar un intento
+            almacen.liberar_trabajos(con, transcriptor.ahora(), pendientes, descontar=True)
+    return procesadas, fallidas
+
+def _exportar(con):
+    almacen.exportar_resumen_csv(con, transcriptor.resumen_path)
+    almacen.exportar_metadatos_xlsx(con, transcriptor.metadatos_path, transcriptor.sheet_name)
+
+def _estado_cola(con):
+    cola = almacen.resumen_trabajos(con)
+    return (f"cola: {cola['pendiente']} pendientes ({cola['sin_metadatos']} sin metadatos), "
+            f"{cola['hecho']} hechos, {cola['fallido']} fallidos")
+
+def main(argv=None):
+    global max_intentos, espera_reintento_s
+    parser = argparse.ArgumentParser(description="Servicio residente: vigila audios/ y transcribe las llamadas nuevas.")
+    parser.add_argument("--motor", choices=sorted(motores.MOTORES), default=transcriptor.motor_nombre)
+    parser.add_argument("--modelo", default=transcriptor.modelo_nombre)
+    parser.add_argument("--hilos", type=int, default=None, help="Hilos de torch del motor")
+    parser.add_argument("--sin-cache", action="store_true", help="Ignora la caché de transcripciones")
+    parser.add_argument("--sin-reproduccion", action="store_true", help="No genera las copias livianas para los dashboards")
+    parser.add_argument("--vad", action="store_true", help="Descarta silencio, espera y tonos antes de transcribir")
+    parser.add_argument("--lote-ventanas", type=int, default=transcriptor.lote_ventanas,
+                        help="Ventanas de 30 s por pasada del modelo; 0 = transcripción secuencial")
+    parser.add_argument("--precarga", type=int, default=transcriptor.precarga,
+                        help="Audios que se decodifican por adelantado en segundo plano")
+    parser.add_argument("--intervalo", type=float, default=intervalo_s, help="Segundos entre revisiones de audios/")
+    parser.add_argument("--estable", type=float, default=estable_s,
+                        help="Segundos sin cambios para dar por terminada la copia de un audio")
+    parser.add_argument("--lote", type=int, default=lote_trabajos, help="Trabajos que se reclaman por vuelta")
+    parser.add_argument("--max-intentos", type=int, default=max_intentos, help="Intentos antes de marcar un audio fallido")
+    parser.add_argument("--espera-reintento", type=float, default=espera_reintento_s,
+                        help="Segundos antes del primer reintento (se duplica en cada uno)")
+    parser.add_argument("--checkpoint-segundos", type=float, default=transcriptor.checkpoint_segundos,
+                        help="Guarda los resultados al menos cada T segundos")
+    parser.add_argument("--reintentar-fallidos", action="store_true", help="Devuelve a la cola los trabajos fallidos")
+    parser.add_argument("--una-vez", action="store_true", help="Procesa la cola actual y termina (para cron o pruebas)")
+    args = parser.parse_args(argv)
+
+    transcriptor.motor_nombre, transcriptor.modelo_nombre = args.motor, args.modelo
+    transcriptor.usar_cache = not args.sin_cache
+    transcriptor.usar_vad = args.vad
+    transcriptor.generar_reproduccion = not args.sin_reproduccion
+    transcriptor.lote_ventanas = max(0, args.lote_ventanas)
+    transcriptor.checkpoint_segundos = args.checkpoint_segundos
+    max_intentos, espera_reintento_s = max(1, args.max_intentos), args.espera_reintento
+
+    signal.signal(signal.SIGINT, _señal)
+    signal.signal(signal.SIGTERM, _señal)
+
+    con = almacen.conectar()
+    # Trabajos que quedaron a medias si el servicio anterior se cortó sin avisar
+    recuperados = almacen.liberar_trabajos(con, transcriptor.ahora())
+    if recuperados:
+        print(f"↩️ {recuperados} trabajos interrumpidos vuelven a la cola.")
+    if args.reintentar_fallidos:
+        print(f"🔁 {almacen.reintentar_fallidos(con, transcriptor.ahora())} trabajos fallidos vuelven a la cola.")
+
+    # El modelo se carga una vez y queda residente
+    transcriptor.cargar_motor(hilos=args.hilos)
+    observador = _vigilar(transcriptor.audio_dir)
+    print(f"👀 Vigilando {transcriptor.audio_dir}/ "
+          f"({'watchdog + ' if observador else ''}sondeo cada {args.intervalo:g}s). Ctrl+C para detener.")
+
+    conocidas = almacen.firmas_trabajos(con)
+    # Una corrida por sesión del servicio, abierta con el primer trabajo y cerrada al detenerse
+    corrida = None
+    ultima_exportacion = ultima_depuracion = time.monotonic()
+    sin_exportar = 0
+    try:
+        while not detener.is_set():
+            # Solo los audios nuevos o reemplazados pasan por la base
+            cambiadas = {a: f for a, f in firmas_audios(transcriptor.audio_dir, args.estable).items()
+                         if conocidas.get(a) != f}
+            almacen.encolar_trabajos(con, cambiadas, transcriptor.ahora())
+            conocidas.update(cambiadas)
+
+            filas = almacen.tomar_trabajos(con, max(1, args.lote), transcriptor.ahora())
+            if filas:
+                if corrida is None:
+                    corrida, _ = almacen.iniciar_corrida(con, 0, transcriptor.ahora())
+                procesadas, fallidas = procesar_trabajos(con, corrida, filas, args.precarga)
+                sin_exportar += procesadas
+                print(f"📝 {procesadas} llamadas guardadas, {fallidas} con error; {_estado_cola(con)}.")
+
+            if sin_exportar and time.monotonic() - ultima_exportacion >= exportar_cada_s:
+                _exportar(con)
+                sin_exportar, ultima_exportacion = 0, time.monotonic()
+            if transcriptor.usar_cache and time.monotonic() - ultima_depuracion >= depurar_cache_cada_s:
+                cache_transcripciones.depurar()
+                ultima_depuracion = time.monotonic()
+
+            if filas:
+                # Con trabajo en la cola se sigue sin esperar
+                continue
+            if args.una_vez:
+                break
+            if despertar.wait(args.intervalo) and not detener.is_set():
+                # Aviso de watchdog: se da tiempo a que termine la copia que lo disparó
+                despertar.clear()
+                detener.wait(args.estable)
+            despertar.clear()
+    finally:
+        if observador is not None:
+            observador.stop()
+        if corrida is not None:
+            almacen.cerrar_corrida(con, corrida, transcriptor.ahora())
+        if sin_exportar:
+            _exportar(con)
+        print(f"✅ Servicio detenido; {_estado_cola(con)}.")
+        con.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,95 +1,68 @@
-
 import os
-import whisper
-import csv
-import ffmpeg
+import sys
+import time
+import fnmatch
+import argparse
+import multiprocessing as mp
 import pandas as pd
+import audio
+import motores
+import vad
+import ventanas
+import almacen
+import cache_transcripciones
+import segmentos
+import reproduccion
+import kpis
+import resultados
 from datetime import datetime
-from difflib import SequenceMatcher
 from tqdm import tqdm
 
 audio_dir = "audios"
-transcripcion_dir = "transcripciones"
-metadatos_path = "metadatos.xlsx"
-resumen_path = "resumen.csv"
-script_path = "script_campana_bloques.csv"
+transcripcion_dir = almacen.TRANSCRIPCION_DIR
+metadatos_path = almacen.METADATOS_XLSX
+resumen_path = almacen.RESUMEN_CSV
 no_procesados_path = "no_procesados.csv"
-sheet_name = "Metadatos"
+sheet_name = almacen.HOJA_METADATOS
+# Motor y tamaño de modelo: --motor/--modelo o las variables de entorno del mismo nombre
+motor_nombre = os.environ.get("TRANSCRIPTOR_MOTOR", "whisper")
+modelo_nombre = os.environ.get("TRANSCRIPTOR_MODELO", "base")
+idioma = "Spanish"
+usar_cache = True
+# Recorta silencio, espera y tonos antes de la inferencia (--vad)
+usar_vad = False
+# Copia liviana de cada audio para los dashboards (--sin-reproduccion la omite)
+generar_reproduccion = True
+# Ventanas de 30 s por pasada del modelo (--lote-ventanas); 0 = una pasada secuencial por llamada
+lote_ventanas = 0
+# Audios decodificados por adelantado mientras el modelo transcribe (acota la memoria)
+precarga = 2
+# Punto de control: se guardan los resultados cada N llamadas o cada T segundos
+checkpoint_llamadas = 25
+checkpoint_segundos = 60
 
 os.makedirs(transcripcion_dir, exist_ok=True)
 
-print("🔁 Cargando modelo Whisper (base)...")
-model = whisper.load_model("base")
-
-SALUDOS = ["hola", "buenos días", "buenas tardes", "le habla"]
-CONSENTIMIENTO = ["consentimiento", "autorización", "permite grabar"]
-CIERRES = ["envío contrato", "queda registrado", "confirmo su compra", "formalizar"]
-PRECIOS = ["precio", "costo", "valor", "cuota", "montos"]
-OBJECIONES = ["no me interesa", "lo voy a pensar", "muy caro", "no puedo ahora", "ya lo vi", "no estoy interesado"]
-
-bloques = ["Saludo", "Presentación", "Oferta", "Beneficios", "Cierre"]
-df_script = pd.read_csv(script_path) if os.path.exists(script_path) else pd.DataFrame(columns=["Campaña"] + bloques)
-
-def obtener_script_bloques(campaña):
-    fila = df_script[df_script["Campaña"] == campaña]
-    return fila.iloc[0].to_dict() if not fila.empty else {}
-
-def contiene_frases(texto, frases):
-    return any(f in texto.lower() for f in frases)
-
-def detectar_consentimiento_afirmativo(texto):
-    lower_text = texto.lower()
-    return {
-        "consentimiento": contiene_frases(lower_text, CONSENTIMIENTO),
-        "respuesta_positiva": any(p in lower_text for p in ["sí", "claro", "por supuesto", "correcto"])
-    }
+# Motor cargado una sola vez por proceso (principal o worker), recién cuando hace falta
+motor = None
+hilos_motor = None
 
-def obtener_duracion_audio(path_audio):
-    try:
-        probe = ffmpeg.probe(path_audio)
-        return float(probe["format"]["duration"])
-    except:
-        return 0.0
+def cargar_motor(nombre=None, modelo=None, hilos=None):
+    global motor
+    nombre, modelo = nombre or motor_nombre, modelo or modelo_nombre
+    print(f"🔁 Cargando motor {nombre} ({modelo})...")
+    motor = motores.crear(nombre, modelo, idioma, hilos or hilos_motor)
+    return motor
 
-def evaluar_velocidad(wpm):
-    if wpm < 90:
-        return "Lenta", 0.5
-    elif wpm > 140:
-        return "Rápida", 0.5
-    else:
-        return "Adecuada", 1.0
+# Una corrida sin pendientes, o servida entera desde la caché, no importa torch ni carga pesos
+def _motor():
+    return motor if motor is not None else cargar_motor()
 
-def evaluar_friccion(porcentaje):
-    if porcentaje <= 5:
-        return "Baja", 1.0
-    elif porcentaje <= 15:
-        return "Media", 0.75
-    else:
-        return "Alta", 0.5
-
-def calcular_apego_bloques(script_dict, transcripcion):
-    if not script_dict:
-        return 0.0, {}
-    total_score, detalle = 0.0, {}
-    for bloque in bloques:
-        contenido = script_dict.get(bloque, "")
-        palabras_script = set(contenido.lower().split())
-        palabras_trans = set(transcripcion.lower().split())
-        comunes = palabras_script.intersection(palabras_trans)
-        score = len(comunes) / len(palabras_script) * 100 if palabras_script else 0
-        detalle[bloque] = round(score, 1)
-        total_score += score
-    return round(total_score / len(bloques), 1), detalle
-
-def calcular_score_total(apego, wpm, friccion_pct):
-    _, puntaje_wpm = evaluar_velocidad(wpm)
-    _, puntaje_friccion = evaluar_friccion(friccion_pct)
-    return round(apego * 0.6 + puntaje_wpm * 100 * 0.2 + puntaje_friccion * 100 * 0.2, 1)
-
-# Leer metadatos
-metadatos = pd.read_excel(metadatos_path, sheet_name=sheet_name)
-metadatos["Estado"] = metadatos.get("Estado", "Pendiente")
-pendientes = metadatos[metadatos["Estado"] == "Pendiente"].copy()
+# Clave de modelo para la caché: depende del motor, y con VAD la transcripción y sus tiempos cambian.
+# Se calcula sin cargar el motor, para consultar la caché antes de decidir si hace falta.
+def _clave_modelo():
+    clave = motor.identidad if motor is not None else motores.identidad(motor_nombre, modelo_nombre)
+    return f"{clave}+vad" if usar_vad else clave
 
 # Convertir Fecha Llamada a texto (manejo flexible)
 def parse_fecha(valor):
@@ -100,88 +73,473 @@ def parse_fecha(valor):
     except:
         return ""
 
-pendientes["Fecha Llamada"] = pendientes["Fecha Llamada"].apply(parse_fecha)
-
-resumen = []
-no_procesados = []
+# Decodifica varias ventanas (de una o más llamadas) en una sola pasada del modelo
+def inferir_ventanas(trozos):
+    return _motor().transcribir_lote(trozos)
+
+# Une los textos de las ventanas de una llamada en un resultado con la forma de motor.transcribir
+def _resultado_ventanas(lista_ventanas, textos):
+    segmentos = [{"start": inicio, "end": fin, "text": texto}
+                 for (inicio, fin, _), texto in zip(lista_ventanas, textos) if texto]
+    return {"text": ventanas.unir_textos(textos), "segments": segmentos}
+
+def _transcribir_ventanas(muestras):
+    lista_ventanas = ventanas.dividir(muestras)
+    textos = []
+    for i in range(0, len(lista_ventanas), lote_ventanas):
+        textos += inferir_ventanas([v[2] for v in lista_ventanas[i:i + lote_ventanas]])
+    return _resultado_ventanas(lista_ventanas, textos)
+
+def _necesita_inferencia(preparada):
+    recorte = preparada.get("recorte")
+    return ("error" not in preparada and preparada.get("entrada") is None
+            and (recorte is None or bool(recorte.segmentos)))
+
+# Transcribe el audio ya decodificado, o reutiliza la entrada de caché; devuelve
+# (texto, segmentos sobre el audio original, acierto_cache). resultado permite pasar una transcripción ya hecha en un lote de ventanas de varias llamadas.
+def transcribir(preparada, resultado=None):
+    entrada = preparada.get("entrada")
+    if entrada is not None:
+        tramos = [{"start": s["inicio"], "end": s["fin"], "text": s["texto"]} for s in entrada.get("segmentos", [])]
+        return entrada["texto"], tramos, True
+
+    if resultado is None:
+        if not _necesita_inferencia(preparada):
+            # Sin voz detectada: no hay nada que transcribir
+            resultado = {"text": "", "segments": []}
+        elif lote_ventanas:
+            resultado = _transcribir_ventanas(preparada["audio"])
+        else:
+            resultado = _motor().transcribir(preparada["audio"])
+    texto = resultado["text"].strip()
+    tramos = resultado["segments"]
+    recorte = preparada.get("recorte")
+    if recorte is not None:
+        # Los tiempos de los segmentos se guardan sobre el audio original
+        tramos = recorte.segmentos_originales(tramos)
+    if usar_cache:
+        cache_transcripciones.guardar(preparada["hash"], _clave_modelo(), idioma, texto, tramos,
+                                      duracion=preparada["duracion"], duracion_voz=preparada["duracion_voz"])
+    return texto, tramos, False
+
+def guardar_txt(archivo, transcripcion):
+    resultados.escribir_atomico(almacen.ruta_transcripcion(archivo), lambda f: f.write(transcripcion),
+                                encoding="utf-8")
+
+# Etapa de E/S (corre en los hilos de precarga): valida la fila, busca la caché y decodifica
+# el audio una sola vez. Con acierto de caché no hace falta decodificar: la duración está guardada.
+def preparar_audio(fila):
+    if not all([fila["Archivo"], fila["Agente"], fila["Campaña"], fila["Fecha Llamada"]]):
+        return {"error": "Datos incompletos"}
+
+    path_audio = os.path.join(audio_dir, fila["Archivo"])
+    if not os.path.exists(path_audio):
+        return {"error": "Archivo no encontrado"}
+
+    preparada = {"t_reproduccion": 0.0}
+    if usar_cache or generar_reproduccion:
+        preparada["hash"] = cache_transcripciones.hash_audio(path_audio)
+    if usar_cache:
+        entrada = cache_transcripciones.leer(preparada["hash"], _clave_modelo(), idioma)
+        if entrada is not None and entrada.get("duracion") is not None:
+            preparada["entrada"], preparada["duracion"] = entrada, entrada["duracion"]
+            preparada["duracion_voz"] = entrada.get("duracion_voz", entrada["duracion"])
+            copia_reproduccion(path_audio, preparada)
+            return preparada
+        preparada["entrada"] = entrada
+    copia_reproduccion(path_audio, preparada)
 
-for _, fila in tqdm(pendientes.iterrows(), total=len(pendientes), desc="Procesando audios"):
+    try:
+        preparada["audio"] = audio.decodificar(path_audio)
+    except RuntimeError:
+        return {"error": "Audio ilegible"}
+    preparada["duracion"] = preparada["duracion_voz"] = audio.duracion(preparada["audio"])
+    if usar_vad:
+        recorte = vad.recortar(preparada["audio"])
+        preparada["recorte"], preparada["audio"] = recorte, recorte.audio
+        preparada["duracion_voz"] = recorte.duracion_voz
+    return preparada
+
+# Copia Opus para los dashboards si aún no existe (un audio ya visto, aunque sea con otro nombre,
+# la tiene). Su tiempo va aparte: no se suma a la decodificación
+def copia_reproduccion(path_audio, preparada):
+    if not generar_reproduccion or os.path.exists(reproduccion.ruta_reproduccion(preparada["hash"])):
+        return
+    inicio = time.perf_counter()
+    # Si ffmpeg no puede convertirlo, los dashboards reproducen el original
+    try:
+        reproduccion.generar(path_audio, preparada["hash"])
+    except RuntimeError as e:
+        print(f"⚠️ {e}")
+    preparada["t_reproduccion"] = time.perf_counter() - inicio
+
+# Etapa de cómputo: devuelve ("ok", archivo, fila_resumen, info) o ("error", archivo, motivo, info)
+def procesar_preparada(fila, preparada, t_decodificacion=0.0, resultado=None, t_inferencia=0.0):
+    # t_decodificacion llega medido sobre todo preparar_audio: se le descuenta la copia de reproducción
+    t_reproduccion = preparada.get("t_reproduccion", 0.0)
+    info = {"t_decodificacion": t_decodificacion - t_reproduccion, "t_reproduccion": t_reproduccion,
+            "t_inferencia": 0.0}
     archivo = fila["Archivo"]
-    agente = fila["Agente"]
-    campaña = fila["Campaña"]
-    fecha = fila["Fecha Llamada"]
+    if "error" in preparada:
+        return "error", archivo, preparada["error"], info
+
+    inicio = time.perf_counter()
+    transcripcion, tramos, info["cache"] = transcribir(preparada, resultado)
+    info["texto"] = transcripcion
+    info["t_inferencia"] = t_inferencia + time.perf_counter() - inicio
+    info["duracion"], info["duracion_voz"] = preparada["duracion"], preparada["duracion_voz"]
+
+    # Palabras/min sobre la duración con voz: la espera y el silencio no la bajan
+    inicio = time.perf_counter()
+    fila_resumen = kpis.calcular_fila(archivo, fila["Agente"], fila["Campaña"], fila["Fecha Llamada"],
+                                      transcripcion, preparada["duracion"], preparada["duracion_voz"])
+    info["t_kpis"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    guardar_txt(archivo, transcripcion)
+    segmentos.guardar(archivo, tramos)
+    info["t_escritura"] = time.perf_counter() - inicio
+    return "ok", archivo, fila_resumen, info
+
+def procesar_llamada(fila):
+    inicio = time.perf_counter()
+    preparada = preparar_audio(fila)
+    return procesar_preparada(fila, preparada, time.perf_counter() - inicio)
+
+# Cada worker carga el modelo una vez (con su primera llamada sin caché) y limita sus hilos de torch
+def _iniciar_worker(nombre, modelo, hilos, cache, recortar_voz, ventanas_por_lote, copias):
+    global usar_cache, usar_vad, lote_ventanas, motor_nombre, modelo_nombre, hilos_motor, generar_reproduccion
+    usar_cache, usar_vad, lote_ventanas, generar_reproduccion = cache, recortar_voz, ventanas_por_lote, copias
+    motor_nombre, modelo_nombre, hilos_motor = nombre, modelo, hilos
+    os.environ["OMP_NUM_THREADS"] = str(hilos)
+    os.environ["MKL_NUM_THREADS"] = str(hilos)
+
+# Lotes de ventanas de varias llamadas: cada pasada del modelo toma lote_ventanas ventanas en
+# el orden en que llegan (el final de una llamada larga se completa con el inicio de la siguiente).
+# Cada llamada se entrega en cuanto todas sus ventanas tienen texto.
+def _iterar_por_lotes(preparadas):
+    en_espera, cola = [], []
+
+    def ejecutar():
+        tomadas = cola[:lote_ventanas]
+        del cola[:lote_ventanas]
+        inicio = time.perf_counter()
+        textos = inferir_ventanas([trabajo["ventanas"][i][2] for trabajo, i in tomadas])
+        parte = (time.perf_counter() - inicio) / len(tomadas)
+        for (trabajo, i), texto in zip(tomadas, textos):
+            trabajo["textos"][i] = texto
+            trabajo["t_inferencia"] += parte
+        for trabajo in [t for t in en_espera if None not in t["textos"]]:
+            en_espera.remove(trabajo)
+            yield procesar_preparada(trabajo["fila"], trabajo["preparada"], trabajo["t_decodificacion"],
+                                     _resultado_ventanas(trabajo["ventanas"], trabajo["textos"]),
+                                     trabajo["t_inferencia"])
+
+    for fila, preparada, t_decodificacion in preparadas:
+        if not _necesita_inferencia(preparada):
+            yield procesar_preparada(fila, preparada, t_decodificacion)
+            continue
+        lista_ventanas = ventanas.dividir(preparada["audio"])
+        trabajo = {"fila": fila, "preparada": preparada, "t_decodificacion": t_decodificacion,
+                   "ventanas": lista_ventanas, "textos": [None] * len(lista_ventanas), "t_inferencia": 0.0}
+        en_espera.append(trabajo)
+        cola.extend((trabajo, i) for i in range(len(lista_ventanas)))
+        while len(cola) >= lote_ventanas:
+            yield from ejecutar()
+    while cola:
+        yield from ejecutar()
+
+# Pool de procesos con el motor y las opciones actuales; cada worker carga el modelo una vez
+def crear_pool(workers, hilos):
+    return mp.get_context("spawn").Pool(workers, initializer=_iniciar_worker,
+                                        initargs=(motor_nombre, modelo_nombre, hilos, usar_cache, usar_vad,
+                                                  lote_ventanas, generar_reproduccion))
+
+# pool: uno ya creado con crear_pool para reusarlo entre llamadas (reparto.py); si falta, se crea uno
+def iterar_resultados(filas, workers, hilos, precarga=2, pool=None):
+    global hilos_motor
+    if workers <= 1 and pool is None:
+        hilos_motor = hilos or hilos_motor
+        # Mientras el modelo transcribe una llamada, los hilos decodifican las siguientes
+        preparadas = audio.precargar(filas, preparar_audio, precarga)
+        if lote_ventanas:
+            yield from _iterar_por_lotes(preparadas)
+            return
+        for fila, preparada, t_decodificacion in preparadas:
+            yield procesar_preparada(fila, preparada, t_decodificacion)
+        return
+
+    if pool is None:
+        with crear_pool(workers, hilos) as pool:
+            yield from iterar_resultados(filas, workers, hilos, precarga, pool)
+        return
+    # chunksize=1: cada worker toma la siguiente llamada de la cola compartida al terminar
+    yield from pool.imap_unordered(procesar_llamada, filas, chunksize=1)
+
+def ahora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# Fila de metricas_llamadas; la escritura en la base se suma al guardar el punto de control
+def fila_metricas(archivo, info):
+    return {
+        "Archivo": archivo, "procesado_en": ahora(), "motor": motor_nombre, "modelo": modelo_nombre,
+        "vad": usar_vad, "cache": info["cache"],
+        "decodificacion_ms": round(info["t_decodificacion"] * 1000, 1),
+        "reproduccion_ms": round(info["t_reproduccion"] * 1000, 1),
+        "inferencia_ms": round(info["t_inferencia"] * 1000, 1),
+        "kpis_ms": round(info["t_kpis"] * 1000, 1),
+        "escritura_ms": round(info["t_escritura"] * 1000, 1),
+        "segundos_audio": round(info["duracion"], 2), "segundos_voz": round(info["duracion_voz"], 2),
+        "rtf": round(info["t_inferencia"] / info["duracion"], 4) if info["duracion"] else None,
+    }
 
-    if not all([archivo, agente, campaña, fecha]):
-        no_procesados.append([archivo, "Datos incompletos"])
-        continue
+# Guarda en la base lo acumulado desde el último punto de control
+# fusion: (lote, token) de reparto.py; devuelve False si ese fragmento ya estaba en la base
+def guardar_checkpoint(con, corrida, lote, errores, metricas, textos=(), fusion=None):
+    if not almacen.guardar_avance(con, corrida, lote, len(errores), ahora(), metricas, textos, fusion):
+        return False
+    if errores or (lote and os.path.exists(no_procesados_path)):
+        resultados.upsert_csv(no_procesados_path, ["Archivo", "Motivo"], errores,
+                              quitar=[f[0] for f in lote])
+    return True
+
+def fecha_argumento(valor):
+    try:
+        return pd.to_datetime(valor).strftime("%Y-%m-%d")
+    except (ValueError, TypeError):
+        raise argparse.ArgumentTypeError(f"fecha inválida: {valor} (usa AAAA-MM-DD)")
+
+# Llamadas Pendientes de la base, con los filtros de la línea de comandos
+def leer_pendientes(con, args):
+    pendientes = almacen.leer_metadatos(con, campaña=args.campaña, agente=args.agente, estado="Pendiente")
+    pendientes["Fecha Llamada"] = pendientes["Fecha Llamada"].apply(parse_fecha)
+    if args.desde:
+        pendientes = pendientes[pendientes["Fecha Llamada"] >= args.desde]
+    if args.hasta:
+        pendientes = pendientes[(pendientes["Fecha Llamada"] != "") & (pendientes["Fecha Llamada"] <= args.hasta)]
+    if args.archivo:
+        pendientes = pendientes[pendientes["Archivo"].fillna("").map(lambda a: fnmatch.fnmatch(a, args.archivo))]
+    if args.limite:
+        pendientes = pendientes.head(args.limite)
+    # None y no NaN en los campos vacíos: preparar_audio los rechaza como datos incompletos
+    pendientes = pendientes[["Archivo", "Agente", "Campaña", "Fecha Llamada"]]
+    return pendientes.astype(object).where(pendientes.notna(), None).to_dict("records")
+
+# Segundos por llamada al ritmo de las últimas llamadas transcritas (sin aciertos de caché)
+def _segundos_por_llamada(con):
+    fila = con.execute("SELECT AVG(decodificacion_ms + inferencia_ms + kpis_ms + escritura_ms) FROM "
+                       "(SELECT * FROM metricas_llamadas WHERE NOT cache ORDER BY id DESC LIMIT 500)").fetchone()
+    return fila[0] / 1000 if fila[0] else None
+
+def _estimacion(con, llamadas):
+    por_llamada = _segundos_por_llamada(con)
+    if not llamadas or por_llamada is None:
+        return ""
+    return f" ≈ {llamadas * por_llamada / 3600:.1f} h con un worker ({por_llamada:.1f} s por llamada)"
+
+def comando_estado(args):
+    con = almacen.conectar()
+    estados = dict(con.execute("SELECT \"Estado\", COUNT(*) FROM metadatos GROUP BY \"Estado\""))
+    print("📋 Metadatos: " + (", ".join(f"{n} {e or '(sin estado)'}" for e, n in sorted(estados.items(), key=str))
+                              or "sin filas"))
+    filas = leer_pendientes(con, args)
+    audios = set(os.listdir(audio_dir)) if os.path.isdir(audio_dir) else set()
+    sin_audio = sum(f["Archivo"] not in audios for f in filas)
+    print(f"⏳ Pendientes{' (filtrados)' if _hay_filtros(args) else ''}: {len(filas)}, "
+          f"{sin_audio} sin audio en {audio_dir}/{_estimacion(con, len(filas) - sin_audio)}")
+    total = con.execute("SELECT COUNT(*) FROM llamadas").fetchone()[0]
+    print(f"📝 Base de resultados: {total} llamadas.")
+    ultima = con.execute("SELECT id, inicio, fin, estado, pendientes, procesadas, errores FROM corridas "
+                         "ORDER BY id DESC LIMIT 1").fetchone()
+    if ultima:
+        id_, inicio, fin, estado, pendientes, procesadas, errores = ultima
+        print(f"🕒 Última corrida #{id_}: {estado}, {inicio} → {fin or '…'}; "
+              f"{procesadas}/{pendientes} procesadas, {errores} errores.")
+    import reparto  # aquí y no arriba: reparto importa transcriptor
+    if os.path.exists(os.path.join(reparto.REPARTO_DIR, reparto.TABLA)):
+        reparto.imprimir_resumen()
+    cola = almacen.resumen_trabajos(con)
+    if any(cola.values()):
+        print(f"🛰️ Cola del servicio: {cola['pendiente']} pendientes ({cola['sin_metadatos']} sin metadatos), "
+              f"{cola['en_proceso']} en proceso, {cola['hecho']} hechos, {cola['fallido']} fallidos.")
+    con.close()
+
+# Muestra qué procesaría la corrida con esos filtros, sin cargar el modelo ni escribir resultados
+def comando_simular(args):
+    con = almacen.conectar()
+    filas = leer_pendientes(con, args)
+    incompletas = [f for f in filas if not all([f["Archivo"], f["Agente"], f["Campaña"], f["Fecha Llamada"]])]
+    sin_audio = [f for f in filas if f not in incompletas and not os.path.exists(os.path.join(audio_dir, f["Archivo"]))]
+    listas = [f for f in filas if f not in incompletas and f not in sin_audio]
+    print(f"🧪 Se procesarían {len(listas)} llamadas{_estimacion(con, len(listas))}.")
+    if listas:
+        print(pd.DataFrame(listas).head(args.mostrar).to_string(index=False))
+        if len(listas) > args.mostrar:
+            print(f"   … y {len(listas) - args.mostrar} más.")
+    for motivo, grupo in (("Datos incompletos", incompletas), ("Archivo no encontrado", sin_audio)):
+        if grupo:
+            print(f"⚠️ {motivo}: {len(grupo)} (" + ", ".join(str(f["Archivo"]) for f in grupo[:5])
+                  + (", …" if len(grupo) > 5 else "") + ")")
+    con.close()
+
+def comando_procesar(args):
+    global usar_cache, usar_vad, lote_ventanas, motor_nombre, modelo_nombre, generar_reproduccion
+    motor_nombre, modelo_nombre = args.motor, args.modelo
+    usar_cache = not args.sin_cache
+    usar_vad = args.vad
+    generar_reproduccion = not args.sin_reproduccion
+    lote_ventanas = max(0, args.lote_ventanas)
+
+    workers = max(1, args.workers)
+    hilos = args.hilos or (max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None)
+
+    # Leer metadatos pendientes desde la base (índice por Estado)
+    con = almacen.conectar()
+    filas = leer_pendientes(con, args)
+    if not filas:
+        # Nada que hacer: ni modelo, ni corrida, ni exportaciones
+        print("✅ No hay llamadas pendientes" + (" con esos filtros." if _hay_filtros(args) else "."))
+        con.close()
+        return
+
+    # Las llamadas ya guardadas por una corrida interrumpida ya no están Pendientes
+    corrida, interrumpidas = almacen.iniciar_corrida(con, len(filas), ahora())
+    for _, inicio, procesadas in interrumpidas:
+        print(f"↩️ Reanudando la corrida interrumpida del {inicio}: {procesadas} llamadas ya guardadas, "
+              f"{len(filas)} pendientes.")
+
+    lote, errores, metricas, textos = [], [], [], []
+    guardadas = 0
+    ultimo_checkpoint = time.monotonic()
+    aciertos_cache = fallos_cache = 0
+    t_decodificacion = t_reproduccion = t_inferencia = 0.0
+    audio_total = audio_voz = 0.0
+    inicio_corrida = time.perf_counter()
+
+    # El proceso principal es el único que escribe en la base de resultados
+    try:
+        resultados_llamadas = iterar_resultados(filas, workers, hilos, args.precarga)
+        for estado, archivo, dato, info in tqdm(resultados_llamadas, total=len(filas), desc="Procesando audios"):
+            t_decodificacion += info["t_decodificacion"]
+            t_reproduccion += info["t_reproduccion"]
+            t_inferencia += info["t_inferencia"]
+            if estado == "error":
+                errores.append([archivo, dato])
+            else:
+                if usar_cache:
+                    aciertos_cache += info["cache"]
+                    fallos_cache += not info["cache"]
+                lote.append(dato)
+                metricas.append(fila_metricas(archivo, info))
+                textos.append((archivo, info["texto"]))
+                audio_total += info["duracion"]
+                audio_voz += info["duracion_voz"]
+            if len(lote) + len(errores) >= args.checkpoint_llamadas or \
+                    time.monotonic() - ultimo_checkpoint >= args.checkpoint_segundos:
+                guardar_checkpoint(con, corrida, lote, errores, metricas, textos)
+                guardadas += len(lote)
+                lote, errores, metricas, textos = [], [], [], []
+                ultimo_checkpoint = time.monotonic()
+    finally:
+        # También ante un error o Ctrl+C: lo ya transcrito no se pierde
+        guardar_checkpoint(con, corrida, lote, errores, metricas, textos)
+        guardadas += len(lote)
+
+    almacen.cerrar_corrida(con, corrida, ahora())
+    total = con.execute("SELECT COUNT(*) FROM llamadas").fetchone()[0]
+    print(f"📝 Base de resultados: {guardadas} llamadas nuevas o actualizadas, {total} en total.")
+    # Con 1 worker la decodificación corre en paralelo a la inferencia: si el total de la corrida
+    # se acerca a la inferencia, el modelo no estuvo esperando audio.
+    print(f"⏱️ Decodificación: {t_decodificacion:.1f}s, copias de reproducción: {t_reproduccion:.1f}s, "
+          f"inferencia: {t_inferencia:.1f}s, corrida: {time.perf_counter() - inicio_corrida:.1f}s.")
+    if usar_vad and audio_total:
+        # La inferencia escala con la duración del audio: la aceleración es total / voz
+        descartado = audio_total - audio_voz
+        print(f"🔇 VAD: {descartado / 60:.1f} de {audio_total / 60:.1f} min descartados "
+              f"({descartado / audio_total:.0%})"
+              + (f"; inferencia ≈{audio_total / audio_voz:.2f}x más rápida." if audio_voz else "; no se detectó voz."))
+
+    # Exportaciones para quien siga usando los archivos planos
+    almacen.exportar_resumen_csv(con, resumen_path)
+    almacen.exportar_metadatos_xlsx(con, metadatos_path, sheet_name)
+    con.close()
+
+    if usar_cache:
+        expulsadas = cache_transcripciones.depurar(args.cache_max_mb, args.cache_max_dias)
+        print(f"🗂️ Caché de transcripciones: {aciertos_cache} aciertos, {fallos_cache} fallos, {expulsadas} entradas expulsadas.")
+
+    print("✅ Proceso completado.")
+
+def _hay_filtros(args):
+    return any([args.agente, args.campaña, args.desde, args.hasta, args.archivo, args.limite])
+
+COMANDOS = {"procesar": ["process"], "estado": ["status"], "simular": ["dry-run"], "recalcular": ["rescore"]}
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Sin subcomando se procesa, como siempre: `python transcriptor.py --workers 4`
+    nombres = {c for nombre, alias in COMANDOS.items() for c in [nombre] + alias}
+    if not argv or (argv[0] not in nombres and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "procesar")
+    if argv[0] in ["recalcular"] + COMANDOS["recalcular"]:
+        # Sus opciones son las de recalcular.py
+        import recalcular
+        return recalcular.main(argv[1:])
+
+    filtros = argparse.ArgumentParser(add_help=False)
+    grupo = filtros.add_argument_group("filtros")
+    grupo.add_argument("--agente", help="Solo las llamadas de este agente")
+    grupo.add_argument("--campaña", "--campana", dest="campaña", help="Solo las llamadas de esta campaña")
+    grupo.add_argument("--desde", type=fecha_argumento, help="Fecha Llamada desde (AAAA-MM-DD)")
+    grupo.add_argument("--hasta", type=fecha_argumento, help="Fecha Llamada hasta (AAAA-MM-DD, incluida)")
+    grupo.add_argument("--archivo", help="Patrón de nombre de archivo (p. ej. 'BCIO*_202503*')")
+    grupo.add_argument("--limite", type=int, default=None, help="Procesa como mucho N llamadas")
+
+    parser = argparse.ArgumentParser(description="Transcribe y evalúa las llamadas pendientes.")
+    comandos = parser.add_subparsers(dest="comando")
+    comandos.add_parser("estado", aliases=COMANDOS["estado"], parents=[filtros],
+                        help="Pendientes, última corrida y cola del servicio (no carga el modelo)")
+    simular = comandos.add_parser("simular", aliases=COMANDOS["simular"], parents=[filtros],
+                                  help="Lista lo que procesaría la corrida, sin cargar el modelo ni escribir")
+    simular.add_argument("--mostrar", type=int, default=20, help="Llamadas que se listan")
+    comandos.add_parser("recalcular", aliases=COMANDOS["recalcular"],
+                        help="Recalcula los KPIs del historial sin transcribir (opciones de recalcular.py)")
+
+    procesar = comandos.add_parser("procesar", aliases=COMANDOS["procesar"], parents=[filtros],
+                                   help="Transcribe y evalúa las llamadas pendientes (por defecto)")
+    procesar.add_argument("--motor", choices=sorted(motores.MOTORES), default=motor_nombre,
+                          help="Motor de transcripción (faster-whisper: int8 en CPU; falso: determinista, para pruebas)")
+    procesar.add_argument("--modelo", default=modelo_nombre, help="Tamaño del modelo (tiny, base, small, ...)")
+    procesar.add_argument("--workers", type=int, default=1, help="Procesos de transcripción en paralelo")
+    procesar.add_argument("--hilos", type=int, default=None,
+                          help="Hilos de torch por worker (por defecto: núcleos / workers)")
+    procesar.add_argument("--sin-cache", action="store_true", help="Ignora la caché de transcripciones")
+    procesar.add_argument("--cache-max-mb", type=float, default=cache_transcripciones.MAX_MB,
+                          help="Tamaño máximo de la caché antes de expulsar entradas")
+    procesar.add_argument("--cache-max-dias", type=float, default=cache_transcripciones.MAX_DIAS,
+                          help="Antigüedad máxima (días sin uso) de una entrada de caché")
+    procesar.add_argument("--sin-reproduccion", action="store_true",
+                          help="No genera las copias livianas (Opus) que reproducen los dashboards")
+    procesar.add_argument("--vad", action="store_true",
+                          help="Descarta silencio, espera y tonos antes de transcribir; Palabras/min usa solo la voz")
+    procesar.add_argument("--lote-ventanas", type=int, default=lote_ventanas,
+                          help="Corta el audio en ventanas de 30 s con solape y decodifica N ventanas por pasada "
+                               "(de una o varias llamadas); 0 = transcripción secuencial")
+    procesar.add_argument("--precarga", type=int, default=precarga,
+                          help="Audios que se decodifican por adelantado en segundo plano (solo con 1 worker)")
+    procesar.add_argument("--checkpoint-llamadas", type=int, default=checkpoint_llamadas,
+                          help="Guarda los resultados cada N llamadas")
+    procesar.add_argument("--checkpoint-segundos", type=float, default=checkpoint_segundos,
+                          help="Guarda los resultados al menos cada T segundos")
+    args = parser.parse_args(argv)
+
+    comando = next(nombre for nombre, alias in COMANDOS.items() if args.comando in [nombre] + alias)
+    if comando == "estado":
+        comando_estado(args)
+    elif comando == "simular":
+        comando_simular(args)
+    else:
+        comando_procesar(args)
 
-    path_audio = os.path.join(audio_dir, archivo)
-    if not os.path.exists(path_audio):
-        no_procesados.append([archivo, "Archivo no encontrado"])
-        continue
-
-    transcripcion = model.transcribe(path_audio, language="Spanish")["text"].strip()
-
-    palabras = len(transcripcion.split())
-    duracion_min = round(obtener_duracion_audio(path_audio) / 60, 2)
-    ppm = round(palabras / duracion_min, 2) if duracion_min > 0 else 0
-    preview = " ".join(transcripcion.split()[:20]) + "..."
-
-    saludo = contiene_frases(transcripcion, SALUDOS)
-    objecion = contiene_frases(transcripcion, OBJECIONES)
-    cierre = contiene_frases(transcripcion, CIERRES)
-    precio = contiene_frases(transcripcion, PRECIOS)
-    consentimiento = detectar_consentimiento_afirmativo(transcripcion)
-
-    script_dict = obtener_script_bloques(campaña)
-    apego_total, detalle = calcular_apego_bloques(script_dict, transcripcion)
-
-    friccion_pct = 0
-    for frase in OBJECIONES:
-        if frase in transcripcion.lower():
-            friccion_pct += 1
-    total_frases = len(transcripcion.split(".")) or 1
-    friccion_pct = round((friccion_pct / total_frases) * 100, 2)
-
-    eval_wpm, _ = evaluar_velocidad(ppm)
-    eval_fric, _ = evaluar_friccion(friccion_pct)
-    score_total = calcular_score_total(apego_total, ppm, friccion_pct)
-
-    resultado = "Exitoso" if cierre and not objecion else "No Exitoso" if objecion and not cierre else "Indeterminado"
-
-    fila_resumen = [
-        archivo, agente, campaña, fecha, palabras, duracion_min, ppm,
-        saludo, consentimiento["consentimiento"], consentimiento["respuesta_positiva"],
-        precio, cierre, objecion, resultado, preview,
-        apego_total, ppm, eval_wpm, friccion_pct, eval_fric, score_total
-    ]
-    for b in bloques:
-        fila_resumen.append(detalle.get(b, 0.0))
-    resumen.append(fila_resumen)
-
-    idx = metadatos[metadatos["Archivo"] == archivo].index
-    metadatos.loc[idx, "Estado"] = "Procesado"
-    metadatos.loc[idx, "Fecha Procesado"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    metadatos.loc[idx, "updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    metadatos.loc[idx, "KPI Score"] = score_total
-
-with open(resumen_path, "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "Archivo", "Agente", "Campaña", "Fecha", "Palabras", "Duración (min)", "Palabras/min",
-        "Saludo Detectado", "Consentimiento Solicitado", "Consentimiento Afirmado",
-        "Precio Mencionado", "Cierre Detectado", "Objeción Detectada", "Resultado Estimado", "Preview",
-        "Apego al Guion (%)", "WPM", "Evaluación WPM", "Friccion (%)", "Evaluación Fricción", "Score Total"
-    ] + [f"% {b}" for b in bloques])
-    writer.writerows(resumen)
-
-if no_procesados:
-    with open(no_procesados_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Archivo", "Motivo"])
-        writer.writerows(no_procesados)
-
-with pd.ExcelWriter(metadatos_path, engine="openpyxl") as writer:
-    metadatos.to_excel(writer, index=False, sheet_name=sheet_name)
-
-print("✅ Proceso completado.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import numpy as np
+from audio import SAMPLE_RATE
+
+# Detección de voz (VAD) por energía, sin dependencias extra: descarta silencio, espera y tonos
+# de llamada antes de la inferencia. Cada trama de 30 ms es voz si su energía supera el piso de
+# ruido del audio y no es un tono puro (el tono de llamada concentra casi toda la energía en una
+# frecuencia; la voz no). Las regiones de voz se rellenan y se unen si los huecos son cortos.
+TRAMA_MS = 30
+MARGEN_DB = 12          # sobre el piso de ruido (percentil 10 de la energía)
+MIN_DB = -50            # por debajo de esto nunca es voz
+MAX_TONALIDAD = 0.6     # fracción de la energía en la frecuencia dominante
+RELLENO_S = 0.3         # se conserva este margen antes y después de cada región
+HUECO_MIN_S = 0.5       # huecos más cortos no se cortan
+VOZ_MIN_S = 0.2         # regiones más cortas (clics, inicio de un tono) se descartan
+TRAMAS_BLOQUE = 2000    # tramas por bloque al medir energía (60 s): la memoria no crece con la llamada
+
+def _tramas(audio, largo):
+    n = len(audio) // largo
+    return audio[:n * largo].reshape(n, largo)
+
+def detectar_voz(audio, sr=SAMPLE_RATE):
+    largo = int(sr * TRAMA_MS / 1000)
+    tramas = _tramas(audio, largo)
+    if not len(tramas):
+        return []
+
+    energia_db = np.empty(len(tramas))
+    tonalidad = np.empty(len(tramas))
+    ventana = np.hanning(largo)
+    for k in range(0, len(tramas), TRAMAS_BLOQUE):
+        bloque = tramas[k:k + TRAMAS_BLOQUE]
+        energia_db[k:k + len(bloque)] = 10 * np.log10(np.mean(bloque ** 2, axis=1) + 1e-10)
+        espectro = np.abs(np.fft.rfft(bloque * ventana, axis=1)) ** 2
+        tonalidad[k:k + len(bloque)] = espectro.max(axis=1) / (espectro.sum(axis=1) + 1e-10)
+    umbral = max(np.percentile(energia_db, 10) + MARGEN_DB, MIN_DB)
+    voz = (energia_db > umbral) & (tonalidad < MAX_TONALIDAD)
+
+    # Bordes de las regiones de voz en tramas, luego rellenados y unidos en segundos
+    cambios = np.diff(np.concatenate([[0], voz.astype(np.int8), [0]]))
+    inicios, fines = np.flatnonzero(cambios == 1), np.flatnonzero(cambios == -1)
+    duracion = len(audio) / sr
+    segmentos = []
+    for i, f in zip(inicios * largo / sr, fines * largo / sr):
+        if f - i < VOZ_MIN_S:
+            continue
+        i, f = max(0.0, float(i) - RELLENO_S), min(duracion, float(f) + RELLENO_S)
+        if segmentos and i - segmentos[-1][1] < HUECO_MIN_S:
+            segmentos[-1] = (segmentos[-1][0], f)
+        else:
+            segmentos.append((i, f))
+    return segmentos
+
+# Audio recortado más el mapa de tiempos para volver del audio recortado al original
+class Recorte:
+    def __init__(self, audio, segmentos, sr=SAMPLE_RATE):
+        self.sr = sr
+        self.segmentos = segmentos
+        partes = [audio[int(i * sr):int(f * sr)] for i, f in segmentos]
+        self.audio = np.concatenate(partes) if partes else np.zeros(0, dtype=audio.dtype)
+        largos = np.array([len(p) / sr for p in partes])
+        # Inicio de cada segmento dentro del audio recortado
+        self._acumulado = np.concatenate([[0.0], np.cumsum(largos)])
+        self.duracion_original = len(audio) / sr
+        self.duracion_voz = len(self.audio) / sr
+
+    # fin=True ubica un instante que cae justo en un corte al final del segmento anterior
+    def a_original(self, t, fin=False):
+        if not self.segmentos:
+            return t
+        lado = "left" if fin else "right"
+        k = int(np.clip(np.searchsorted(self._acumulado, t, side=lado) - 1, 0, len(self.segmentos) - 1))
+        return self.segmentos[k][0] + (t - self._acumulado[k])
+
+    # Reubica los segmentos de Whisper (start/end sobre el recorte) en el audio original
+    def segmentos_originales(self, segmentos):
+        return [dict(s, start=self.a_original(s["start"]), end=self.a_original(s["end"], fin=True)) for s in segmentos]
+
+def recortar(audio, sr=SAMPLE_RATE):
+    return Recorte(audio, detectar_voz(audio, sr), sr)
@@ -0,0 +1,50 @@
+import re
+import unicodedata
+from audio import SAMPLE_RATE
+
+# Transcripción por ventanas: el audio se corta en ventanas fijas de 30 s (lo que Whisper procesa
+# en una pasada) con un solape, las ventanas de una o varias llamadas se decodifican juntas en un
+# lote, y los textos se vuelven a unir quitando las palabras repetidas en el solape.
+LARGO_S = 30
+SOLAPE_S = 2
+MAX_SOLAPE_PALABRAS = 15   # palabras que caben de sobra en SOLAPE_S segundos
+HOLGURA_PALABRAS = 3       # palabras cortadas en el borde que pueden no coincidir
+
+def dividir(audio, sr=SAMPLE_RATE, largo_s=LARGO_S, solape_s=SOLAPE_S):
+    largo, paso = int(largo_s * sr), int((largo_s - solape_s) * sr)
+    ventanas = []
+    inicio = 0
+    while True:
+        ventanas.append((inicio / sr, min(inicio + largo, len(audio)) / sr, audio[inicio:inicio + largo]))
+        if inicio + largo >= len(audio):
+            return ventanas
+        inicio += paso
+
+def _normalizar(palabra):
+    palabra = unicodedata.normalize("NFC", palabra.lower())
+    return re.sub(r"[^\w]", "", palabra)
+
+# Busca el tramo más largo en que el final de a se repite al inicio de b. Tolera algunas
+# palabras mal cortadas en el borde de cada ventana; devuelve (corte en a, inicio en b) de modo
+# que a[:corte] + b[inicio:] conserve el tramo repetido una sola vez, tal como lo escribió b
+# (que ya oyó lo que sigue y puntúa mejor el final de la frase).
+def _solape(a, b):
+    mejor, corte_a, inicio_b = 1, len(a), 0
+    for i in range(HOLGURA_PALABRAS + 1):
+        for d in range(HOLGURA_PALABRAS + 1):
+            fin_a = len(a) - d
+            for k in range(min(MAX_SOLAPE_PALABRAS, fin_a, len(b) - i), mejor, -1):
+                if a[fin_a - k:fin_a] == b[i:i + k]:
+                    mejor, corte_a, inicio_b = k, fin_a - k, i
+                    break
+    return corte_a, inicio_b
+
+def unir_textos(textos):
+    palabras, normalizadas = [], []
+    for texto in textos:
+        nuevas = texto.split()
+        nuevas_norm = [_normalizar(p) for p in nuevas]
+        corte, inicio = _solape(normalizadas, nuevas_norm) if palabras else (0, 0)
+        palabras = palabras[:corte] + nuevas[inicio:]
+        normalizadas = normalizadas[:corte] + nuevas_norm[inicio:]
+    return " ".join(palabras)